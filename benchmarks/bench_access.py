@@ -0,0 +1,84 @@
+import argparse
+import time
+
+from cli_lab import access
+from cli_lab.vfs import READ, WRITE, VirtualFS
+
+# Permission checks against a share full of files with long ACLs, the kind
+# icacls piles up. Every check is timed through the per-inode cache and
+# against evaluating the ACL each time. Then a class of sessions, each a
+# fork of the same template, checks every file: the rights are worked out
+# once per principal and file for all of them. Last, one session takes a
+# file over and changes its ACL, which must only drop that file's cache.
+
+
+def build(files, entries):
+    fs = VirtualFS(home="/Users/User", drive="C:", ignore_case=True)
+    acl = [(f"DESKTOP-PC234\\svc{number}", number % 5 != 0, access.RIGHTS["RX"])
+           for number in range(entries)]
+    acl.append(("BUILTIN\\Users", True, access.RIGHTS["R"]))
+    for number in range(files):
+        fs.add_file(f"/Shares/team/file{number}.txt", "", owner="Administrator",
+                    group="Administrators").set_acl(acl)
+    return fs
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--entries", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+
+    template = build(args.files, args.entries)
+    directory = template.lookup("/Shares/team")
+    inodes = list(directory.children.values())
+    users = [access.principal(name, "Users", ("Authenticated Users",), windows=True)
+             for name in ("User", "Guest", "svc3")]
+
+    def checks(evaluate):
+        allowed = 0
+        for inode in inodes:
+            for user in users:
+                allowed += evaluate(user, inode) & READ == READ
+        return allowed
+
+    checks(access.effective)
+    cached, warm = timed(checks, access.effective)
+    plain, cold = timed(checks, access._evaluate)
+    assert cached == plain
+    count = len(inodes) * len(users)
+    print(f"{count} checks over {args.entries}-entry ACLs: cached {warm / count * 1e9:.0f} ns each, "
+          f"evaluated {cold / count * 1e9:.0f} ns each")
+
+    forks = [template.fork() for _ in range(args.sessions)]
+    started = time.perf_counter()
+    for fs in forks:
+        for inode in fs.lookup("/Shares/team").children.values():
+            for user in users:
+                access.permits(user, inode, READ)
+    seconds = time.perf_counter() - started
+    entries = sum(len(inode.granted) for inode in inodes)
+    print(f"{args.sessions} sessions x {count} checks: {seconds * 1000:.1f} ms, "
+          f"{entries} rights cached in all")
+
+    fs = forks[0]
+    owner = users[0]
+    fs.writable("/Shares/team/file0.txt").chown(owner.name)
+    changed = fs.lookup("/Shares/team/file0.txt")
+    changed.set_acl([("DESKTOP-PC234\\User", True, access.ALL)])
+    assert access.permits(owner, changed, READ | WRITE)
+    assert not access.permits(owner, template.lookup("/Shares/team/file0.txt"), WRITE)
+    kept = sum(1 for inode in inodes if inode.granted)
+    print(f"after takeown + icacls in one session: {kept}/{len(inodes)} template caches kept, "
+          f"{len(changed.granted)} right cached on its own copy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import io
+import os
+import subprocess
+import timeit
+
+from cli_lab import session, term
+
+# Cost of one screen clear: spawning 'clear' the way the Windows levels used
+# to versus writing the ANSI sequence into the session output.
+
+ROUNDS = 200
+
+
+def clear_with_fork():
+    subprocess.run(["cls" if os.name == "nt" else "clear"], shell=os.name == "nt",
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    fork_us = timeit.timeit(clear_with_fork, number=ROUNDS) / ROUNDS * 1e6
+
+    console = session.ConsoleIO()
+    console.terminal = term.ANSI
+    console.output.sink = io.StringIO().write
+    with session.use(console):
+        ansi_us = timeit.timeit(session.clear, number=ROUNDS * 100) / (ROUNDS * 100) * 1e6
+
+    print(f"fork 'clear':    {fork_us:>10.1f} us/clear")
+    print(f"ANSI in-process: {ansi_us:>10.3f} us/clear ({fork_us / ansi_us:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
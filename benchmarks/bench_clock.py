@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import importlib
+import threading
+import time
+
+from cli_lab import clock, headless
+
+# What simulated delays cost. Headless: windows/4's paced ping and tracert
+# replayed, with the virtual seconds they account for against the real time
+# taken. Paced: one worker thread writes the paced reply of every session
+# through its Pacer, as NetworkIO does, against sleeping through it.
+
+TRANSCRIPT = ["ping {target_ip}", "tracert {target_ip}", "netstat -an", "exit"]
+# Lines per paced reply and the pause between them
+LINES = 4
+PACE = 0.25
+
+
+def headless_run(rounds):
+    level = importlib.import_module("cli_lab.levels.windows.level4_networking").LEVEL
+    virtual = real = 0.0
+    for seed in range(rounds):
+        target = level.variant(seed).vars["target_ip"]
+        lines = [line.format(target_ip=target) for line in TRANSCRIPT]
+        started = time.perf_counter()
+        result = headless.run_script("windows/4", lines, echo=False, seed=seed)
+        real += time.perf_counter() - started
+        virtual += result.paused
+    return virtual, real
+
+
+async def paced(sessions):
+    loop = asyncio.get_running_loop()
+    pacers = [clock.Pacer(loop) for _ in range(sessions)]
+    delivered = [0]
+    done = asyncio.Event()
+
+    def deliver():
+        delivered[0] += 1
+        if delivered[0] == sessions * LINES:
+            done.set()
+
+    def worker():
+        for pacer in pacers:
+            for number in range(LINES):
+                if number:
+                    pacer.delay(PACE)
+                pacer.call(deliver)
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    await loop.run_in_executor(None, thread.join)
+    busy = time.perf_counter() - started
+    await done.wait()
+    return busy, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    virtual, real = headless_run(args.rounds)
+    print(f"headless windows/4: {virtual:.1f} virtual seconds of pauses in {real * 1000:.1f} ms "
+          f"over {args.rounds} runs")
+
+    busy, wall = asyncio.run(paced(args.sessions))
+    sleeping = args.sessions * (LINES - 1) * PACE
+    print(f"paced output for {args.sessions} sessions: worker busy {busy * 1000:.1f} ms, "
+          f"all delivered after {wall:.2f}s (sleeping: {sleeping:.0f}s of worker time)")
+
+
+if __name__ == "__main__":
+    main()
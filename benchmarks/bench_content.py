@@ -0,0 +1,81 @@
+import argparse
+import concurrent.futures
+import os
+import tempfile
+
+from cli_lab import search
+from cli_lab.content import Blob, ContentStore
+from cli_lab.vfs import VirtualFS
+
+# Resident memory of sessions and worker processes holding a large asset.
+# The asset is written to a content store and mapped as a Blob; each session
+# forks a template holding it and greps it, and each worker process maps it
+# and greps it too. Private (anonymous) memory should stay flat while the
+# asset is counted once in the page cache.
+
+
+def memory_kb():
+    # (rss, pss, anonymous) of this process in kB, from /proc
+    fields = {}
+    with open("/proc/self/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return fields["Rss"], fields["Pss"], fields.get("Anonymous", 0)
+
+
+def build_asset(store, megabytes):
+    line = "2025-10-04 12:01:10 sshd[811]: Failed password for root from 10.0.0.7 port 52114\n"
+    chunk = line * (1024 * 1024 // len(line))
+    blob = None
+    for _ in range(megabytes):
+        piece = store.put(chunk)
+        blob = piece if blob is None else Blob(store.path, blob.offset, blob.length + piece.length)
+    return blob
+
+
+def grep(blob):
+    matcher = search.compile_pattern(("port 52114",))
+    return sum(1 for _ in search.scan(blob, matcher))
+
+
+def worker(path, length):
+    blob = Blob(path, 0, length)
+    hits = grep(blob)
+    return hits, memory_kb()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ContentStore(os.path.join(directory, "assets.bin"))
+        blob = build_asset(store, args.megabytes)
+        store.close()
+
+        template = VirtualFS(home="/home/user")
+        template.add_file("/var/log/auth.log", blob)
+        rss, pss, anonymous = memory_kb()
+        print(f"asset: {len(blob) / 1024 / 1024:.0f} MB mapped from {store.path}")
+        print(f"before sessions:     rss {rss / 1024:7.1f} MB  anonymous {anonymous / 1024:7.1f} MB")
+
+        sessions = [template.fork() for _ in range(args.sessions)]
+        for fs in sessions[:8]:
+            grep(fs.lookup("/var/log/auth.log").content)
+        rss, pss, anonymous = memory_kb()
+        print(f"{args.sessions} sessions:      rss {rss / 1024:7.1f} MB  anonymous {anonymous / 1024:7.1f} MB")
+
+        with concurrent.futures.ProcessPoolExecutor(args.workers) as pool:
+            results = list(pool.map(worker, [blob.path] * args.workers, [blob.length] * args.workers))
+        for number, (hits, (rss, pss, anonymous)) in enumerate(results, 1):
+            print(f"worker {number}: {hits:,} hits  rss {rss / 1024:7.1f} MB  pss {pss / 1024:7.1f} MB"
+                  f"  anonymous {anonymous / 1024:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
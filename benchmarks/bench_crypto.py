@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from cli_lab import crypto
+from cli_lab.content import ContentStore
+
+# Hashing and encoding a large mapped asset. Every operation streams the
+# blob in chunks, so the peak of Python allocations stays around a chunk
+# however large the blob is. Then a class of students hashes the same file
+# at the same time: with the digest cache it is hashed once.
+
+
+def peak(function, *args):
+    # (result, seconds, peak bytes allocated while it ran); timed without
+    # tracemalloc, which slows allocation down
+    started = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    function(*args)
+    _, high = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, high
+
+
+def encode(blob):
+    return sum(1 for _ in crypto.b64encode_lines(crypto.chunks(blob)))
+
+
+def round_trip(blob):
+    # Encoded lines decoded again, without keeping either
+    lines = crypto.b64encode_lines(crypto.chunks(blob))
+    return sum(len(chunk) for chunk in crypto.b64decode_chunks(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=32)
+    parser.add_argument("--students", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ContentStore(os.path.join(directory, "assets.bin"))
+        blob = store.put(os.urandom(1 << 20) * args.megabytes)
+        store.close()
+        size = f"{args.megabytes} MB"
+
+        digest, seconds, high = peak(lambda: crypto.hash_chunks(crypto.chunks(blob)))
+        print(f"sha256 of {size}: {seconds * 1000:.0f} ms, peak {high / 1024:.0f} KiB")
+        lines, seconds, high = peak(encode, blob)
+        print(f"base64 -> {lines} lines: {seconds * 1000:.0f} ms, peak {high / 1024:.0f} KiB")
+        length, seconds, high = peak(round_trip, blob)
+        assert length == len(blob)
+        print(f"encode + decode: {seconds * 1000:.0f} ms, peak {high / 1024:.0f} KiB")
+
+        cache = crypto.DigestCache()
+        barrier = threading.Barrier(args.students)
+        results = []
+
+        def student():
+            barrier.wait()
+            results.append(cache.get(blob, "sha256"))
+
+        threads = [threading.Thread(target=student) for _ in range(args.students)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        assert set(results) == {digest}
+        print(f"{args.students} students hashing it at once: {seconds * 1000:.0f} ms, "
+              f"{cache.computed} hash computed")
+
+
+if __name__ == "__main__":
+    main()
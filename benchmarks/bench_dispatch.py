@@ -0,0 +1,44 @@
+import timeit
+
+from cli_lab.dispatch import CommandRegistry
+
+# Compares per-command cost of the registry with the startswith() ladders the
+# levels used before, as the number of supported commands grows.
+
+SIZES = (10, 100, 1000, 10000)
+ROUNDS = 20000
+
+
+def build_registry(size):
+    registry = CommandRegistry()
+    for i in range(size):
+        registry.register(f"cmd{i}", lambda state, args: None)
+    return registry
+
+
+def build_ladder(size):
+    prefixes = [f"cmd{i} " for i in range(size)]
+
+    def dispatch(line):
+        for prefix in prefixes:
+            if line.startswith(prefix):
+                return prefix
+        return None
+
+    return dispatch
+
+
+def main():
+    print(f"{'commands':>10} {'registry ns/cmd':>16} {'if/elif ns/cmd':>16}")
+    for size in SIZES:
+        line = f"cmd{size - 1} some/file.txt"
+        registry = build_registry(size)
+        ladder = build_ladder(size)
+        registry_ns = timeit.timeit(lambda: registry.dispatch(None, line), number=ROUNDS) / ROUNDS * 1e9
+        ladder_rounds = max(ROUNDS // size, 10)
+        ladder_ns = timeit.timeit(lambda: ladder(line), number=ladder_rounds) / ladder_rounds * 1e9
+        print(f"{size:>10} {registry_ns:>16.0f} {ladder_ns:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import time
+
+from cli_lab import access, find
+from cli_lab.vfs import VirtualFS
+
+# Builds a template with hundreds of thousands of entries, forks a session
+# from it and times typical find queries against a full tree walk, checking
+# that both give the same answer. find uses the shared index when it narrows
+# the search enough and walks otherwise. The fork changes a few files first,
+# so the changed paths are searched too.
+
+QUERIES = [
+    "/ -perm -4000 -type f",
+    "/ -perm /6000",
+    "/usr -user svc3",
+    "/var/log -name *.gz",
+    "/ -name *.conf -size +1",
+    "/home/user -type f",
+]
+
+
+def build(directories, files):
+    fs = VirtualFS(home="/home/user")
+    fs.mkdir("/home/user", owner="user", group="user")
+    for d in range(directories):
+        for f in range(files):
+            fs.add_file(f"/usr/share/pkg{d}/file{f}.dat", "x", owner=f"svc{d % 7}")
+            fs.add_file(f"/var/log/app{d}/log{f}.gz", "x" * 600)
+        fs.add_file(f"/etc/pkg{d}.conf", "x" * 900)
+        fs.add_file(f"/usr/bin/tool{d}", "", mode=0o4755 if d % 1000 == 0 else 0o755)
+    return fs
+
+
+def timed(search, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = list(search())
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--directories", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    template = build(args.directories, args.files)
+    print(f"built template in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    index, _ = template.index()
+    print(f"indexed {len(index):,} entries in {time.perf_counter() - started:.2f}s")
+
+    fs = template.fork()
+    fs.writable("/usr/bin/tool1").chmod(0o4755)
+    fs.add_file("/home/user/backdoor", "", mode=0o4755, owner="user", group="user")
+    fs.writable("/usr/share/pkg0/file0.dat").chown("svc3")
+
+    for line in QUERIES:
+        query = find.parse(tuple(line.split()))
+        found, result = timed(lambda: find.search(fs, query), args.rounds)
+        walked, expected = timed(lambda: find._walk(fs.lookup(query.paths[0]), query.paths[0], {}, query,
+                                                    access.principal("root")), args.rounds)
+        assert sorted(path for _, path in result) == sorted(expected), line
+        print(f"find {line:<26} {len(result):>7,} hits  find {found * 1000:8.2f} ms"
+              f"  walk {walked * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import io
+import os
+import resource
+import tempfile
+
+from cli_lab.grader import grade, iter_directory
+
+# Grades a synthetic batch of Linux level 2 transcripts with 1..N worker
+# processes and reports throughput and peak resident memory.
+
+TRANSCRIPT = """ls -l
+sudo cat locked.log
+sudo cat /srv/team/shared_notes.txt
+cd /var/shared
+touch proof.txt
+helper_script
+sudo chown service:service /etc/service/config.json
+find / -perm -4000 -type f 2>/dev/null
+suid_tool
+exit
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transcripts", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(args.transcripts):
+            with open(os.path.join(directory, f"student{i}.txt"), "w") as transcript:
+                transcript.write(TRANSCRIPT if i % 3 else TRANSCRIPT.replace("suid_tool\n", ""))
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            summary = grade(iter_directory("linux/2", directory), io.StringIO(), workers)
+            print(f"workers={workers:<3} {summary}")
+            workers *= 2
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(f"peak RSS: parent {peak / 1024:.1f} MB, largest worker {children / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import random
+import time
+
+from cli_lab.leaderboard import Leaderboard
+
+# A timed event with many players: completion results for a few boards are
+# fed to the leaderboard in random order while the top 10 is read after
+# every batch, as the live view would. Reading is compared with ranking the
+# best result of every player from scratch, which is what the top k would
+# cost without the heaps.
+
+BOARDS = ["linux/1", "linux/2", "linux/2 challenge 3", "windows/4"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--results", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    source = random.Random(0)
+    results = [(f"player{source.randrange(args.players)}", source.choice(BOARDS),
+                source.uniform(30, 3600), source.randint(5, 400)) for _ in range(args.results)]
+
+    board = Leaderboard()
+    ingest = query = 0.0
+    queries = 0
+    for start in range(0, len(results), args.batch):
+        started = time.perf_counter()
+        for result in results[start:start + args.batch]:
+            board.record(*result)
+        ingest += time.perf_counter() - started
+        started = time.perf_counter()
+        for name in BOARDS:
+            board.top(name, "time", args.top)
+            board.top(name, "commands", args.top)
+            queries += 2
+        query += time.perf_counter() - started
+
+    started = time.perf_counter()
+    for name in BOARDS:
+        for metric in ("time", "commands"):
+            ranking = board.rankings[name, metric]
+            rescanned = sorted(ranking.best.items(), key=lambda item: item[1])[:args.top]
+            assert [score for _, score in rescanned] == [score for _, score in board.top(name, metric, args.top)]
+    rescan = (time.perf_counter() - started) / (len(BOARDS) * 2)
+
+    players = max(len(board.rankings[name, "time"]) for name in BOARDS)
+    print(f"{args.results} results from {args.players} players ({players} on the largest board)")
+    print(f"ingest:            {ingest / args.results * 1e6:8.2f} us per result")
+    print(f"top {args.top} (heap):     {query / queries * 1e6:8.2f} us per query")
+    print(f"top {args.top} (rescan):   {rescan * 1e6:8.2f} us per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import glob
+import json
+import os
+import pickle
+import time
+
+from cli_lab import levelspec
+
+# Compares compiling each declarative level from its JSON source with loading
+# the pickled result levelspec.load() keeps in __pycache__.
+
+SPECS = os.path.join(os.path.dirname(levelspec.__file__), "levels", "*", "*.json")
+
+
+def per_call(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'level':<28}{'compile':>12}{'cached':>12}")
+    for path in sorted(glob.glob(SPECS)):
+        with open(path, "rb") as source:
+            data = source.read()
+        name = os.path.basename(path)
+        compiled = pickle.dumps(levelspec.compile_spec(json.loads(data), name), pickle.HIGHEST_PROTOCOL)
+
+        cold = per_call(lambda: levelspec.compile_spec(json.loads(data), name), args.repeat)
+        warm = per_call(lambda: pickle.loads(compiled), args.repeat)
+        print(f"{name:<28}{cold * 1e6:>9.1f} us{warm * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
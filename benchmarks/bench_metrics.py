@@ -0,0 +1,59 @@
+import argparse
+import time
+
+from cli_lab import headless, metrics
+
+# Overhead of the dispatch metrics in the headless driver: the same
+# transcripts are replayed with recording on and off, alternating, and the
+# best time of each is compared.
+
+TRANSCRIPTS = {
+    "linux/2": [
+        "ls -l",
+        "sudo cat locked.log",
+        "sudo cat /srv/team/shared_notes.txt",
+        "cd /var/shared",
+        "touch proof.txt",
+        "helper_script",
+        "sudo chown service:service /etc/service/config.json",
+        "cat /etc/service/config.json",
+        "find / -perm -4000 -type f 2>/dev/null",
+        "suid_tool",
+        "frobnicate",
+        "ls -la /etc | grep service",
+        "exit",
+    ],
+    "windows/3": ["dir", "cd Documents", "dir /s", "frobnicate", "findstr /s /i password *", "cd ..", "exit"],
+}
+
+
+def replay(level, lines, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        headless.run_script(level, lines, echo=False, seed=1)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    collector = metrics.Metrics()
+    for level, lines in TRANSCRIPTS.items():
+        replay(level, lines, 5)
+        timings = {"off": float("inf"), "on": float("inf")}
+        for _ in range(args.repeat):
+            for mode in ("off", "on"):
+                metrics.COLLECTOR = collector if mode == "on" else None
+                timings[mode] = min(timings[mode], replay(level, lines, args.rounds))
+        metrics.COLLECTOR = collector
+        commands = args.rounds * len(lines)
+        overhead = (timings["on"] - timings["off"]) / timings["off"] * 100
+        print(f"{level:<10} off {timings['off'] / commands * 1e6:7.2f} us/cmd   "
+              f"on {timings['on'] / commands * 1e6:7.2f} us/cmd   overhead {overhead:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
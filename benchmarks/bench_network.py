@@ -0,0 +1,98 @@
+import argparse
+import random
+import time
+
+from cli_lab import network
+
+# Routing and scanning on a large simulated network: routers in a ring with
+# random shortcuts, a /24 per subnet spread over them and hosts listening
+# on a few common ports. Routes are timed cold (one router's table built on
+# the way) and warm, a link change is checked for how many tables it keeps,
+# and a port scan over every host is timed against probing each host and
+# port in turn.
+
+SERVICES = ((22, "ssh"), (25, "smtp"), (53, "domain"), (80, "http"), (443, "https"),
+            (3306, "mysql"), (5432, "postgresql"), (8080, "http-proxy"))
+
+
+def build(routers, subnets, hosts, rng):
+    net = network.Network()
+    names = [f"r{number}" for number in range(routers)]
+    for number, name in enumerate(names):
+        net.add_router(name, f"10.{number // 256}.{number % 256}.1")
+    for number in range(routers):
+        net.link(names[number], names[(number + 1) % routers], rng.uniform(1, 10))
+    for _ in range(routers):
+        first, second = rng.sample(names, 2)
+        net.link(first, second, rng.uniform(5, 40))
+    for number in range(subnets):
+        net.add_subnet(f"172.{16 + number // 256}.{number % 256}.0/24", rng.choice(names))
+    for number in range(hosts):
+        subnet = number % subnets
+        address = f"172.{16 + subnet // 256}.{subnet % 256}.{2 + number // subnets}"
+        net.add_host("", address, rng.sample(SERVICES, rng.randint(0, 3)))
+    return net
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routers", type=int, default=200)
+    parser.add_argument("--subnets", type=int, default=512)
+    parser.add_argument("--hosts", type=int, default=20000)
+    parser.add_argument("--routes", type=int, default=20000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    net, seconds = timed(build, args.routers, args.subnets, args.hosts, rng)
+    print(f"built {args.routers} routers, {args.subnets} subnets, {args.hosts} hosts in {seconds * 1000:.0f} ms")
+    hosts = [host for host in net.hosts if not host.router]
+    source = hosts[0]
+
+    _, cold = timed(net.route, source, hosts[-1])
+    _, precompute = timed(net.precompute)
+    pairs = [(rng.choice(hosts), rng.choice(hosts)) for _ in range(args.routes)]
+    started = time.perf_counter()
+    hops = sum(len(net.route(one, other).hops) for one, other in pairs)
+    warm = (time.perf_counter() - started) / len(pairs)
+    print(f"route: cold {cold * 1e6:.0f} us, all {args.routers} tables {precompute * 1000:.1f} ms, "
+          f"then {warm * 1e6:.2f} us per route ({hops / len(pairs):.1f} hops)")
+
+    tables = len(net.tables)
+    net.link("r0", f"r{args.routers // 2}", 1000.0)
+    kept_slow = len(net.tables)
+    net.unlink("r0", f"r{args.routers // 2}")
+    net.link("r0", f"r{args.routers // 2}", 0.5)
+    kept_fast = len(net.tables)
+    print(f"link changes: a slow link keeps {kept_slow}/{tables} tables, "
+          f"a shortcut keeps {kept_fast}/{tables}")
+
+    first, last = network.parse_address("172.16.0.0"), network.parse_address("172.31.255.255")
+    found, bitset = timed(net.scan, source, first, last, ((1, 65535),))
+    open_ports = sum(len(ports) for _, ports in found)
+    reachable = net.reachable(source)
+
+    def probe(low, high):
+        count = 0
+        for host in hosts:
+            if host.address < first or host.address > last or not reachable >> host.index & 1:
+                continue
+            for port in range(low, high + 1):
+                if port in host.services:
+                    count += 1
+        return count
+
+    probed, naive = timed(probe, 1, 1024)
+    naive_full = naive * 65535 / 1024
+    print(f"scan of {len(found)} hosts x 65535 ports: bitsets {bitset * 1000:.1f} ms ({open_ports} open), "
+          f"probing each {naive * 1000:.0f} ms for ports 1-1024 alone (~{naive_full:.0f} s for all)")
+    assert probed == sum(1 for _, ports in found for port in ports if port <= 1024)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from cli_lab import shell
+
+# Parses the lines of a typical graded transcript repeatedly, once with the
+# LRU parse cache and once bypassing it, and reports the cost per line.
+
+LINES = [
+    "ls -l",
+    "sudo cat locked.log",
+    "cd /var/shared && touch proof.txt",
+    "sudo chown service:service /etc/service/config.json",
+    "find / -perm -4000 -type f 2>/dev/null",
+    "cat /var/log/syslog | grep -i 'failed password' | head -5 > /tmp/hits.txt",
+    'echo "it\'s a \\"quoted\\" word"; pwd',
+]
+CMD_LINES = [
+    'takeown /f "secret.txt" && icacls secret.txt /grant User:(F)',
+    "type system.log | findstr /i FLAG",
+    "certutil -decode flag.b64 flag.txt & type flag.txt",
+]
+
+
+def per_line(parse, lines, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for line, dialect in lines:
+            parse(line, dialect)
+    return (time.perf_counter() - started) / (rounds * len(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    lines = [(line, shell.POSIX) for line in LINES] + [(line, shell.CMD) for line in CMD_LINES]
+    uncached = per_line(shell.parse.__wrapped__, lines, args.rounds // 10)
+    cached = per_line(shell.parse, lines, args.rounds)
+    print(f"uncached parse: {uncached * 1e6:6.2f} us/line")
+    print(f"cached parse:   {cached * 1e6:6.2f} us/line ({uncached / cached:.0f}x)")
+    print(shell.parse.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import tempfile
+import time
+
+from cli_lab import persist
+from cli_lab.levels.linux import level1_intro, level2_permissions as linux_level2
+from cli_lab.levels.windows import level2_permissions as win_level2, level5_cryptography
+from cli_lab.session import ScriptIO, use
+
+# Cost of checkpointing and resuming a session. Each level plays a few
+# commands that change its files, then a checkpoint (snapshot written and
+# renamed) and a resume (snapshot read, instance rebuilt from its seed,
+# state restored) are timed. Journal appends are timed with their batched
+# fsync against an fsync per line.
+
+LEVELS = {
+    "linux/1": (level1_intro.__file__, level1_intro.POOL, level1_intro.LOCAL_COMMANDS,
+                ["cat notes.txt", "echo hi > hello.txt", "cd Documents"]),
+    "linux/2": (linux_level2.__file__, linux_level2.POOL, linux_level2.COMMANDS,
+                ["sudo cat locked.log", "cd /var/shared", "touch proof.txt",
+                 "sudo chown service:service /etc/service/config.json"]),
+    "windows/2": (win_level2.LEVEL.path, win_level2.LEVEL.pool, win_level2.COMMANDS,
+                  ["takeown /f secret.txt", "echo notes > notes.txt"]),
+    "windows/5": (level5_cryptography.LEVEL.path, level5_cryptography.LEVEL.pool,
+                  level5_cryptography.COMMANDS, ["certutil -decode flag.b64 out.txt"]),
+}
+
+
+def best(function, rounds):
+    fastest = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        fastest = min(fastest, time.perf_counter() - started)
+    return fastest
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        slot = persist.SaveSlot(directory)
+        for name, (module_file, pool, commands, script) in LEVELS.items():
+            seed, state = pool.take(1)
+            with use(ScriptIO(())):
+                for line in script:
+                    commands.dispatch(state, line)
+
+            save = slot.level(persist.level_key(module_file))
+            save.start(seed, state)
+            checkpoint = best(lambda: save.checkpoint(state), args.rounds)
+
+            def resume():
+                seed, _, fields, _ = save.load()
+                _, restored = pool.take(seed)
+                restored.restore(fields)
+                return restored
+            resumed = best(resume, args.rounds)
+            restored = resume()
+            assert restored.save() == state.save(), name
+            size = len(persist.encode(seed, 0, state.save()))
+            print(f"{name:<10} snapshot {size:5} B  checkpoint {checkpoint * 1e6:7.1f} us"
+                  f"  resume {resumed * 1e6:7.1f} us")
+            save.close()
+
+        for label, sync_lines in (("batched fsync", persist.SYNC_LINES), ("fsync per line", 1)):
+            journal = persist.Journal(f"{directory}/bench.journal", sync_lines=sync_lines)
+            started = time.perf_counter()
+            for number in range(args.lines):
+                journal.append(f"cat file{number}.txt")
+            journal.close()
+            elapsed = time.perf_counter() - started
+            print(f"journal, {label + ':':<16} {elapsed / args.lines * 1e6:8.1f} us per line")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import time
+
+from cli_lab import session
+from cli_lab.levels.linux.level1_intro import LOCAL_COMMANDS, Level1State
+
+# Runs 'cat big.log | grep ... | head -5' against a multi-megabyte log in the
+# virtual filesystem, next to a 'grep' that has to read the whole file, to
+# show that head stops every stage before it once it has its lines.
+
+
+def timed(state, line, rounds):
+    best = float("inf")
+    with session.capture():
+        for _ in range(rounds):
+            started = time.perf_counter()
+            LOCAL_COMMANDS.dispatch(state, line)
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    state = Level1State(0)
+    line = "12:01:10 sshd[811]: Failed password for root from 10.0.0.7 port 52114\n"
+    count = args.megabytes * 1024 * 1024 // len(line)
+    state.fs.add_file("big.log", line * count, owner=state.user, group=state.user, cwd=state.cwd)
+    print(f"big.log: {count:,} lines, {args.megabytes} MB")
+
+    full = timed(state, "grep Failed big.log | tail -1", args.rounds)
+    early = timed(state, "cat big.log | grep Failed | head -5", args.rounds)
+    print(f"grep | tail -1 (whole file): {full * 1000:9.2f} ms")
+    print(f"cat | grep | head -5:        {early * 1000:9.2f} ms ({full / early:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import time
+
+from cli_lab import search
+
+# Searches a generated log of --megabytes (100MB by default) the way grep
+# does and compares it with splitting the body into lines. The first literal
+# search scans everything, the second builds the shared trigram index and
+# the rest only scan the blocks that can match.
+
+SEARCHES = [
+    ("literal", ("FLAG_KEY",), {}),
+    ("literal -i", ("flag_key",), {"ignore_case": True}),
+    ("regex", (r"port 6553[0-9]$",), {"basic": False}),
+]
+
+
+def build(megabytes):
+    lines = []
+    size = 0
+    number = 0
+    while size < megabytes * 1024 * 1024:
+        status = "Failed" if number % 13 == 0 else "Accepted"
+        line = (f"2025-10-04 12:{number // 3600 % 60:02d}:{number // 60 % 60:02d} host{number % 97} "
+                f"sshd[{number % 9999}]: {status} password for user{number % 501} "
+                f"from 10.0.{number % 255}.{number % 253} port {number % 65536}")
+        lines.append(line)
+        size += len(line) + 1
+        number += 1
+    # A handful of needles spread through the haystack
+    for position in range(0, len(lines), len(lines) // 5):
+        lines[position] = f"2025-10-04 13:37:00 ALERT FLAG_KEY:HUNT3R_{position}"
+    return "\n".join(lines) + "\n"
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=100)
+    args = parser.parse_args()
+
+    log = build(args.megabytes)
+    # What a file's content_id() would be
+    log_id = object()
+    print(f"log: {len(log) / 1024 / 1024:.0f} MB, {log.count(chr(10)):,} lines")
+
+    seconds, hits = timed(lambda: [line for line in log.split("\n") if "FLAG_KEY" in line])
+    print(f"split + 'in' per line:      {seconds * 1000:9.1f} ms  {len(hits)} hits")
+
+    matcher = search.compile_pattern(("FLAG_KEY",))
+    for label in ("first scan", "index build + scan", "indexed scan"):
+        seconds, hits = timed(lambda: list(search.scan(log, matcher, content_id=log_id)))
+        print(f"literal, {label + ':':<18} {seconds * 1000:9.1f} ms  {len(hits)} hits")
+
+    port = search.compile_pattern(("port",))
+    seconds, first = timed(lambda: next(search.scan(log, port, content_id=log_id)))
+    print(f"first hit of a common word: {seconds * 1000:9.3f} ms")
+
+    for label, patterns, options in SEARCHES:
+        matcher = search.compile_pattern(patterns, **options)
+        seconds, hits = timed(lambda: list(search.scan(log, matcher, content_id=log_id)))
+        print(f"{label + ':':<27} {seconds * 1000:9.1f} ms  {len(hits)} hits")
+
+    seconds, count = timed(lambda: sum(1 for _ in search.scan(log, search.compile_pattern(("Accepted",)),
+                                                              invert=True, content_id=log_id)))
+    print(f"{'-v -c Accepted:':<27} {seconds * 1000:9.1f} ms  {count} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import copy
+import gc
+import tracemalloc
+
+from cli_lab.levels.linux import level1_intro, level2_permissions as linux_level2
+from cli_lab.levels.windows import (
+    level1_recon,
+    level2_permissions as win_level2,
+    level3_searching,
+    level4_networking,
+    level5_cryptography,
+)
+
+# Reports how many bytes each live session costs per level. Sessions fork the
+# level's shared template, so this should stay at a few hundred bytes no
+# matter how large the template tree is. For comparison it also measures a
+# private deep copy of the template per session, which is what every session
+# used to build for itself. Each session is a different variant; levels whose
+# spec has "variants" compile a template per variant, which shows here.
+# Levels with a network fork its shared part too and only add the hosts of
+# their instance, which the deep copy column leaves out.
+
+STATES = {
+    "linux/1": level1_intro.Level1State,
+    "linux/2": linux_level2.Level2State,
+    "windows/1": level1_recon.LEVEL.make,
+    "windows/2": win_level2.LEVEL.make,
+    "windows/3": level3_searching.LEVEL.make,
+    "windows/4": level4_networking.LEVEL.make,
+    "windows/5": level5_cryptography.LEVEL.make,
+}
+
+
+def bytes_per_session(factory, sessions):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live = [factory(seed) for seed in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del live
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'level':<12}{'fork':>12}{'deep copy':>14}")
+    for level, factory in STATES.items():
+        state = factory(0)
+        forked = bytes_per_session(factory, args.sessions)
+        copied = bytes_per_session(lambda seed: copy.deepcopy(state.fs.root), args.sessions)
+        print(f"{level:<12}{forked:>10.0f} B{copied:>12.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Cold-start budget for the menu and the Docker entrypoint. The menu budget
+# is the cumulative `python -X importtime` cost of cli_lab.main; the
+# entrypoint budget is the wall time of `python -m cli_lab.main` choosing
+# "0) Exit", minus a bare interpreter start. No level module may be imported
+# before a level is picked. Exits 1 when a budget is exceeded.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def python(*args, stdin=None):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, *args], input=stdin, capture_output=True,
+                          text=True, env=env, cwd=ROOT, check=True)
+
+
+def import_times():
+    # (module, self us, cumulative us) per line of -X importtime output
+    rows = []
+    for line in python("-X", "importtime", "-c", "import cli_lab.main").stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            rows.append((module.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def best_wall_time(runs, *args, stdin=None):
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        python(*args, stdin=stdin)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--menu-budget-ms", type=float, default=20.0)
+    parser.add_argument("--entrypoint-budget-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    rows = import_times()
+    menu_ms = next(cumulative for module, _, cumulative in rows if module == "cli_lab.main") / 1000
+    print(f"import cli_lab.main: {menu_ms:.1f} ms cumulative (budget {args.menu_budget_ms:.0f} ms)")
+    print("slowest imports (self time):")
+    for module, own, _ in sorted(rows, key=lambda row: row[1], reverse=True)[:8]:
+        print(f"  {own / 1000:7.2f} ms  {module}")
+
+    levels = [module for module, _, _ in rows if module.startswith("cli_lab.levels.")]
+    if levels:
+        print(f"level modules imported by the menu: {', '.join(levels)}")
+
+    baseline = best_wall_time(args.runs, "-c", "pass")
+    entrypoint = best_wall_time(args.runs, "-m", "cli_lab.main", stdin="0\n")
+    entrypoint_ms = (entrypoint - baseline) * 1000
+    print(f"python -m cli_lab.main: {entrypoint * 1000:.1f} ms wall, {entrypoint_ms:.1f} ms over a bare "
+          f"interpreter (budget {args.entrypoint_budget_ms:.0f} ms)")
+
+    over = levels or menu_ms > args.menu_budget_ms or entrypoint_ms > args.entrypoint_budget_ms
+    print("FAIL: cold start over budget" if over else "OK: cold start within budget")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
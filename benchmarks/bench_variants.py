@@ -0,0 +1,61 @@
+import argparse
+import statistics
+import time
+
+from cli_lab.levels.linux import level1_intro, level2_permissions as linux_level2
+from cli_lab.levels.windows import (
+    level1_recon,
+    level2_permissions as win_level2,
+    level3_searching,
+    level4_networking,
+    level5_cryptography,
+)
+
+# Session start latency with and without the variant pools. Building an
+# instance in place compiles the level's variant and forks its filesystem;
+# taking one from a warm pool is a queue get. Sessions arrive every
+# --interval seconds, like players connecting to the server.
+
+POOLS = {
+    "linux/1": level1_intro.POOL,
+    "linux/2": linux_level2.POOL,
+    "windows/1": level1_recon.LEVEL.pool,
+    "windows/2": win_level2.LEVEL.pool,
+    "windows/3": level3_searching.LEVEL.pool,
+    "windows/4": level4_networking.LEVEL.pool,
+    "windows/5": level5_cryptography.LEVEL.pool,
+}
+
+
+def timings(start, sessions, interval):
+    samples = []
+    for seed in range(sessions):
+        started = time.perf_counter()
+        start(seed)
+        samples.append(time.perf_counter() - started)
+        time.sleep(interval)
+    return samples
+
+
+def describe(samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"median {statistics.median(samples) * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.002)
+    args = parser.parse_args()
+
+    for level, pool in POOLS.items():
+        built = timings(pool.make, args.sessions, args.interval)
+        pool.take()
+        time.sleep(0.1)
+        taken = timings(lambda seed: pool.take(), args.sessions, args.interval)
+        print(f"{level:<10} built in place: {describe(built)}   from pool: {describe(taken)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import time
+import timeit
+
+from cli_lab.vfs import VirtualFS
+
+# Builds a level-sized tree with tens of thousands of files and times path
+# resolution and directory listing against it.
+
+DIRECTORIES = 200
+FILES_PER_DIRECTORY = 250
+ROUNDS = 100000
+
+
+def build():
+    fs = VirtualFS(home="/home/user")
+    for d in range(DIRECTORIES):
+        for f in range(FILES_PER_DIRECTORY):
+            fs.add_file(f"/var/log/app{d}/archive/part{f}.log", "x")
+    return fs
+
+
+def main():
+    started = time.perf_counter()
+    fs = build()
+    total = DIRECTORIES * FILES_PER_DIRECTORY
+    print(f"built {total} files in {time.perf_counter() - started:.2f}s")
+
+    lookups = [
+        ("absolute", "/var/log/app199/archive/part249.log", "/"),
+        ("relative", "archive/part10.log", "/var/log/app42"),
+        ("dotdot", "../app7/archive/part3.log", "/var/log/app42"),
+        ("home", "~/../../var/log/app1/archive/part1.log", "/"),
+    ]
+    for label, path, cwd in lookups:
+        assert fs.lookup(path, cwd) is not None, path
+        ns = timeit.timeit(lambda: fs.lookup(path, cwd), number=ROUNDS) / ROUNDS * 1e9
+        print(f"lookup {label:<9} {ns:>8.0f} ns")
+
+    directory = fs.lookup("/var/log/app0/archive")
+    ns = timeit.timeit(lambda: fs.listdir(directory), number=1000) / 1000 * 1e9
+    print(f"listdir ({FILES_PER_DIRECTORY} entries) {ns:>8.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import importlib
+import random
+import threading
+import time
+
+from cli_lab import world
+
+# Contention on a shared machine: every player is a thread logged in to the
+# same linux/2 machine, with /var/shared mounted into a filesystem of their
+# own. Mostly they read (look a file up, list the directory, run who), now
+# and then they create or remove a file of theirs. The machine is timed as
+# it is, with versioned maps readers don't lock, and with the same maps
+# behind one lock that readers take too. Reads that had to wait for that
+# lock are counted.
+
+SHARED = "/var/shared"
+
+
+class LockedMap(world.VersionedMap):
+    # A dict behind one lock, for readers as well as writers
+    __slots__ = ("waits",)
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self.waits = 0
+
+    def _read(self, function, *args):
+        if not self.lock.acquire(blocking=False):
+            self.waits += 1
+            self.lock.acquire()
+        try:
+            return function(*args)
+        finally:
+            self.lock.release()
+
+    def get(self, key, default=None):
+        return self._read(self.current.get, key, default)
+
+    def __contains__(self, key):
+        return self._read(self.current.__contains__, key)
+
+    def values(self):
+        return self._read(lambda: list(self.current.values()))
+
+    def snapshot(self):
+        return self._read(dict, self.current)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.current[key] = value
+
+    def pop(self, key, *default):
+        with self.lock:
+            return self.current.pop(key, *default)
+
+
+class LockedMachine(world.Machine):
+    mapping = LockedMap
+
+
+def player(machine, template, number, operations, writes, start, latencies, kept):
+    fs = template.fork()
+    member = machine.login(f"player{number}", fs, (SHARED,))
+    rng = random.Random(number)
+    mine = []
+    start.wait()
+    for operation in range(operations):
+        started = time.perf_counter()
+        if rng.random() < writes:
+            if len(mine) < 3:
+                path = f"{SHARED}/player{number}-{operation}.txt"
+                fs.add_file(path, owner=member.account, group=member.account)
+                mine.append(path)
+            else:
+                fs.remove(mine.pop(rng.randrange(len(mine))))
+            continue
+        kind = rng.random()
+        if kind < 0.6:
+            fs.lookup(f"{SHARED}/player{rng.randrange(number + 1)}-{rng.randrange(operation + 1)}.txt")
+        elif kind < 0.9:
+            sum(1 for _ in fs.lookup(SHARED).children.values())
+        else:
+            len(machine.logins.snapshot())
+        latencies.append(time.perf_counter() - started)
+    member.logout()
+    kept.append(len(mine))
+
+
+def run(machine, template, args):
+    start = threading.Barrier(args.players + 1)
+    latencies = []
+    kept = []
+    threads = [threading.Thread(target=player, args=(machine, template, number, args.operations,
+                                                      args.writes, start, latencies, kept))
+               for number in range(args.players)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    # No file created or removed got lost on the way
+    assert len(machine.shares.get(SHARED).children.snapshot()) == sum(kept) + 1
+    assert not machine.logins.snapshot()
+    return seconds, p99, latencies[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--writes", type=float, default=0.05)
+    args = parser.parse_args()
+    template = importlib.import_module("cli_lab.levels.linux.level2_permissions").TEMPLATE
+
+    for name, machine in (("versioned", world.Machine()), ("one lock", LockedMachine())):
+        seconds, p99, worst = run(machine, template, args)
+        total = args.players * args.operations
+        line = (f"{name:<9} {args.players} players, {total} operations: {seconds * 1000:.0f} ms "
+                f"({total / seconds:,.0f}/s), reads p99 {p99 * 1000:.2f} ms, worst {worst * 1000:.2f} ms")
+        if isinstance(machine.logins, LockedMap):
+            directory = machine.shares.get(SHARED)
+            waits = directory.children.waits + machine.logins.waits
+            line += f", {waits} reads waited on a lock"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from cli_lab.server import SessionServer
+
+# Drives many concurrent players through Linux level 1 over TCP and reports
+# how many sessions one process holds per core and the per-command latency.
+
+PROMPT_ENDINGS = (b"$ ", b": ", b"...")
+
+LEVEL_COMMANDS = [
+    "ls", "pwd", "whoami", "cd Flag", "ls", "cat Flag.txt", "cd ..",
+    "cat notes.txt", "cd Documents", "cat ssh_Username.txt", "cd ..", "challenge",
+]
+
+
+async def read_prompt(reader):
+    buffer = b""
+    while not buffer.endswith(PROMPT_ENDINGS):
+        chunk = await reader.read(4096)
+        if not chunk:
+            break
+        buffer += chunk
+    return buffer
+
+
+async def player(port, rounds, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    script = ["1", "1", "", ""] + LEVEL_COMMANDS * rounds + ["exit", "0", "0"]
+
+    await read_prompt(reader)
+    for line in script:
+        started = time.perf_counter()
+        writer.write(line.encode() + b"\r\n")
+        await writer.drain()
+        await read_prompt(reader)
+        latencies.append(time.perf_counter() - started)
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(sessions, rounds):
+    server = SessionServer("127.0.0.1", 0, max_sessions=sessions)
+    await server.start()
+    latencies = []
+
+    started = time.perf_counter()
+    await asyncio.gather(*(player(server.port, rounds, latencies) for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    await server.stop()
+
+    cores = os.cpu_count() or 1
+    latencies.sort()
+    print(f"sessions:           {sessions} ({sessions / cores:.0f} per core on {cores} cores)")
+    print(f"commands:           {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+    print(f"latency p50:        {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"latency p99:        {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    print(f"latency max:        {latencies[-1] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
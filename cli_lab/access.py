@@ -0,0 +1,237 @@
+import functools
+import re
+import stat
+import zlib
+
+from cli_lab.vfs import EXECUTE, READ, WRITE
+
+# Who may do what to a file. A Principal is a user as the checks see it: a
+# name with a uid, a primary group and the set of groups it belongs to.
+# Linux sessions are judged by the mode bits (setuid, setgid and the sticky
+# bit included); Windows sessions by the inode's ACL, a tuple of
+# (trustee, allow, rights) entries as icacls shows them, where denials win
+# over grants. A Windows file without an ACL has a null DACL: everyone may
+# do anything with it.
+#
+# effective() caches the rights of a principal on an inode in the inode
+# itself, so a check is a dict lookup whatever the rules behind it. Only
+# Inode.chmod(), chown() and set_acl() change what the cache depends on, and each
+# drops the cache of the one inode it changes. Template inodes are shared
+# by every session but never changed (a session changes its own copy), so
+# what one player works out is reused by the whole class.
+
+# Rights beyond vfs.READ, WRITE and EXECUTE
+DELETE = 8
+# Change the permissions (chmod, icacls /grant), WRITE_DAC on Windows
+CONTROL = 16
+# Take ownership (takeown), WRITE_OWNER on Windows
+TAKE = 32
+ALL = READ | WRITE | EXECUTE | DELETE | CONTROL | TAKE
+
+# icacls rights
+RIGHTS = {
+    "F": ALL,
+    "M": READ | WRITE | EXECUTE | DELETE,
+    "RX": READ | EXECUTE,
+    "WDAC": CONTROL,
+    "WO": TAKE,
+    "R": READ,
+    "W": WRITE,
+    "X": EXECUTE,
+    "D": DELETE,
+    "N": 0,
+}
+
+# Bits each class of a u+s style mode may set
+WHO = {"u": 0o4700, "g": 0o2070, "o": 0o1007, "a": 0o7777}
+PERMISSIONS = {"r": 0o444, "w": 0o222, "x": 0o111, "s": 0o6000, "t": 0o1000}
+SYMBOLIC = re.compile(r"([ugoa]*)([-+=])([rwxst]*)")
+
+USERS = {"root": 0, "daemon": 1, "service": 999, "user": 1000, "admin": 1001, "nobody": 65534}
+GROUPS = {"root": 0, "service": 999, "user": 1000, "investigators": 1001, "shared": 1002,
+          "nobody": 65534}
+
+
+class AccessError(ValueError):
+    pass
+
+
+def _number(table, name):
+    # Well-known ids from the table, a stable one derived from the name
+    # for everybody else
+    number = table.get(name)
+    return number if number is not None else 2000 + zlib.crc32(name.encode()) % 30000
+
+
+class Principal:
+    __slots__ = ("name", "uid", "group", "gid", "groups", "windows", "keys")
+
+    def __init__(self, name, group, groups, windows):
+        self.name = name
+        self.uid = _number(USERS, name)
+        self.group = group
+        self.gid = _number(GROUPS, group)
+        self.groups = frozenset((group, *groups))
+        self.windows = windows
+        # Lowercased names an ACL entry may grant or deny this principal
+        self.keys = frozenset(trustee_key(key) for key in (name, *self.groups, "Everyone"))
+
+    @property
+    def root(self):
+        return self.uid == 0 and not self.windows
+
+
+@functools.lru_cache(maxsize=None)
+def principal(name, group=None, groups=(), windows=False):
+    # The one Principal for these values, so principals compare and hash by
+    # identity; group defaults to the user's own group
+    return Principal(name, group or name, tuple(groups), windows)
+
+
+def trustee_key(name):
+    # "BUILTIN\Administrators" and "administrators" are the same trustee
+    return name.rpartition("\\")[2].lower()
+
+
+def apply_mode(mode, text):
+    # Permission bits after 'chmod text' on mode: octal ("4755") or
+    # symbolic clauses ("u+s,go-w"); raises AccessError
+    if text and len(text) <= 4 and all(char in "01234567" for char in text):
+        return int(text, 8)
+    for clause in text.split(","):
+        match = SYMBOLIC.fullmatch(clause)
+        if match is None:
+            raise AccessError(f"invalid mode: '{text}'")
+        who, op, permissions = match.groups()
+        mask = 0
+        for char in who or "a":
+            mask |= WHO[char]
+        bits = 0
+        for char in permissions:
+            bits |= PERMISSIONS[char] & mask
+        if op == "+":
+            mode |= bits
+        elif op == "-":
+            mode &= ~bits
+        else:
+            mode = mode & ~mask | bits
+    return mode & 0o7777
+
+
+# ACL entries
+
+def parse_ace(text, allow=True):
+    # ("User", True, rights) of "User:(F)" or "User:(R,W)"; icacls' own
+    # "(DENY)" marker makes it a denial
+    trustee, colon, rights = text.rpartition(":")
+    if not colon or not trustee:
+        raise AccessError(f"Invalid parameter \"{text}\"")
+    mask = 0
+    for part in rights.replace(")(", ",").strip("()").split(","):
+        part = part.strip().upper()
+        if part == "DENY":
+            allow = False
+        elif part in RIGHTS:
+            mask |= RIGHTS[part]
+        else:
+            raise AccessError(f"Invalid parameter \"{text}\"")
+    return trustee, allow, mask
+
+
+def format_rights(mask):
+    # The shortest icacls spelling of a rights mask
+    for name in ("F", "M", "RX", "R", "W"):
+        if RIGHTS[name] == mask:
+            return f"({name})"
+    parts = [name for name in ("R", "W", "X", "D", "WDAC", "WO") if mask & RIGHTS[name]]
+    return "(" + ",".join(parts or ["N"]) + ")"
+
+
+def format_ace(ace):
+    trustee, allow, mask = ace
+    return f"{trustee}:{'' if allow else '(DENY)'}{format_rights(mask)}"
+
+
+# Effective rights
+
+def effective(principal, inode):
+    # Rights mask of principal on inode, cached in the inode
+    granted = inode.granted
+    if granted is None:
+        granted = inode.granted = {}
+    mask = granted.get(principal)
+    if mask is None:
+        mask = granted[principal] = _evaluate(principal, inode)
+    return mask
+
+
+def permits(principal, inode, rights):
+    return effective(principal, inode) & rights == rights
+
+
+def _evaluate(principal, inode):
+    if inode.acl is not None:
+        allowed = denied = 0
+        for trustee, allow, mask in inode.acl:
+            if trustee_key(trustee) in principal.keys:
+                if allow:
+                    allowed |= mask
+                else:
+                    denied |= mask
+        mask = allowed & ~denied
+        if trustee_key(inode.owner) == trustee_key(principal.name):
+            # Owners may always change the permissions
+            mask |= CONTROL
+    elif principal.windows:
+        mask = ALL
+    elif principal.root:
+        # root may execute a file only if someone may
+        return ALL if inode.is_dir or inode.mode & 0o111 else ALL & ~EXECUTE
+    elif principal.name == inode.owner:
+        return inode.mode >> 6 & 7 | DELETE | CONTROL
+    elif inode.group in principal.groups:
+        return inode.mode >> 3 & 7 | DELETE
+    else:
+        return inode.mode & 7 | DELETE
+    if principal.windows and not inode.is_dir and not inode.mode & stat.S_IWUSR:
+        # The read-only attribute
+        mask &= ~(WRITE | DELETE)
+    return mask
+
+
+# Operations built on it
+
+def may_create(principal, directory):
+    return permits(principal, directory, WRITE | EXECUTE)
+
+
+def may_remove(principal, directory, inode):
+    # Removing inode from directory: with the sticky bit set, only the
+    # owner of either (or root) may
+    if not permits(principal, directory, WRITE | EXECUTE):
+        return False
+    if not principal.windows and directory.mode & stat.S_ISVTX:
+        return principal.root or principal.name in (inode.owner, directory.owner)
+    return permits(principal, inode, DELETE)
+
+
+def new_group(principal, directory):
+    # Group of a file created in directory: the directory's own when it is
+    # setgid, otherwise the creator's
+    if not principal.windows and directory.mode & stat.S_ISGID:
+        return directory.group
+    return principal.group
+
+
+def runs_as(caller, inode):
+    # The principal an executable runs as, or None when caller may not
+    # execute it: its owner when setuid, with its group added when setgid
+    if inode.is_dir or not permits(caller, inode, EXECUTE):
+        return None
+    if caller.windows or not inode.mode & (stat.S_ISUID | stat.S_ISGID):
+        return caller
+    name = inode.owner if inode.mode & stat.S_ISUID else caller.name
+    groups = sorted(caller.groups - {caller.group})
+    if inode.mode & stat.S_ISGID:
+        groups.append(inode.group)
+    return principal(name, caller.group, tuple(groups))
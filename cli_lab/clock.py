@@ -0,0 +1,110 @@
+import collections
+import datetime
+import heapq
+import itertools
+import threading
+
+# Virtual time. Every session has a Clock: the time its levels show (MOTD
+# timestamps and the like) and the simulated delays they ask for with
+# session.pause() are virtual seconds, moved forward by advance() and never
+# slept for by the clock itself. What a delay costs in real time is up to
+# the session:
+#
+#   ScriptIO    nothing: transcripts and batch grading fast-forward
+#   ConsoleIO   the local player's own thread sleeps, as before
+#   NetworkIO   nothing on the worker thread: a Pacer holds back the output
+#               written after the delay and the event loop sends it once the
+#               delay is up
+#
+# Timers set with call_later() fire, in order, as advance() passes them.
+
+# Where a session's clock starts until its level sets it
+EPOCH = datetime.datetime(2025, 10, 3, 12, 0, 0)
+
+
+class Clock:
+    def __init__(self, start=EPOCH):
+        self.start = start
+        # Virtual seconds since start
+        self.elapsed = 0.0
+        # Heap of [due, sequence, callback]; a cancelled timer's callback
+        # is None
+        self.timers = []
+        self.sequence = itertools.count()
+
+    def now(self):
+        return self.start + datetime.timedelta(seconds=self.elapsed)
+
+    def set(self, start):
+        # Restart the clock at start, e.g. at a level's seeded boot time
+        self.start = start
+        self.elapsed = 0.0
+
+    def call_later(self, delay, callback):
+        # Returns a handle for cancel()
+        timer = [self.elapsed + delay, next(self.sequence), callback]
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        timer[2] = None
+
+    def advance(self, seconds):
+        # Move seconds forward, firing the timers due on the way
+        target = self.elapsed + seconds
+        while self.timers and self.timers[0][0] <= target:
+            due, _, callback = heapq.heappop(self.timers)
+            if callback is not None:
+                self.elapsed = max(self.elapsed, due)
+                callback()
+        self.elapsed = target
+
+
+class Pacer:
+    # Real-time pacing without blocking a thread. delay() holds back what is
+    # called after it; call() may be used from any thread and queues the
+    # call with the loop time it may run at, and the event loop runs it
+    # then. Calls run in the order they were made.
+
+    def __init__(self, loop):
+        self.loop = loop
+        # Loop time before which nothing more may run
+        self.release = 0.0
+        self.queue = collections.deque()
+        self.scheduled = False
+        self.lock = threading.Lock()
+
+    def delay(self, seconds):
+        with self.lock:
+            self.release = max(self.release, self.loop.time()) + seconds
+
+    def call(self, function, *args):
+        with self.lock:
+            if not self.queue and self.release <= self.loop.time():
+                self.loop.call_soon_threadsafe(function, *args)
+                return
+            self.queue.append((self.release, function, args))
+            if not self.scheduled:
+                self.scheduled = True
+                self.loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        with self.lock:
+            due = self.queue[0][0]
+        self.loop.call_at(due, self._drain)
+
+    def _drain(self):
+        now = self.loop.time()
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                _, function, args = self.queue.popleft()
+                function(*args)
+            if not self.queue:
+                self.scheduled = False
+                return
+            due = self.queue[0][0]
+        self.loop.call_at(due, self._drain)
+
+    @property
+    def pending(self):
+        return len(self.queue)
@@ -0,0 +1,122 @@
+import mmap
+import os
+
+# Read-only file bodies kept on disk instead of in Python strings. A Blob is
+# a (path, offset, length) reference into a file that is mmap'd once per
+# process; every session and every worker process mapping the same file
+# shares the same page-cache pages, so resident memory doesn't grow with the
+# number of sessions. Inode.content may hold a Blob wherever it holds a str;
+# text_of() and lines_of() accept both.
+#
+# Blobs are UTF-8. Lengths and offsets are in bytes, which is also what
+# 'ls -l' and find -size report for a file.
+
+_mappings = {}
+
+
+def mapping(path):
+    # The process-wide read-only mapping of path
+    mapped = _mappings.get(path)
+    if mapped is None:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                mapped = b""
+            else:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        _mappings[path] = mapped
+    return mapped
+
+
+class Blob:
+    __slots__ = ("path", "offset", "length")
+
+    def __init__(self, path, offset=0, length=None):
+        # length None: everything from offset to the end of the file as it
+        # is now, so an older, shorter mapping of it is dropped
+        self.path = path
+        self.offset = offset
+        if length is None:
+            _mappings.pop(path, None)
+            length = len(mapping(path)) - offset
+        self.length = length
+
+    def __reduce__(self):
+        return Blob, (self.path, self.offset, self.length)
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        return isinstance(other, Blob) and (self.path, self.offset, self.length) == (
+            other.path, other.offset, other.length)
+
+    def __hash__(self):
+        return hash((self.path, self.offset, self.length))
+
+    def __repr__(self):
+        return f"Blob({self.path!r}, {self.offset}, {self.length})"
+
+    def find(self, sub, start=0, end=None):
+        end = self.length if end is None else end
+        hit = mapping(self.path).find(sub, self.offset + start, self.offset + end)
+        return hit - self.offset if hit >= 0 else -1
+
+    def bytes(self, start=0, end=None):
+        end = self.length if end is None else end
+        return mapping(self.path)[self.offset + start:self.offset + end]
+
+    def text(self, start=0, end=None):
+        return self.bytes(start, end).decode("utf-8", "replace")
+
+    def __str__(self):
+        return self.text()
+
+    def windows(self, size):
+        # (start, end) ranges of about size bytes that end after a newline
+        start = 0
+        while start < self.length:
+            cut = start + size
+            if cut >= self.length:
+                end = self.length
+            else:
+                end = self.find(b"\n", cut)
+                end = self.length if end < 0 else end + 1
+            yield start, end
+            start = end
+
+    def lines(self, size=1 << 20):
+        # Lines without newlines, decoded a window at a time
+        for start, end in self.windows(size):
+            lines = self.text(start, end).split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            yield from lines
+
+
+def text_of(content):
+    # File content as a str, whatever holds it
+    if content is None:
+        return ""
+    return content if isinstance(content, str) else content.text()
+
+
+class ContentStore:
+    # Append-only file of bodies. put() returns the Blob for each body, so
+    # generated assets can be written once and mapped by every process.
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._file = open(self.path, "ab")
+
+    def put(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        # Mappings made before this write end at the old size
+        _mappings.pop(self.path, None)
+        return Blob(self.path, offset, len(data))
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,281 @@
+import base64
+import binascii
+import codecs
+import collections
+import functools
+import hashlib
+import threading
+
+from cli_lab.content import Blob
+
+# Encoders, decoders and digests behind base64, certutil, sha256sum, xxd and
+# friends. Everything works on a stream of byte chunks of at most CHUNK
+# bytes: file bodies (str or content.Blob) are read a chunk at a time with
+# chunks(), piped input with line_chunks(), and output comes back as lines,
+# so a multi-megabyte body is never decoded or copied whole.
+#
+# digest() memoizes per (algorithm, Inode.content_id()), so the cache holds
+# ids and hex strings, never a body. Sessions forked from one template share
+# the inode's id, so every player hashing the same file shares one
+# computation, even when they ask at the same moment.
+
+# Bytes per chunk
+CHUNK = 1 << 16
+# Digests remembered
+DIGESTS = 256
+ALGORITHMS = ("md5", "sha1", "sha256", "sha384", "sha512")
+
+
+class CryptoError(ValueError):
+    pass
+
+
+def chunks(content, size=CHUNK):
+    # UTF-8 chunks of a file body
+    if content is None:
+        return
+    if isinstance(content, Blob):
+        for start in range(0, len(content), size):
+            yield content.bytes(start, min(start + size, len(content)))
+        return
+    # A character is at most 4 bytes
+    step = max(size // 4, 1)
+    for start in range(0, len(content), step):
+        yield content[start:start + step].encode("utf-8")
+
+
+def line_chunks(lines, size=CHUNK):
+    # Piped lines as chunks, each line ending with a newline
+    batch, length = [], 0
+    for line in lines:
+        data = line.encode("utf-8") + b"\n"
+        batch.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(batch)
+            batch, length = [], 0
+    if batch:
+        yield b"".join(batch)
+
+
+def regroup(source, multiple):
+    # The same bytes in chunks whose length is a multiple of multiple,
+    # except the last
+    carry = b""
+    for chunk in source:
+        data = carry + chunk if carry else chunk
+        cut = len(data) - len(data) % multiple
+        if cut:
+            yield data[:cut]
+        carry = data[cut:]
+    if carry:
+        yield carry
+
+
+def text_lines(source):
+    # Lines of UTF-8 chunks, without newlines; a trailing newline doesn't
+    # start another line
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    pending = ""
+    for chunk in source:
+        text = pending + decoder.decode(chunk)
+        lines = text.split("\n")
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+# Digests
+
+def hash_chunks(source, algorithm="sha256"):
+    hasher = hashlib.new(algorithm)
+    for chunk in source:
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class DigestCache:
+    # Bounded LRU of hex digests by (algorithm, content id); a digest being
+    # computed is waited for rather than computed again
+    def __init__(self, capacity=DIGESTS):
+        self.capacity = capacity
+        self.digests = collections.OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Digests actually computed
+        self.computed = 0
+
+    def get(self, content, algorithm="sha256", content_id=None):
+        # content_id defaults to the content, which suits a Blob
+        if algorithm not in ALGORITHMS:
+            raise CryptoError(f"unknown hash algorithm '{algorithm}'")
+        key = (algorithm, content if content_id is None else content_id)
+        while True:
+            with self.lock:
+                digest = self.digests.get(key)
+                if digest is not None:
+                    self.digests.move_to_end(key)
+                    return digest
+                waiting = self.pending.get(key)
+                if waiting is None:
+                    done = self.pending[key] = threading.Event()
+                    break
+            waiting.wait()
+        try:
+            digest = hash_chunks(chunks(content), algorithm)
+            with self.lock:
+                self.computed += 1
+                self.digests[key] = digest
+                if len(self.digests) > self.capacity:
+                    self.digests.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.pending[key]
+            done.set()
+        return digest
+
+
+CACHE = DigestCache()
+
+
+def digest(inode, algorithm="sha256"):
+    # Hex digest of a file's body, memoized
+    return CACHE.get(inode.content or "", algorithm, inode.content_id())
+
+
+# Base64
+
+def b64encode_lines(source, width=76):
+    # Base64 lines of width characters (0 for one line)
+    if width <= 0:
+        encoded = "".join(base64.b64encode(chunk).decode("ascii") for chunk in regroup(source, 3))
+        if encoded:
+            yield encoded
+        return
+    for chunk in regroup(source, width // 4 * 3 or 3):
+        text = base64.b64encode(chunk).decode("ascii")
+        for start in range(0, len(text), width):
+            yield text[start:start + width]
+
+
+def b64decode_chunks(lines, strict=True):
+    # Bytes of base64 text given as lines; whitespace is ignored and, when
+    # not strict, so is everything outside the alphabet. Raises CryptoError.
+    def characters():
+        # Batched up to a chunk, so each decode call gets a good size
+        batch, length = [], 0
+        for line in lines:
+            batch.append(line)
+            length += len(line)
+            if length >= CHUNK:
+                yield "".join("".join(batch).split()).encode("ascii", "replace")
+                batch, length = [], 0
+        if batch:
+            yield "".join("".join(batch).split()).encode("ascii", "replace")
+
+    try:
+        for chunk in regroup(characters(), 4):
+            if strict:
+                yield base64.b64decode(chunk, validate=True)
+            else:
+                yield binascii.a2b_base64(chunk)
+    except (binascii.Error, ValueError) as error:
+        raise CryptoError(str(error)) from None
+
+
+def pem_body(lines):
+    # Lines between certutil's -----BEGIN/-----END markers, or all of them
+    for line in lines:
+        if not line.startswith("-----"):
+            yield line
+
+
+# Hex dumps
+
+def xxd_lines(source):
+    offset = 0
+    for chunk in regroup(source, 16):
+        for start in range(0, len(chunk), 16):
+            row = chunk[start:start + 16]
+            pairs = " ".join(row[index:index + 2].hex() for index in range(0, len(row), 2))
+            yield f"{offset:08x}: {pairs:<39}  {printable(row)}"
+            offset += len(row)
+
+
+def hexdump_lines(source):
+    # hexdump -C
+    offset = 0
+    for chunk in regroup(source, 16):
+        for start in range(0, len(chunk), 16):
+            row = chunk[start:start + 16]
+            left = " ".join(f"{byte:02x}" for byte in row[:8])
+            right = " ".join(f"{byte:02x}" for byte in row[8:])
+            yield f"{offset:08x}  {left:<23}  {right:<23}  |{printable(row)}|"
+            offset += len(row)
+    yield f"{offset:08x}"
+
+
+PRINTABLE = bytes(byte if 32 <= byte < 127 else ord(".") for byte in range(256))
+
+
+def printable(row):
+    return row.translate(PRINTABLE).decode("ascii")
+
+
+# tr, for rot13 and other substitution ciphers
+
+# tr's backslash escapes, besides \NNN in octal
+ESCAPES = {"a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+
+
+def unescape(spec):
+    # spec with its escapes replaced. As in GNU tr, an unknown escape is
+    # the character after the backslash and a trailing backslash is itself.
+    out = []
+    index = 0
+    while index < len(spec):
+        char = spec[index]
+        index += 1
+        if char != "\\" or index == len(spec):
+            out.append(char)
+            continue
+        digits = 0
+        while digits < 3 and index + digits < len(spec) and spec[index + digits] in "01234567":
+            digits += 1
+        if digits:
+            out.append(chr(int(spec[index:index + digits], 8)))
+            index += digits
+        else:
+            out.append(ESCAPES.get(spec[index], spec[index]))
+            index += 1
+    return "".join(out)
+
+
+def expand(spec):
+    # tr's a-z ranges and \n style escapes, as a str
+    spec = unescape(spec)
+    out = []
+    index = 0
+    while index < len(spec):
+        if index + 2 < len(spec) and spec[index + 1] == "-" and spec[index] <= spec[index + 2]:
+            out.extend(chr(code) for code in range(ord(spec[index]), ord(spec[index + 2]) + 1))
+            index += 3
+        else:
+            out.append(spec[index])
+            index += 1
+    return "".join(out)
+
+
+@functools.lru_cache(maxsize=64)
+def tr_table(source, target, delete=False):
+    # str.translate table of tr SOURCE TARGET (tr -d SOURCE)
+    source = expand(source)
+    if delete:
+        return str.maketrans("", "", source)
+    target = expand(target)
+    if not target:
+        raise CryptoError("when not truncating set1, string2 must be non-empty")
+    target = target + target[-1] * (len(source) - len(target))
+    return str.maketrans(source, target[:len(source)])
@@ -0,0 +1,170 @@
+import time
+
+from cli_lab import metrics, pipeline, session, shell
+from cli_lab.session import print
+
+# Table-driven command dispatch shared by every level. A level owns a
+# CommandRegistry, registers one handler per command name and hands each
+# input line to dispatch(); lookup is a single dict hit no matter how many
+# commands the level supports. Lines are parsed with cli_lab.shell in the
+# registry's dialect, so quoting and ';', '&&', '||' work everywhere. A
+# command fails when its handler returns FAILED or it doesn't exist.
+# Every dispatched line is recorded in cli_lab.metrics under the registry's
+# level name.
+
+EXIT = "EXIT"
+NOT_FOUND = object()
+FAILED = pipeline.FAILED
+
+
+class Command:
+    __slots__ = ("name", "handler", "min_args", "max_args", "usage", "stream")
+
+    def __init__(self, name, handler, min_args=0, max_args=None, usage=None, stream=False):
+        self.name = name
+        self.handler = handler
+        self.min_args = min_args
+        self.max_args = max_args
+        self.usage = usage
+        # handler(state, args, stdin) is a generator of output lines, see
+        # cli_lab.pipeline
+        self.stream = stream
+
+    def accepts(self, count):
+        if count < self.min_args:
+            return False
+        return self.max_args is None or count <= self.max_args
+
+
+class CommandRegistry:
+    def __init__(self, parent=None, ignore_case=False, dialect=None, not_found=None, level=None):
+        self.commands = {}
+        self.parent = parent
+        # Level name the metrics of this registry are recorded under
+        if level is None:
+            level = parent.level if parent is not None else metrics.NO_LEVEL
+        self.level = level
+        # First word of a line -> its metrics label, for known commands
+        self.labels = {}
+        self.ignore_case = ignore_case
+        if dialect is None:
+            dialect = parent.dialect if parent is not None else shell.POSIX
+        self.dialect = dialect
+        # fn(state, name) reporting an unknown command from dispatch()
+        if not_found is None and parent is not None:
+            not_found = parent.not_found
+        self.not_found = not_found
+
+    def register(self, names, handler, min_args=0, max_args=None, usage=None, stream=False):
+        if isinstance(names, str):
+            names = (names,)
+        for name in names:
+            key = name.lower() if self.ignore_case else name
+            self.commands[key] = Command(name, handler, min_args, max_args, usage, stream)
+        return handler
+
+    def command(self, *names, min_args=0, max_args=None, usage=None, stream=False):
+        def decorator(handler):
+            return self.register(names, handler, min_args, max_args, usage, stream)
+        return decorator
+
+    def lookup(self, name):
+        if self.ignore_case:
+            name = name.lower()
+        command = self.commands.get(name)
+        if command is None and self.parent is not None:
+            return self.parent.lookup(name)
+        return command
+
+    def names(self):
+        names = set(self.parent.names()) if self.parent is not None else set()
+        names.update(self.commands)
+        return sorted(names)
+
+    def dispatch(self, state, line):
+        try:
+            script = shell.parse(line, self.dialect)
+        except shell.ShellSyntaxError as error:
+            print(error if self.dialect == shell.CMD else f"bash: {error}")
+            return None
+
+        collector = metrics.COLLECTOR
+        if collector is None or not script.items:
+            return self.execute(state, script)
+        started = time.perf_counter()
+        result = self.execute(state, script)
+        collector.observe(self.level, self.label(script), time.perf_counter() - started)
+        return result
+
+    def label(self, script):
+        # Metrics label of a line: the name of its first command
+        argv = script.items[0][0].commands[0].argv
+        if not argv:
+            return metrics.UNRECOGNIZED
+        label = self.labels.get(argv[0])
+        if label is None:
+            command = self.lookup(argv[0])
+            if command is None:
+                return metrics.UNRECOGNIZED
+            label = self.labels[argv[0]] = command.name
+        return label
+
+    def execute(self, state, script):
+        simple = script.simple
+        if simple is not None:
+            return self.run_line(state, list(simple.argv))
+
+        result = None
+        run = True
+        for pipeline, separator in script.items:
+            if run:
+                result = self.run_pipeline(state, pipeline)
+                if result == EXIT or result is True:
+                    return result
+                succeeded = result is not NOT_FOUND and result is not FAILED
+            run = separator in (";", "&") or (separator == "&&") == succeeded
+        return result
+
+    def run_pipeline(self, state, node):
+        return pipeline.execute(self, state, node)
+
+    def run_line(self, state, argv):
+        result = self.run(state, argv)
+        if result is NOT_FOUND:
+            metrics.missed(self.level)
+            if self.not_found is not None:
+                self.not_found(state, argv[0])
+        return result
+
+    def run(self, state, argv):
+        command = self.lookup(argv[0])
+        if command is None:
+            return NOT_FOUND
+
+        args = argv[1:]
+        if not command.accepts(len(args)):
+            print(command.usage or f"{command.name}: invalid number of arguments")
+            return FAILED
+        if command.stream:
+            return pipeline.to_terminal(state, command.handler(state, args, None))
+        return command.handler(state, args)
+
+    def stage(self, state, name, args, stdin):
+        # One command of a pipeline as a generator of output lines. Plain
+        # handlers run with their print()s captured and streamed on.
+        command = self.lookup(name)
+        if command is None:
+            metrics.missed(self.level)
+            if self.not_found is not None:
+                self.not_found(state, name)
+            return NOT_FOUND
+        if not command.accepts(len(args)):
+            print(command.usage or f"{command.name}: invalid number of arguments")
+            return FAILED
+        if command.stream:
+            return (yield from command.handler(state, args, stdin))
+
+        with session.capture() as output:
+            result = command.handler(state, args)
+        yield from output.lines()
+        return result
@@ -0,0 +1,378 @@
+import fnmatch
+import functools
+import re
+
+from cli_lab import access
+from cli_lab.session import print
+from cli_lab.vfs import EXECUTE, READ, extension, span
+
+# find over a VirtualFS. An expression is parsed once (and memoized, like
+# shell.parse) into AND-groups of tests joined by -o. Tests that can narrow
+# the search name an index of the filesystem's FileIndex: -perm by
+# permission bit, -user by owner and -name '*.ext' by extension. The
+# smallest one inside the starting directory is walked instead of the tree
+# when it is much smaller than the subtree; every candidate is then checked
+# against the live tree with all tests, so the index only has to be a
+# superset of the answer.
+#
+# Supported: -name/-iname GLOB, -type [fdlbcps], -perm [-/]MODE (octal or
+# u+s style), -user NAME, -group NAME, -size [+-]N[cwbkMG], -newer FILE,
+# ! / -not, -a, -o and -print.
+
+
+# How many walked entries checking one index candidate is worth
+CHECK_COST = 4
+
+
+class FindError(ValueError):
+    pass
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_glob(pattern, ignore_case=False):
+    return re.compile(fnmatch.translate(pattern), re.IGNORECASE if ignore_case else 0).match
+
+
+def glob_extension(pattern):
+    # The extension every name matching the glob has, when it is fixed
+    _, dot, suffix = pattern.rpartition(".")
+    if not dot or any(char in suffix for char in "*?[]\\"):
+        return None
+    return suffix.lower()
+
+
+class Name:
+    __slots__ = ("pattern", "match", "extension")
+
+    def __init__(self, pattern, ignore_case=False):
+        self.pattern = pattern
+        self.match = compile_glob(pattern, ignore_case)
+        self.extension = glob_extension(pattern)
+
+    def matches(self, node, references):
+        return self.match(node.name or "/") is not None
+
+    def candidates(self, index, start, end):
+        if self.extension is None:
+            return None
+        return span(index.by_extension.get(self.extension, []), start, end)
+
+
+class Type:
+    __slots__ = ("kind",)
+
+    def __init__(self, kind):
+        if kind not in ("f", "d", "l", "b", "c", "p", "s"):
+            raise FindError(f"Unknown argument to -type: {kind}")
+        self.kind = kind
+
+    def matches(self, node, references):
+        if node.is_link:
+            return self.kind == "l"
+        if node.is_dir:
+            return self.kind == "d"
+        return self.kind == "f"
+
+    def candidates(self, index, start, end):
+        return None
+
+
+def parse_mode(text):
+    if text and len(text) <= 4 and all(char in "01234567" for char in text):
+        return int(text, 8)
+    mode = 0
+    for clause in text.split(","):
+        match = access.SYMBOLIC.fullmatch(clause)
+        if match is None:
+            raise FindError(f"invalid mode '{text}'")
+        who, op, permissions = match.groups()
+        if op == "-":
+            continue
+        mask = 0
+        for char in who or "a":
+            mask |= access.WHO[char]
+        for char in permissions:
+            mode |= access.PERMISSIONS[char] & mask
+    return mode
+
+
+class Perm:
+    # -perm MODE: exactly these bits; -MODE: all of them; /MODE: any of them
+    __slots__ = ("mode", "how")
+
+    def __init__(self, text):
+        if text[:1] in ("-", "/", "+"):
+            self.how, text = ("all" if text[0] == "-" else "any"), text[1:]
+        else:
+            self.how = "exact"
+        self.mode = parse_mode(text)
+
+    def matches(self, node, references):
+        mode = node.mode & 0o7777
+        if self.how == "all":
+            return mode & self.mode == self.mode
+        if self.how == "any":
+            return not self.mode or bool(mode & self.mode)
+        return mode == self.mode
+
+    def candidates(self, index, start, end):
+        if not self.mode:
+            return None
+        lists = [span(index.by_bit.get(1 << bit, []), start, end)
+                 for bit in range(12) if self.mode >> bit & 1]
+        if self.how == "any":
+            return sorted(set().union(*lists))
+        return min(lists, key=len)
+
+
+class User:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def matches(self, node, references):
+        return node.owner == self.name
+
+    def candidates(self, index, start, end):
+        return span(index.by_owner.get(self.name, []), start, end)
+
+
+class Group:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def matches(self, node, references):
+        return node.group == self.name
+
+    def candidates(self, index, start, end):
+        return None
+
+
+SIZE = re.compile(r"([-+]?)(\d+)([bcwkMG]?)")
+UNITS = {"": 512, "b": 512, "c": 1, "w": 2, "k": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+class Size:
+    # -size N counts in units rounded up, like GNU find
+    __slots__ = ("sign", "count", "unit")
+
+    def __init__(self, text):
+        match = SIZE.fullmatch(text)
+        if match is None:
+            raise FindError(f"invalid -size type `{text}'")
+        self.sign = match[1]
+        self.count = int(match[2])
+        self.unit = UNITS[match[3]]
+
+    def matches(self, node, references):
+        units = -(-node.file_size() // self.unit)
+        if self.sign == "+":
+            return units > self.count
+        if self.sign == "-":
+            return units < self.count
+        return units == self.count
+
+    def candidates(self, index, start, end):
+        return None
+
+
+class Newer:
+    # The reference file's mtime is looked up per search into references
+    __slots__ = ("path",)
+
+    def __init__(self, path):
+        self.path = path
+
+    def matches(self, node, references):
+        return node.mtime > references[self.path]
+
+    def candidates(self, index, start, end):
+        return None
+
+
+class Not:
+    __slots__ = ("test",)
+
+    def __init__(self, test):
+        self.test = test
+
+    def matches(self, node, references):
+        return not self.test.matches(node, references)
+
+    def candidates(self, index, start, end):
+        return None
+
+
+TESTS = {
+    "-name": Name,
+    "-iname": lambda pattern: Name(pattern, ignore_case=True),
+    "-type": Type,
+    "-perm": Perm,
+    "-user": User,
+    "-group": Group,
+    "-size": Size,
+    "-newer": Newer,
+}
+
+
+class Query:
+    __slots__ = ("paths", "groups")
+
+    def __init__(self, paths, groups):
+        self.paths = paths
+        self.groups = groups
+
+    def tests(self):
+        for group in self.groups:
+            for test in group:
+                yield test.test if isinstance(test, Not) else test
+
+    def matches(self, node, references):
+        return any(all(test.matches(node, references) for test in group) for group in self.groups)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse(args):
+    # args: tuple of words after 'find'; raises FindError
+    position = 0
+    while position < len(args) and not args[position].startswith("-") and args[position] != "!":
+        position += 1
+    paths = args[:position] or (".",)
+
+    groups = [[]]
+    negate = False
+    while position < len(args):
+        word = args[position]
+        position += 1
+        if word in ("!", "-not"):
+            negate = not negate
+        elif word in ("-a", "-and", "-print"):
+            continue
+        elif word in ("-o", "-or"):
+            if negate or not groups[-1]:
+                raise FindError("invalid expression")
+            groups.append([])
+        elif word in TESTS:
+            if position >= len(args):
+                raise FindError(f"missing argument to `{word}'")
+            test = TESTS[word](args[position])
+            position += 1
+            groups[-1].append(Not(test) if negate else test)
+            negate = False
+        elif not word.startswith("-"):
+            raise FindError(f"paths must precede expression: `{word}'")
+        else:
+            raise FindError(f"unknown predicate `{word}'")
+    if negate or (len(groups) > 1 and not groups[-1]):
+        raise FindError("invalid expression")
+    return Query(paths, tuple(map(tuple, groups)))
+
+
+def _readable(node, principal):
+    return access.permits(principal, node, READ | EXECUTE)
+
+
+def _shown(start, real, path):
+    # The path as find prints it: relative to how the start was written
+    if path == real:
+        return start
+    rest = path[len(real):].lstrip("/")
+    return (start if start.endswith("/") else start + "/") + rest
+
+
+def search(fs, query, cwd="/", principal=None):
+    # Yields (shown path, real path) for every match. Directories the
+    # principal (root by default) can't list are skipped silently, as with
+    # 2>/dev/null.
+    principal = principal or access.principal("root")
+    references = {}
+    for test in query.tests():
+        if isinstance(test, Newer):
+            node = fs.lookup(test.path, cwd)
+            if node is None:
+                print(f"find: '{test.path}': No such file or directory")
+                return
+            references[test.path] = node.mtime
+
+    for start in query.paths:
+        node = fs.lookup(start, cwd, follow=False)
+        if node is None:
+            print(f"find: '{start}': No such file or directory")
+            continue
+        real = fs.path_of(node)
+        if start == "~" or start.startswith("~/"):
+            # The shell would have expanded it before find saw it
+            start = fs.home + start[1:]
+        candidates = _plan(fs, query, real) if node.is_dir else None
+        if candidates is None:
+            found = _walk(node, real, references, query, principal)
+        else:
+            found = _check(fs, node, real, candidates, references, query, principal)
+        for path in found:
+            yield _shown(start, real, path), path
+
+
+def _plan(fs, query, real):
+    # Paths worth checking under real, or None when walking is cheaper
+    if len(query.groups) != 1:
+        return None
+    index, changed = fs.index()
+    start = index.numbers.get(real)
+    if start is None:
+        return None
+    end = index.end[start]
+
+    best = None
+    for test in query.groups[0]:
+        numbers = test.candidates(index, start, end)
+        if numbers is not None and (best is None or len(numbers) < len(best)):
+            best = numbers
+    # Checking a candidate costs a lookup per path component, visiting one
+    # while walking a single step, so the index must narrow it well
+    if best is None or len(best) * CHECK_COST >= end - start:
+        return None
+
+    # Changed paths may match now; base entries keep their walk order and
+    # paths new since the index was built come last
+    prefix = real if real == "/" else real + "/"
+    numbers = set(best)
+    added = []
+    for path in changed:
+        if path == real or path.startswith(prefix):
+            number = index.numbers.get(path)
+            if number is None:
+                added.append(path)
+            else:
+                numbers.add(number)
+    return [index.paths[number] for number in sorted(numbers)] + sorted(added)
+
+
+def _check(fs, root, real, paths, references, query, principal):
+    for path in paths:
+        node = root
+        for part in path[len(real):].split("/"):
+            if not part:
+                continue
+            if not node.is_dir or not _readable(node, principal):
+                node = None
+                break
+            node = fs.child(node, part)
+            if node is None:
+                break
+        if node is not None and query.matches(node, references):
+            yield path
+
+
+def _walk(root, real, references, query, principal):
+    stack = [(root, real)]
+    while stack:
+        node, path = stack.pop()
+        if query.matches(node, references):
+            yield path
+        if node.children and _readable(node, principal):
+            prefix = path if path == "/" else path + "/"
+            for child in reversed(list(node.children.values())):
+                stack.append((child, prefix + child.name))
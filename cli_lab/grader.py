@@ -0,0 +1,140 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+import time
+
+from cli_lab import headless
+
+# Bulk auto-grading: transcripts are sharded into small batches and run
+# headlessly on a process pool. Only a bounded window of batches is in
+# flight at once and results are streamed to disk as they finish, so memory
+# stays flat no matter how many transcripts are graded.
+
+
+def iter_directory(level, directory):
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".txt"):
+            yield {"student": entry.name[:-4], "level": level, "path": entry.path}
+
+
+def iter_manifest(path):
+    # One JSON object per line: {"student": ..., "level": ..., "path": ..., "seed": ...}
+    with open(path, encoding="utf-8") as manifest:
+        for line in manifest:
+            if line.strip():
+                yield json.loads(line)
+
+
+def grade_job(job):
+    result = {"student": job.get("student"), "level": job["level"], "path": job["path"]}
+    if job.get("seed") is not None:
+        result["seed"] = job["seed"]
+    try:
+        run = headless.run_file(job["level"], job["path"], output=None, echo=False, seed=job.get("seed"))
+    except (OSError, ValueError) as error:
+        result["error"] = str(error)
+        return result
+
+    result.update(
+        seed=run.seed,
+        completed=run.completed,
+        challenges=run.challenges,
+        commands=run.commands,
+        first_completion_step=run.first_completion_step,
+        elapsed_ms=round(run.elapsed * 1000, 3),
+    )
+    return result
+
+
+def grade_batch(jobs):
+    return [grade_job(job) for job in jobs]
+
+
+def batched(jobs, size):
+    jobs = iter(jobs)
+    while True:
+        batch = list(itertools.islice(jobs, size))
+        if not batch:
+            return
+        yield batch
+
+
+class GradeSummary:
+    def __init__(self):
+        self.graded = 0
+        self.completed = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def add(self, result):
+        self.graded += 1
+        if "error" in result:
+            self.errors += 1
+        elif result["completed"]:
+            self.completed += 1
+
+    def __str__(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.graded / elapsed if elapsed else 0.0
+        return (f"graded {self.graded} transcripts ({self.completed} completed, "
+                f"{self.errors} errors) in {elapsed:.2f}s ({rate:.0f}/s)")
+
+
+def grade(jobs, out, workers=None, batch_size=64, window=None):
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+    summary = GradeSummary()
+
+    def drain(futures):
+        for future in futures:
+            for result in future.result():
+                out.write(json.dumps(result) + "\n")
+                summary.add(result)
+        out.flush()
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for batch in batched(jobs, batch_size):
+            pending.add(pool.submit(grade_batch, batch))
+            if len(pending) >= window:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                drain(done)
+        drain(concurrent.futures.as_completed(pending))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli_lab.grader",
+                                     description="Grade many transcripts in parallel.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="JSON lines file with student, level, path (and optional seed)")
+    source.add_argument("--directory", help="grade every *.txt in this directory against --level")
+    parser.add_argument("--level", help="level for --directory, e.g. linux/2")
+    parser.add_argument("--out", default="-", help="JSON lines results file ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    if args.directory is not None:
+        if args.level is None:
+            parser.error("--directory needs --level")
+        jobs = iter_directory(args.level, args.directory)
+    else:
+        jobs = iter_manifest(args.manifest)
+
+    if args.out == "-":
+        summary = grade(jobs, sys.stdout, args.workers, args.batch_size)
+    else:
+        with open(args.out, "w", encoding="utf-8") as out:
+            summary = grade(jobs, out, args.workers, args.batch_size)
+    sys.stderr.write(f"{summary}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
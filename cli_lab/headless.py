@@ -0,0 +1,66 @@
+import sys
+import time
+
+from cli_lab import levels, profiling, session, variants
+
+
+class ScriptResult:
+    def __init__(self, level, completed, commands, elapsed, events=(), paused=0.0):
+        self.level = level
+        self.completed = completed
+        self.commands = commands
+        self.elapsed = elapsed
+        self.events = list(events)
+        # Virtual seconds of pauses the level asked for, not waited for
+        self.paused = paused
+
+    @property
+    def challenges(self):
+        return sorted(fields["number"] for _, name, fields in self.events if name == "challenge")
+
+    @property
+    def seed(self):
+        # The seed of the level instance that was played
+        for _, name, fields in self.events:
+            if name == "variant":
+                return fields["seed"]
+        return None
+
+    @property
+    def first_completion_step(self):
+        for step, name, _ in self.events:
+            if name == "level_complete":
+                return step
+        return None
+
+    @property
+    def commands_per_sec(self):
+        return self.commands / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        status = "COMPLETED" if self.completed else "NOT COMPLETED"
+        seed = f" (seed {self.seed})" if self.seed is not None else ""
+        return (f"level {self.level}{seed}: {status} - {self.commands} commands in "
+                f"{self.elapsed * 1000:.1f} ms ({self.commands_per_sec:.0f} commands/sec)")
+
+
+def run_script(level, lines, output=None, echo=True, seed=None):
+    # seed: the instance of the level to play, None for a fresh one
+    entry = levels.get(level).load()
+
+    io = session.ScriptIO(lines, output, echo)
+    started = time.perf_counter()
+    with session.use(io), variants.seeded(seed), profiling.level(level):
+        try:
+            completed = bool(entry())
+        except EOFError:
+            completed = False
+    return ScriptResult(level, completed, io.commands, time.perf_counter() - started, io.events,
+                        io.clock.elapsed)
+
+
+def run_file(level, path, output=None, echo=True, seed=None):
+    if path == "-":
+        return run_script(level, sys.stdin, output, echo, seed)
+    with open(path, encoding="utf-8") as transcript:
+        return run_script(level, transcript, output, echo, seed)
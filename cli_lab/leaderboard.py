@@ -0,0 +1,191 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+
+from cli_lab import session
+
+# Live leaderboard for timed events. Every session of the server reports its
+# progress events here (through ScoringIO): each completed challenge and
+# each completed level is a result on a board, ranked by time-to-flag and by
+# commands-to-flag, both counted from when the player started the level.
+#
+# A Ranking only keeps the best `capacity` results in a heap (the worst of
+# them on top), so a new result costs O(log capacity) and reading the top k
+# is O(k) however many players there are. A player's score only ever
+# improves, so nobody outside the heap can overtake the ones in it without
+# posting a new result, which is offered to the heap again.
+
+# Results kept per ranking, the most top() can return
+CAPACITY = 100
+METRICS = ("time", "commands")
+
+_board = contextvars.ContextVar("leaderboard", default=None)
+
+
+class Ranking:
+    # Lowest score first; on a tie the one that got there first
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        # Entries are [-score, -sequence, player], so heap[0] is the worst
+        self.heap = []
+        self.entries = {}
+        # player -> best score, for every player with a result
+        self.best = {}
+        self.sequence = itertools.count()
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.best)
+
+    def offer(self, player, score):
+        # True when the ranking changed
+        if score >= self.best.get(player, float("inf")):
+            return False
+        self.best[player] = score
+        key = [-score, -next(self.sequence), player]
+        entry = self.entries.get(player)
+        if entry is not None:
+            entry[:2] = key[:2]
+            heapq.heapify(self.heap)
+        elif len(self.heap) < self.capacity:
+            heapq.heappush(self.heap, key)
+            self.entries[player] = key
+        elif key > self.heap[0]:
+            dropped = heapq.heapreplace(self.heap, key)
+            del self.entries[dropped[2]]
+            self.entries[player] = key
+        else:
+            return False
+        self._sorted = None
+        return True
+
+    def top(self, k=10):
+        # [(player, score)] of the k best, best first
+        if self._sorted is None:
+            self._sorted = [(entry[2], -entry[0]) for entry in sorted(self.heap, reverse=True)]
+        return self._sorted[:k]
+
+
+class Leaderboard:
+    # The rankings of every board: a level ("linux/2") or one of its
+    # challenges ("linux/2 challenge 3"). Safe to share between sessions.
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.rankings = {}
+        self.lock = threading.Lock()
+
+    def record(self, player, board, seconds, commands):
+        with self.lock:
+            for metric, score in (("time", seconds), ("commands", commands)):
+                ranking = self.rankings.get((board, metric))
+                if ranking is None:
+                    ranking = self.rankings[board, metric] = Ranking(self.capacity)
+                ranking.offer(player, score)
+
+    def top(self, board, metric="time", k=10):
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric '{metric}', expected one of: {', '.join(METRICS)}")
+        with self.lock:
+            ranking = self.rankings.get((board, metric))
+            return ranking.top(k) if ranking is not None else []
+
+    def boards(self):
+        # Boards with results, levels before their challenges
+        with self.lock:
+            return sorted({board for board, _ in self.rankings},
+                          key=lambda board: [int(part) if part.isdigit() else part for part in board.split()])
+
+    def completions(self, board):
+        # How many players have a result on board
+        with self.lock:
+            ranking = self.rankings.get((board, "time"))
+            return len(ranking) if ranking is not None else 0
+
+    def render(self, k=10):
+        # Text tables of every board, for the menu and the console
+        lines = []
+        for board in self.boards():
+            lines.append(f"=== {board} ({self.completions(board)} finished) ===")
+            by_time = self.top(board, "time", k)
+            by_commands = self.top(board, "commands", k)
+            for place in range(max(len(by_time), len(by_commands))):
+                left = right = ""
+                if place < len(by_time):
+                    player, seconds = by_time[place]
+                    left = f"{player:<20} {seconds:8.1f}s"
+                if place < len(by_commands):
+                    player, commands = by_commands[place]
+                    right = f"{player:<20} {commands:5} commands"
+                lines.append(f"{place + 1:3}. {left:<30}  {right}")
+            lines.append("")
+        return "\n".join(lines) if lines else "No results yet.\n"
+
+
+class ScoringIO:
+    # Wraps a player's session and turns its progress events into results:
+    # a "level_start" event starts the clock and the command count, and
+    # every "challenge" and "level_complete" after it is recorded. A resumed
+    # level counts from when it was resumed.
+
+    def __init__(self, outer, board, player):
+        self.outer = outer
+        self.board = board
+        self.player = player
+        self.interactive = outer.interactive
+        self.clock = outer.clock
+        self.level = None
+        self.started = None
+        self.commands = 0
+
+    def read_line(self, prompt=""):
+        line = self.outer.read_line(prompt)
+        self.commands += 1
+        return line
+
+    def write(self, text):
+        self.outer.write(text)
+
+    def write_screen(self, screen):
+        self.outer.write_screen(screen)
+
+    def clear(self):
+        self.outer.clear()
+
+    def flush(self):
+        self.outer.flush()
+
+    def pause(self, seconds):
+        self.outer.pause(seconds)
+
+    def event(self, name, fields):
+        if name == "level_start":
+            self.level = fields["level"]
+            self.started = time.monotonic()
+            self.commands = 0
+        elif self.level is not None and name in ("challenge", "level_complete"):
+            board = self.level if name == "level_complete" else f"{self.level} challenge {fields['number']}"
+            self.board.record(self.player, board, time.monotonic() - self.started, self.commands)
+        self.outer.event(name, fields)
+
+    def close(self):
+        self.outer.close()
+
+
+@contextlib.contextmanager
+def scoring(board, player):
+    # Results of the levels played inside this block go to board as player's
+    token = _board.set(board)
+    try:
+        with session.use(ScoringIO(session.current(), board, player)):
+            yield board
+    finally:
+        _board.reset(token)
+
+
+def current():
+    return _board.get()
@@ -0,0 +1,82 @@
+import importlib
+import os
+
+from cli_lab import profiling
+from cli_lab.session import event
+
+# Level registry. Every level is listed here by name with its menu title and
+# the module/function that runs it; the module is only imported when the
+# level is started, so showing the menus never pays for the levels.
+
+
+class Level:
+    __slots__ = ("name", "title", "module", "entry")
+
+    def __init__(self, name, title, module=None, entry="main"):
+        self.name = name
+        self.title = title
+        self.module = module
+        self.entry = entry
+
+    @property
+    def available(self):
+        return self.module is not None
+
+    def load(self):
+        return getattr(importlib.import_module(self.module, __name__), self.entry)
+
+    def run(self):
+        # True once the level's challenges are all completed.
+        entry = self.load()
+        event("level_start", level=self.name)
+        with profiling.level(self.name):
+            return entry()
+
+
+LEVELS = {}
+
+
+def register(name, title, module=None, entry="main"):
+    LEVELS[name] = Level(name, title, module, entry)
+
+
+def platform(prefix):
+    # Levels of one platform in menu order, e.g. platform("linux")
+    return [level for name, level in LEVELS.items() if name.startswith(prefix + "/")]
+
+
+def get(name):
+    try:
+        level = LEVELS[name]
+    except KeyError:
+        raise ValueError(f"unknown level '{name}', expected one of: {', '.join(available())}") from None
+    if not level.available:
+        raise ValueError(f"level '{name}' is not available yet")
+    return level
+
+
+def name_of(module_file):
+    # Registry name of the level implemented in module_file, e.g. "windows/3"
+    directory, filename = os.path.split(os.path.splitext(module_file)[0])
+    module = f".{os.path.basename(directory)}.{filename}"
+    for name, level in LEVELS.items():
+        if level.module == module:
+            return name
+    return None
+
+
+def available():
+    return [name for name, level in LEVELS.items() if level.available]
+
+
+register("linux/1", "Intro Challenge", ".linux.level1_intro")
+register("linux/2", "Permissions", ".linux.level2_permissions")
+register("linux/3", "COMING SOON")
+register("linux/4", "COMING SOON")
+register("linux/5", "COMING SOON")
+
+register("windows/1", "Recon", ".windows.level1_recon", "run_level")
+register("windows/2", "Permissions", ".windows.level2_permissions", "run_level")
+register("windows/3", "Searching", ".windows.level3_searching", "run_level")
+register("windows/4", "Networking", ".windows.level4_networking", "run_level")
+register("windows/5", "Cryptography", ".windows.level5_cryptography", "run_level")
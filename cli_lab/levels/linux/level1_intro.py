@@ -1,183 +1,275 @@
-import random
-
-def build_challenge_list(state):
-    return [
-        "",
-        f"{'✅' if state[1] else '◻️'} 1) Read the Flag.txt.",
-        "",
-        f"{'✅' if state[2] else '◻️'} 2) Find the ssh username for other computer.",
-        "",
-        f"{'✅' if state[3] else '◻️'} 3) Find the ssh password for other computer.",
-        "",
-        f"{'✅' if state[4] else '◻️'} 4) Find the ssh IP address for other computer.",
-        "",
-        f"{'✅' if state[5] else '◻️'} 5) Successfully ssh into other computer.",
-        "",
-        f"{'✅' if state[6] else '◻️'} 6) Find hidden.txt and read it on other computer.",
-        "",
-    ]
-
-def print_challenges(state):
-    for line in build_challenge_list(state):
-        print(line)
+from cli_lab import levels, network, persist, variants
+from cli_lab.dispatch import EXIT, FAILED, CommandRegistry
+from cli_lab.render import Checklist
+from cli_lab.session import event, input, print, show, wait_for_enter
+from cli_lab.vfs import VirtualFS
+from .utils import NETWORK_COMMANDS, ShellState, print_motd, cmd_ls
 
-def main():
+CHECKLIST = Checklist([
+    "Read the Flag.txt.",
+    "Find the ssh username for other computer.",
+    "Find the ssh password for other computer.",
+    "Find the ssh IP address for other computer.",
+    "Successfully ssh into other computer.",
+    "Find hidden.txt and read it on other computer.",
+])
+
+SSH_USERNAMES = ('JoeBiden', 'DonaldTrump', 'JeremyClarkson', 'RichardHammond', 'JamesMay', 'GordonRamsay', 'ColdPlay', 'JeffreyDahmer', 'HarryPotter', 'KimJongUn')
+SSH_PASSWORDS = ('DumbassLeftHisPassword', 'Password123!', 'ILeftMyKeysAgain', 'Admin1234', 'qwerty_is_bad', 'LetMeInPlease', 'Eggcellent123', 'Passw0rd!', 'ThisIsNotASecurePass', 'ForgottenPassword69')
+
+def build_challenge_list(progress):
+    return CHECKLIST.lines(progress)
+
+def print_challenges(progress):
+    show(CHECKLIST.render(progress))
+
+
+def build_local_fs():
+    fs = VirtualFS(home="/home/user")
+    fs.mkdir("/home/user", owner="user", group="user")
+    fs.add_file("/home/user/Bin.txt", "Just some random binary notes...", owner="user", group="user")
+    fs.mkdir("/home/user/Flag", owner="user", group="user")
+    # notes.txt and the ssh_* files get their per-session text in Level1State
+    fs.add_file("/home/user/notes.txt", "", owner="user", group="user")
+    fs.mkdir("/home/user/Documents", owner="user", group="user")
+
+    fs.add_file("/home/user/Flag/Flag.txt", "", owner="user", group="user")
+    fs.add_file("/home/user/Flag/something.txt", "I don't know what to put here.", owner="user", group="user")
+    fs.add_file("/home/user/Flag/birthday.txt", "Happy Birthday John!", owner="user", group="user")
+    fs.add_file("/home/user/Documents/ssh_Username.txt", "", owner="user", group="user")
+    fs.add_file("/home/user/Documents/ssh_Password.txt", "", owner="user", group="user")
+    return fs
+
+
+def build_remote_fs():
+    fs = VirtualFS(home="/home/ban5hee")
+    fs.mkdir("/home/ban5hee", owner="ban5hee", group="ban5hee")
+    fs.add_file("/home/ban5hee/hidden.txt", "You found the hidden.txt! You completed challenge 6!", owner="ban5hee", group="ban5hee")
+    return fs
+
+
+LOCAL_TEMPLATE = build_local_fs()
+REMOTE_TEMPLATE = build_remote_fs()
+
+LOCAL_ADDRESS = "192.168.0.23"
+# Services the other machines on the remote computer's network may run
+DECOY_SERVICES = ((21, "ftp"), (22, "ssh"), (25, "smtp"), (80, "http"), (443, "https"),
+                  (3306, "mysql"), (8080, "http-proxy"))
+
+
+def build_base_network():
+    # What every session's network shares: the player's LAN and an ISP router
+    net = network.Network()
+    net.add_router("gateway", "192.168.0.1")
+    net.add_router("isp-core", "100.64.0.1")
+    net.link("gateway", "isp-core", 6)
+    net.add_subnet("192.168.0.0/24", "gateway", 0.4)
+    net.local = net.add_host("linux", LOCAL_ADDRESS)
+    return net
+
+
+BASE_NETWORK = build_base_network()
+
+
+def build_network(other_ip_address, rng):
+    # The shared network plus the remote computer's /24, which it shares
+    # with a few other machines
+    net = BASE_NETWORK.fork()
+    remote = network.parse_address(other_ip_address)
+    if net.subnet_of(remote) is None:
+        base = remote & ~0xFF
+        net.add_router("remote-gw", base | (254 if remote & 0xFF != 254 else 1))
+        net.link("isp-core", "remote-gw", rng.randint(8, 30))
+        net.add_subnet(f"{network.format_address(base)}/24", "remote-gw", 0.5)
+    if remote == net.local.address:
+        net.remove_host(net.local)
+        net.local = net.add_host("linux", "192.168.0.24")
+    net.add_host("linux-remote", remote, {22: "ssh", 80: "http"})
+    for octet in rng.sample(range(2, 254), 6):
+        address = remote & ~0xFF | octet
+        if address not in net.by_address:
+            net.add_host("", address, rng.sample(DECOY_SERVICES, rng.randint(1, 3)))
+    return net
+
+
+class Level1State(ShellState):
+    __slots__ = ("seed", "other_ip_address", "randomusername", "randompassword", "on_remote", "local_session",
+                 "network")
+    on_read = {
+        "/home/user/Flag/Flag.txt": lambda state, inode: state.complete(1),
+        "/home/user/Documents/ssh_Username.txt": lambda state, inode: state.complete(2),
+        "/home/user/Documents/ssh_Password.txt": lambda state, inode: state.complete(3),
+        "/home/user/notes.txt": lambda state, inode: state.complete(4),
+        "/home/ban5hee/hidden.txt": lambda state, inode: state.complete(6, "Type 'challenge' to see your progress."),
+    }
+
+    def __init__(self, seed):
+        # Everything random about the level comes from the seed
+        rng = variants.rng("linux/1", seed)
+        self.seed = seed
+        self.other_ip_address = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+        self.randomusername = rng.choice(SSH_USERNAMES)
+        self.randompassword = rng.choice(SSH_PASSWORDS)
+
+        fs = LOCAL_TEMPLATE.fork()
+        fs.writable("/home/user/notes.txt").write(f"The ssh IP address for the other computer is {self.other_ip_address}")
+        fs.writable("/home/user/Documents/ssh_Username.txt").write(f"You found the ssh_Username.txt!\nUsername: {self.randomusername}")
+        fs.writable("/home/user/Documents/ssh_Password.txt").write(f"You found the ssh_Password.txt!\nPassword: {self.randompassword}")
+        super().__init__(fs, "/home/user")
+        self.network = build_network(self.other_ip_address, variants.rng("linux/1 network", seed))
+
+        self.on_remote = False
+        self.local_session = None
+
+    @property
+    def host(self):
+        # The machine the player is on
+        return self.network.named("linux-remote") if self.on_remote else self.network.local
+
+    def login_remote(self):
+        self.on_remote = True
+        self.local_session = (self.fs, self.cwd)
+        self.fs, self.cwd = REMOTE_TEMPLATE.fork(), "/home/ban5hee"
+        self.user = "ban5hee"
+
+    def logout_remote(self):
+        self.on_remote = False
+        self.fs, self.cwd = self.local_session
+        self.user = "user"
 
-    challenge_state = {i: False for i in range(1, 7)}
+    def save(self):
+        local = self.local_session if self.on_remote else (self.fs, self.cwd)
+        remote = (self.fs.changes(), self.cwd) if self.on_remote else None
+        return (self.progress, local[0].changes(), local[1], remote)
 
-    print("Type command 'challenge' to see your progress.\n")
-    input("Press Enter to start...")
+    def restore(self, fields):
+        self.progress, changes, self.cwd, remote = fields
+        self.fs.apply(changes)
+        if remote is not None:
+            self.login_remote()
+            self.fs.apply(remote[0])
+            self.cwd = remote[1]
 
 
-    processes = random.randint(100, 200)
-    memoryusage = random.randint(100, 800)
-    time1 = random.randint(1, 24)
-    time2 = random.randint(10, 59)
-    time3 = random.randint(10, 59)
-    day = random.randint(1, 28)
-    ip_parts = [str(random.randint(1, 254)) for _ in range(4)]
-    other_ip_address = ".".join(ip_parts)
-    ip_address = ".".join(ip_parts)
+# Sessions start from instances built ahead of time
+POOL = variants.VariantPool(Level1State)
 
-    print("\nWelcome to the Linux CLI Flag Challenge level 1 (INTRO) made by (Fr4nc0eur)\n")
-    input("Press Enter to continue...")
+
+# Commands available on both machines
+SHARED_COMMANDS = CommandRegistry(parent=NETWORK_COMMANDS, level=levels.name_of(__file__))
+# Commands on the player's own machine
+LOCAL_COMMANDS = CommandRegistry(parent=SHARED_COMMANDS)
+# Commands after a successful ssh login
+REMOTE_COMMANDS = CommandRegistry(
+    parent=SHARED_COMMANDS,
+    not_found=lambda state, name: print(f"{name}: command not found on remote"),
+)
+
+
+@SHARED_COMMANDS.command("exit")
+def cmd_exit(state, args):
+    if state.on_remote:
+        print("Logging out of remote machine.")
+        state.logout_remote()
+        return None
+    print("logout")
+    return EXIT
+
+
+@SHARED_COMMANDS.command("challenge")
+def cmd_challenge(state, args):
+    print()
+    print_challenges(state.progress)
     print()
 
-    print_challenges(challenge_state)
-    print("\nWelcome to Ubuntu 20.04.6 LTS (GNU/Linux 5.15.0-91-generic x86_64)\n")
-    print("* Documentation: https://help.ubuntu.com")
-    print("* Management:    https://landscape.canonical.com")
-    print("* Support:       https://ubuntu.com/advantage\n")
-    print(f"System information as of [Thu Oct {day} {time1:02d}:{time2:02d}:{time3:02d} UTC 2025]\n")
-    print(f"System load: 0.00               Processes:          {processes}")
-    print("Usage of /:   20.75% of 49.11GB  Users logged in:     1")
-    print(f"Memory usage: {memoryusage}MB             IP address for eth0: {ip_address}")
-    print("Swap usage:   0%\n")
-    print("0 updates can be applied immediately\n")
-    print("Last Login: Thu Oct 3 12:00:00 UTC 2025\n")
-
-
-    current_directory = "~"
-    ssh_username = ['JoeBiden', 'DonaldTrump', 'JeremyClarkson', 'RichardHammond', 'JamesMay', 'GordonRamsay', 'ColdPlay', 'JeffreyDahmer', 'HarryPotter', 'KimJongUn']
-    ssh_password = ['DumbassLeftHisPassword', 'Password123!', 'ILeftMyKeysAgain', 'Admin1234', 'qwerty_is_bad', 'LetMeInPlease', 'Eggcellent123', 'Passw0rd!', 'ThisIsNotASecurePass', 'ForgottenPassword69',]
-    randomusername = random.choice(ssh_username)
-    randompassword = random.choice(ssh_password)
-    on_remote = False
 
-    while True:
-        if on_remote:
-            prompt = f"ban5hee@linux-remote:~$ "
-        else:
-            prompt = f"user@linux:{current_directory}$ "
+@LOCAL_COMMANDS.command("ssh")
+def cmd_ssh(state, args):
+    # ssh [user@]host; without a host, the other computer
+    if not args:
+        print("Attempting to ssh into other computer...")
+        host, user_input = state.network.named("linux-remote"), None
+    else:
+        user_input, _, name = args[-1].rpartition("@")
+        host = state.network.resolve(name)
+        if host is None:
+            print(f"ssh: Could not resolve hostname {name}: Name or service not known")
+            return FAILED
+        if isinstance(host, int) or state.network.route(state.host, host) is None:
+            print(f"ssh: connect to host {name} port 22: No route to host")
+            return FAILED
+        if 22 not in host.services:
+            print(f"ssh: connect to host {name} port 22: Connection refused")
+            return FAILED
+    if not user_input:
+        user_input = input("Username: ").strip()
+    password_input = input("Password: ").strip()
+
+    if (host.name == "linux-remote" and user_input == state.randomusername
+            and password_input == state.randompassword):
+        print("Correct credentials. Successfully ssh'd into other computer.")
+        state.login_remote()
+        state.complete(5)
+    else:
+        print("Authentication failed.")
+        return FAILED
 
-        command = input(prompt).strip()
 
+@REMOTE_COMMANDS.command("ls")
+def cmd_remote_ls(state, args):
+    if not args:
+        print("Use -la to find the hidden.txt")
+    else:
+        return cmd_ls(state, args)
+
+
+def main():
+    with persist.resumable(__file__, POOL) as (seed, state, save, resumed):
+        return play(seed, state, save, resumed)
 
-        if command == "exit":
 
-            if on_remote:
-                print("Logging out of remote machine.")
-                on_remote = False
-                continue
+def play(seed, state, save, resumed):
+    event("variant", seed=seed)
+
+    if resumed:
+        print(f"Instance: {seed} (resumed from your last save)\n")
+    else:
+        print(f"Instance: {seed}")
+        print("Type command 'challenge' to see your progress.\n")
+        wait_for_enter("Press Enter to start...")
+
+        print("\nWelcome to the Linux CLI Flag Challenge level 1 (INTRO) made by (Fr4nc0eur)\n")
+        wait_for_enter("Press Enter to continue...")
+        print()
+
+    ip_address = state.other_ip_address
+
+    print_challenges(state.progress)
+    print_motd(ip_address, variants.rng("linux/1 motd", seed))
+
+    while True:
+        if state.on_remote:
+            prompt = f"ban5hee@linux-remote:~$ "
+            commands = REMOTE_COMMANDS
+        else:
+            prompt = f"user@linux:{state.fs.display(state.cwd, tilde=True)}$ "
+            commands = LOCAL_COMMANDS
+
+        try:
+            command = input(prompt).strip()
+            result = commands.dispatch(state, command)
+        except EOFError:
             print("logout")
             break
+        if save is not None:
+            save.checkpoint(state)
 
-        if command == "challenge":
-            print()
-            print_challenges(challenge_state)
-            print()
-            continue
-
-        if not on_remote:
-
-            if command == "ls":
-                if current_directory == "~":
-                    print("Bin.txt  Flag  notes.txt  Documents")
-                elif current_directory == "~/Flag":
-                    print("Flag.txt  something.txt  birthday.txt")
-                elif current_directory == "~/Documents":
-                    print("ssh_Username.txt  ssh_Password.txt")
-            elif command == "pwd":
-                print("/home/user" + ("" if current_directory == "~" else current_directory[1:]))
-            elif command == "whoami":
-                print("user")
-            elif command == "cd Flag":
-                current_directory = "~/Flag"
-            elif command == "cd Documents":
-                current_directory = "~/Documents"
-            elif command == "cd ..":
-                current_directory = "~"
-            elif command.startswith("cat "):
-                filename = command[4:]
-
-                if current_directory == "~":
-                    if filename == "notes.txt":
-                        print(f"The ssh IP address for the other computer is {other_ip_address}")
-                        if not challenge_state[4]:
-                            challenge_state[4] = True
-                            print("You completed challenge 4! Type 'challenge' to see your progress.")
-                    elif filename == "Bin.txt":
-                        print("Just some random binary notes...")
-                    else:
-                        print(f"cat: {filename}: No such file")
-                elif current_directory == "~/Flag":
-                    if filename == "Flag.txt":
-                        print("You completed challenge 1! Type 'challenge' to see your progress.")
-                        challenge_state[1] = True
-                    elif filename == "birthday.txt":
-                        print("Happy Birthday John!")
-                    elif filename == "something.txt":
-                        print("I don't know what to put here.")
-                    else:
-                        print(f"cat: {filename}: No such file")
-                elif current_directory == "~/Documents":
-                    if filename == "ssh_Username.txt":
-                        print("You found the ssh_Username.txt!")
-                        print("Username:", randomusername)
-                        if not challenge_state[2]:
-                            challenge_state[2] = True
-                            print("You completed challenge 2! Type 'challenge' to see your progress.")
-                    elif filename == "ssh_Password.txt":
-                        print("You found the ssh_Password.txt!")
-                        print("Password:", randompassword)
-                        if not challenge_state[3]:
-                            challenge_state[3] = True
-                            print("You completed challenge 3! Type 'challenge' to see your progress.")
-                    else:
-                        print(f"cat: {filename}: No such file")
-                else:
-                    print(f"cat: {filename}: No such file")
-            elif command.startswith("ssh"):
-                print("Attempting to ssh into other computer...")
-                user_input = input("Username: ").strip()
-                password_input = input("Password: ").strip()
-
-                if user_input == randomusername and password_input == randompassword:
-                    print("Correct credentials. Successfully ssh'd into other computer.")
-                    on_remote = True
-                    if not challenge_state[5]:
-                        challenge_state[5] = True
-                        print("You completed challenge 5! Type 'challenge' to see your progress.")
-                else:
-                    print("Authentication failed.")
-            elif command == "":
-                continue
-            else:
-                print(f"{command}: command not found")
-        else:
-            if command == "ls":
-                print("Use -la to find the hidden.txt")
-            elif command == "ls -la":
-                print(".  ..  hidden.txt")
-            elif command == "cat hidden.txt":
-                print("You found the hidden.txt! You completed challenge 6!")
-                if not challenge_state[6]:
-                    challenge_state[6] = True
-                    print("Type 'challenge' to see your progress.")
-            elif command == "":
-                continue
-            else:
-                print(f"{command}: command not found on remote")
+        if result == EXIT:
+            break
+
+    if save is not None and state.all_done:
+        save.finish()
+    return state.all_done
 
 if __name__ == "__main__":
     main()
@@ -1,348 +1,426 @@
-import random
-
-def build_challenge_list(state):
-    return [
-        "",
-        f"{'✅' if state[1] else '◻️'} 1) Read /home/user/locked.log.",
-        "",
-        f"{'✅' if state[2] else '◻️'} 2) Gain access to /srv/team/shared_notes.txt.",
-        "",
-        f"{'✅' if state[3] else '◻️'} 3) Use /var/shared (sticky dir) to create proof.txt.",
-        "",
-        f"{'✅' if state[4] else '◻️'} 4) Execute a misconfigured helper script that runs with elevated privileges.",
-        "",
-        f"{'✅' if state[5] else '◻️'} 5) Fix a file owned by nobody so a service can start.",
-        "",
-        f"{'✅' if state[6] else '◻️'} 6) Locate a SUID binary and use it to read a sensitive file.",
-        "",
-    ]
-
-def print_challenges(state):
-    for line in build_challenge_list(state):
-        print(line)
-
-def main():
-    challenge_state = {i: False for i in range(1, 7)}
-
-    print("Type command 'challenge' to see your progress.\n")
-    input("Press Enter to start...")
-
-    # Random MOTD bits
-    processes = random.randint(100, 200)
-    memoryusage = random.randint(100, 800)
-    time1 = random.randint(1, 24)
-    time2 = random.randint(10, 59)
-    time3 = random.randint(10, 59)
-    day = random.randint(1, 28)
-    ip_parts = [str(random.randint(1, 254)) for _ in range(4)]
-    ip_address = ".".join(ip_parts)
-
-    print("\nWelcome to the Linux CLI Flag challenge LEVEL 2 (Permissions) made by (Fr4nc0eur)\n")
-    input("Press Enter to continue...")
+import datetime
+import posixpath
+
+from cli_lab import access, levels, metrics, persist, variants, world
+from cli_lab.dispatch import EXIT, FAILED, NOT_FOUND, CommandRegistry
+from cli_lab.render import Checklist, screen
+from cli_lab.session import event, input, print, show, wait_for_enter
+from cli_lab.vfs import VirtualFS
+from .utils import COMMON_COMMANDS, ShellState, find_matches, print_motd
+
+CHECKLIST = Checklist([
+    "Read /home/user/locked.log.",
+    "Gain access to /srv/team/shared_notes.txt.",
+    "Use /var/shared (sticky dir) to create proof.txt.",
+    "Execute a misconfigured helper script that runs with elevated privileges.",
+    "Fix a file owned by nobody so a service can start.",
+    "Locate a SUID binary and use it to read a sensitive file.",
+])
+
+def build_challenge_list(progress):
+    return CHECKLIST.lines(progress)
+
+def print_challenges(progress):
+    show(CHECKLIST.render(progress))
+
+
+def complete_config(state, inode):
+    if inode.owner == "service" and not state.done(5):
+        print("You fixed ownership of /etc/service/config.json to service:service.")
+        print("The service can now start successfully.")
+        state.complete(5)
+
+
+def read_config(state, inode):
+    if inode.owner != "service":
+        print("Log: service cannot start due to incorrect file ownership.")
+    else:
+        print("Log: service started successfully.")
+
+
+def create_proof(state, inode):
+    if not state.done(3):
+        print(f"Created {posixpath.basename(state.proof)} in sticky dir /var/shared.")
+        state.complete(3)
+
+
+# Where an instance may plant its SUID binary
+SUID_DIRECTORIES = ("/usr/bin", "/usr/sbin", "/usr/local/sbin", "/usr/lib/openssh",
+                    "/opt/audit/bin", "/var/lib/backup/bin")
+
+
+class Level2State(ShellState):
+    # suid_tool: where this instance planted the SUID binary; helper_token
+    # and flag: the secrets it prints; member: its login (cli_lab.world);
+    # proof: the file challenge 3 wants created
+    __slots__ = ("seed", "ip_address", "suid_tool", "helper_token", "flag", "suid_found",
+                 "member", "proof")
+    on_read = {
+        "/home/user/locked.log": lambda state, inode: state.complete(1),
+        "/srv/team/shared_notes.txt": lambda state, inode: state.complete(2),
+        "/etc/service/config.json": read_config,
+    }
+    on_chown = {
+        "/etc/service/config.json": complete_config,
+    }
+
+    def __init__(self, seed):
+        rng = variants.rng("linux/2", seed)
+        self.seed = seed
+        self.ip_address = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+        self.suid_tool = rng.choice(SUID_DIRECTORIES) + "/suid_tool"
+        self.helper_token = f"PERM-HELPER-{rng.randrange(16 ** 6):06X}"
+        self.flag = f"PERM-LEVEL2-{rng.randrange(16 ** 6):06X}"
+        fs = TEMPLATE.fork()
+        fs.add_file(self.suid_tool, "", mode=0o4755, size=16712)
+        super().__init__(fs, "/home/user")
+        self.suid_found = False
+        self.member = None
+        self.proof = "/var/shared/proof.txt"
+
+    @property
+    def on_create(self):
+        return {self.proof: create_proof}
+
+    def save(self):
+        return super().save() + (self.suid_found,)
+
+    def restore(self, fields):
+        super().restore(fields[:-1])
+        self.suid_found = fields[-1]
+
+
+def build_filesystem():
+    fs = VirtualFS(home="/home/user")
+    fs.mkdir("/home/user", owner="user", group="user")
+    fs.add_file("/home/user/locked.log",
+                "Root-only log contents: You found the first permissions clue.\n"
+                "CLUE: Groups and permissions matter. Check /srv/team next.",
+                mode=0o600, size=120)
+    fs.mkdir("/home/user/Documents", owner="user", group="user", mtime=datetime.datetime(2025, 10, 4, 15, 1))
+    fs.symlink("/home/user/srv", "/srv")
+    fs.symlink("/home/user/var", "/var")
+    fs.symlink("/home/user/etc", "/etc")
+
+    fs.add_file("/home/user/Documents/notes.txt",
+                "Remember: 'ls -l' shows permissions. 'rwx' bits matter.",
+                owner="user", group="user", mtime=datetime.datetime(2025, 10, 4, 15, 1))
+    fs.add_file("/home/user/Documents/permissions_tips.txt",
+                "Tips:\n"
+                "- Use 'sudo' to act as root for specific commands.\n"
+                "- Group permissions (like 'investigators') control access.\n"
+                "- Sticky bit on /var/shared prevents others from deleting your files.",
+                owner="user", group="user", mtime=datetime.datetime(2025, 10, 4, 15, 1))
+
+    fs.add_file("/srv/team/shared_notes.txt",
+                "You read /srv/team/shared_notes.txt:\n"
+                "NOTE: Only members of 'investigators' should read this.\n"
+                "CLUE: Misconfigured scripts and SUID tools can be dangerous...",
+                mode=0o640, owner="admin", group="investigators", mtime=datetime.datetime(2025, 10, 4, 15, 2))
+    fs.mkdir("/var/shared", mode=0o1777, group="shared", mtime=datetime.datetime(2025, 10, 4, 15, 3))
+    fs.add_file("/var/shared/handoff.txt",
+                "Shift handoff: everyone may write here, but only a file's owner may delete it.",
+                mode=0o666, owner="admin", group="shared", mtime=datetime.datetime(2025, 10, 4, 15, 3))
+    fs.add_file("/etc/service/config.json", "{'service': 'audit', 'service_enabled': true}",
+                owner="nobody", group="nobody", size=180, mtime=datetime.datetime(2025, 10, 4, 15, 2))
+    fs.add_file("/usr/local/bin/helper_script", "", mode=0o4755, size=912)
+    # The SUID binary itself is planted per instance by Level2State
+    return fs
+
+
+TEMPLATE = build_filesystem()
+# Directories every player on a shared machine sees the same
+SHARED_DIRECTORIES = ("/var/shared",)
+POOL = variants.VariantPool(Level2State)
+
+COMMANDS = CommandRegistry(parent=COMMON_COMMANDS, level=levels.name_of(__file__))
+
+
+HELP = screen(
+    "Available commands:",
+    "  help                - Show this help message",
+    "  ls / ls -l          - List files (long format shows permissions/owners)",
+    "  cd <dir>            - Change directory (~, srv, /srv/team, /var/shared, /etc/service)",
+    "  pwd                 - Print current directory",
+    "  whoami              - Show current user",
+    "  who / ps aux        - Show who is logged in / every running process",
+    "  clear               - Clear the screen",
+    "  cat <file>          - Read file contents (may be permission denied!)",
+    "  touch <file>        - Create empty file (used in /var/shared)",
+    "  rm <file>           - Remove a file (the sticky bit protects others' files)",
+    "  chmod <mode> <file> - Change file permissions (644, u+s, go-w, ...)",
+    "  chown <u:g> <file>  - Change file owner (needs sudo)",
+    "  sudo ...            - Run a command as root",
+    "  helper_script       - Run the misconfigured helper script",
+    "  find / -perm -4000  - Find SUID binaries (-name, -type, -user, -size, -newer)",
+    "  suid_tool           - Run the simulated SUID binary",
+    "  challenge           - Show challenge progress",
+    "  exit                - Exit level 2",
+)
+
+
+def print_help():
+    show(HELP)
+
+
+@COMMANDS.command("exit")
+def cmd_exit(state, args):
+    print("logout")
+    return EXIT
+
+
+@COMMANDS.command("challenge")
+def cmd_challenge(state, args):
+    print()
+    print_challenges(state.progress)
     print()
 
-    print_challenges(challenge_state)
-    print("\nWelcome to Ubuntu 20.04.6 LTS (GNU/Linux 5.15.0-91-generic x86_64)\n")
-    print("* Documentation: https://help.ubuntu.com")
-    print("* Management:    https://landscape.canonical.com")
-    print("* Support:       https://ubuntu.com/advantage\n")
-    print(f"System information as of [Thu Oct {day} {time1:02d}:{time2:02d}:{time3:02d} UTC 2025]\n")
-    print(f"System load: 0.00               Processes:          {processes}")
-    print("Usage of /:   20.75% of 49.11GB  Users logged in:     1")
-    print(f"Memory usage: {memoryusage}MB             IP address for eth0: {ip_address}")
-    print("Swap usage:   0%\n")
-    print("0 updates can be applied immediately\n")
-    print("Last Login: Thu Oct 4 16:00:00 UTC 2025\n")
-
-    current_directory = "/home/user"
-
-    locked_log_unlocked = False
-    shared_accessed = False
-    proof_created = False
-    helper_ran = False
-    config_fixed = False
-    suid_found = False
-    suid_used = False
-
-    def print_help():
-        print("Available commands:")
-        print("  help                - Show this help message")
-        print("  ls / ls -l          - List files (long format shows permissions/owners)")
-        print("  cd <dir>            - Change directory (home, srv, /srv/team, /var/shared, /etc/service)")
-        print("  pwd                 - Print current directory")
-        print("  whoami              - Show current user")
-        print("  cat <file>          - Read file contents (may be permission denied!)")
-        print("  touch <file>        - Create empty file (used in /var/shared)")
-        print("  sudo ...            - Simulated sudo for certain commands")
-        print("  helper_script       - Run the misconfigured helper script")
-        print("  find / -perm -4000  - Find SUID binaries (simulated)")
-        print("  suid_tool           - Run the simulated SUID binary")
-        print("  challenge           - Show challenge progress")
-        print("  exit                - Exit level 2")
-
-    def print_ls(directory, long=False):
-        if directory == "/home/user":
-            if not long:
-                print("locked.log  Documents  srv  var  etc")
-            else:
-                print("total 5")
-                print("-rw------- 1 root   root   120 Oct  4 15:00 locked.log")
-                print("drwxr-xr-x 2 user   user  4096 Oct  4 15:00 Documents")
-                print("drwxr-xr-x 3 root   root  4096 Oct  4 15:00 srv")
-                print("drwxrwxrwt 2 root   root  4096 Oct  4 15:00 var")
-                print("drwxr-xr-x 3 root   root  4096 Oct  4 15:00 etc")
-        elif directory == "/home/user/Documents":
-            if not long:
-                print("notes.txt  permissions_tips.txt")
-            else:
-                print("total 2")
-                print("-rw-r--r-- 1 user user 220 Oct  4 15:01 notes.txt")
-                print("-rw-r--r-- 1 user user 420 Oct  4 15:01 permissions_tips.txt")
-        elif directory == "/srv/team":
-            if not long:
-                print("shared_notes.txt")
-            else:
-                print("total 1")
-                print("-rw-r----- 1 admin investigators 350 Oct  4 15:02 shared_notes.txt")
-        elif directory == "/var/shared":
-            if not long:
-                if proof_created:
-                    print("proof.txt")
-                else:
-                    print("")
-            else:
-                print("drwxrwxrwt 2 root shared 4096 Oct  4 15:03 .")
-                print("drwxr-xr-x 3 root root   4096 Oct  4 15:00 ..")
-                if proof_created:
-                    print("-rw-r--r-- 1 user user   10 Oct  4 15:05 proof.txt")
-        elif directory == "/etc/service":
-            if not long:
-                print("config.json")
-            else:
-                owner = "service" if config_fixed else "nobody"
-                group = owner
-                print("total 1")
-                print(f"-rw-r--r-- 1 {owner} {group} 180 Oct  4 15:02 config.json")
-        else:
-            if not long:
-                print("")
-            else:
-                print("total 0")
-
-    while True:
-        prompt = f"user@linux:{current_directory}$ "
-        command = input(prompt).strip()
-
-        if command == "":
-            continue
-
-        if command == "exit":
-            print("logout")
-            break
-
-        if command == "challenge":
-            print()
-            print_challenges(challenge_state)
-            print()
-            continue
-
-        if command == "help":
-            print_help()
-            continue
-
-        if command == "pwd":
-            print(current_directory)
-            continue
-
-        if command == "whoami":
-            print("user")
-            continue
-
-        if command.startswith("cd "):
-            target = command[3:].strip()
-            if target in ("~", "/home/user"):
-                current_directory = "/home/user"
-            elif target in ("Documents", "/home/user/Documents"):
-                current_directory = "/home/user/Documents"
-            elif target in ("srv", "/srv"):
-                current_directory = "/srv"
-            elif target in ("/srv/team", "team") and current_directory in ("/srv", "/home/user"):
-                current_directory = "/srv/team"
-            elif target in ("/var/shared", "shared") and current_directory in ("/var", "/home/user"):
-                current_directory = "/var/shared"
-            elif target in ("var", "/var"):
-                current_directory = "/var"
-            elif target in ("/etc/service", "service") and current_directory in ("/etc", "/home/user"):
-                current_directory = "/etc/service"
-            elif target in ("etc", "/etc"):
-                current_directory = "/etc"
-            elif target == "..":
-
-                if current_directory == "/home/user":
-                    pass
-                elif current_directory.startswith("/home/user/"):
-                    current_directory = "/home/user"
-                elif current_directory in ("/srv", "/var", "/etc"):
-                    current_directory = "/home/user"
-                elif current_directory.startswith("/srv/"):
-                    current_directory = "/srv"
-                elif current_directory.startswith("/var/"):
-                    current_directory = "/var"
-                elif current_directory.startswith("/etc/"):
-                    current_directory = "/etc"
-            else:
-                print(f"cd: no such file or directory: {target}")
-            continue
-
-        if command == "ls":
-            print_ls(current_directory, long=False)
-            continue
-
-        if command == "ls -l":
-            print_ls(current_directory, long=True)
-            continue
-
-        if command.startswith("touch "):
-            filename = command[6:].strip()
-            if current_directory == "/var/shared" and filename == "proof.txt":
-                if not proof_created:
-                    proof_created = True
-                    if not challenge_state[3]:
-                        challenge_state[3] = True
-                        print("Created proof.txt in sticky dir /var/shared.")
-                        print("You completed challenge 3! Type 'challenge' to see your progress.")
-                else:
-                    print("proof.txt already exists.")
-            else:
-                print(f"touch: cannot touch '{filename}': Permission denied (simulated)")
-            continue
 
-        if command.startswith("sudo "):
-            sudo_cmd = command[5:].strip()
-
-            if sudo_cmd.startswith("cat "):
-                target = sudo_cmd[4:].strip()
-                if target in ("locked.log", "/home/user/locked.log"):
-                    print("Root-only log contents: You found the first permissions clue.")
-                    print("CLUE: Groups and permissions matter. Check /srv/team next.")
-                    locked_log_unlocked = True
-                    if not challenge_state[1]:
-                        challenge_state[1] = True
-                        print("You completed challenge 1! Type 'challenge' to see your progress.")
-                elif target in ("shared_notes.txt", "/srv/team/shared_notes.txt"):
-                    if not shared_accessed:
-                        shared_accessed = True
-                        if not challenge_state[2]:
-                            challenge_state[2] = True
-                        print("You read /srv/team/shared_notes.txt:")
-                        print("NOTE: Only members of 'investigators' should read this.")
-                        print("CLUE: Misconfigured scripts and SUID tools can be dangerous...")
-                    else:
-                        print("You read /srv/team/shared_notes.txt again.")
-                elif target in ("config.json", "/etc/service/config.json"):
-                    print("Directly reading config.json as root shows:")
-                    print("service_enabled=true")
-                else:
-                    print(f"sudo: cat: {target}: No such file (simulated)")
-
-            elif sudo_cmd.startswith("chown"):
-                if "service:service" in sudo_cmd and "config.json" in sudo_cmd:
-                    if not config_fixed:
-                        config_fixed = True
-                        if not challenge_state[5]:
-                            challenge_state[5] = True
-                        print("You fixed ownership of /etc/service/config.json to service:service.")
-                        print("The service can now start successfully.")
-                    else:
-                        print("Ownership already fixed.")
-                else:
-                    print("sudo: chown: operation not permitted (simulated)")
-            else:
-                print("sudo: command not supported in this simulation.")
-            continue
+@COMMANDS.command("help")
+def cmd_help(state, args):
+    print_help()
 
-        if command.startswith("cat "):
-            filename = command[4:].strip()
-
-            if current_directory == "/home/user":
-                if filename == "locked.log":
-                    print("cat: locked.log: Permission denied (try using sudo).")
-                elif filename == "Bin.txt":
-                    print("Just some random binary notes... 01010101")
-                elif filename == "Flag":
-                    print("No such file or directory.")
-                else:
-                    print(f"cat: {filename}: No such file")
-            elif current_directory == "/home/user/Documents":
-                if filename == "notes.txt":
-                    print("Remember: 'ls -l' shows permissions. 'rwx' bits matter.")
-                elif filename == "permissions_tips.txt":
-                    print("Tips:")
-                    print("- Use 'sudo' to act as root for specific commands.")
-                    print("- Group permissions (like 'investigators') control access.")
-                    print("- Sticky bit on /var/shared prevents others from deleting your files.")
-                else:
-                    print(f"cat: {filename}: No such file")
-            elif current_directory == "/srv/team":
-                if filename == "shared_notes.txt":
-                    print("cat: shared_notes.txt: Permission denied (try 'sudo cat').")
-                else:
-                    print(f"cat: {filename}: No such file")
-            elif current_directory == "/var/shared":
-                if filename == "proof.txt":
-                    if proof_created:
-                        print("Proof file found. System will pick this up for review.")
-                    else:
-                        print("cat: proof.txt: No such file")
-                else:
-                    print(f"cat: {filename}: No such file")
-            elif current_directory == "/etc/service":
-                if filename == "config.json":
-                    owner = "service" if config_fixed else "nobody"
-                    print(f"{{'owner':'{owner}', 'service_enabled':false}}")
-                    if not config_fixed:
-                        print("Log: service cannot start due to incorrect file ownership.")
-                    else:
-                        print("Log: service started successfully.")
-                else:
-                    print(f"cat: {filename}: No such file")
-            else:
-                print(f"cat: {filename}: No such file")
-            continue
 
-        if command == "helper_script":
-            print("Running helper_script with elevated privileges (simulated SUID root)...")
-            print("Helper script outputs: 'Only root should see this secret token: PERM-HELPER-ROOT-TOKEN'")
-            helper_ran = True
-            if not challenge_state[4]:
-                challenge_state[4] = True
-                print("You completed challenge 4! Type 'challenge' to see your progress.")
+@COMMANDS.command("touch", min_args=1, usage="touch: missing file operand")
+def cmd_touch(state, args):
+    result = None
+    for filename in args:
+        if state.resolve(filename) is not None:
             continue
-
-        if command.startswith("find "):
-            if command.strip() == "find / -perm -4000 -type f 2>/dev/null":
-                print("/usr/bin/suid_tool")
-                suid_found = True
-            else:
-                print("find: no results (this simulation only supports 'find / -perm -4000 -type f 2>/dev/null')")
+        parent, slash, _ = filename.rpartition("/")
+        directory = state.resolve((parent or "/") if slash else ".")
+        if directory is None or not directory.is_dir:
+            print(f"touch: cannot touch '{filename}': No such file or directory")
+            result = FAILED
+        elif not access.may_create(state.principal, directory):
+            print(f"touch: cannot touch '{filename}': Permission denied")
+            result = FAILED
+        else:
+            inode = state.fs.add_file(filename, owner=state.user, cwd=state.cwd,
+                                      group=access.new_group(state.principal, directory))
+            hook = state.on_create.get(state.fs.path_of(inode))
+            if hook is not None:
+                hook(state, inode)
+    return result
+
+
+@COMMANDS.command("chown", min_args=2, usage="chown: missing operand")
+def cmd_chown(state, args):
+    owner, _, group = args[0].partition(":")
+    result = None
+    for filename in args[1:]:
+        inode = state.resolve(filename)
+        if inode is None:
+            print(f"chown: cannot access '{filename}': No such file or directory")
+            result = FAILED
+        elif not state.principal.root:
+            print(f"chown: changing ownership of '{filename}': Operation not permitted")
+            result = FAILED
+        else:
+            inode = state.fs.writable(filename, state.cwd)
+            inode.chown(owner, group)
+            hook = state.on_chown.get(state.fs.path_of(inode))
+            if hook is not None:
+                hook(state, inode)
+    return result
+
+
+@COMMANDS.command("chmod", min_args=2, usage="chmod: missing operand")
+def cmd_chmod(state, args):
+    result = None
+    for filename in args[1:]:
+        inode = state.resolve(filename)
+        if inode is None:
+            print(f"chmod: cannot access '{filename}': No such file or directory")
+            result = FAILED
             continue
+        try:
+            mode = access.apply_mode(inode.mode & 0o7777, args[0])
+        except access.AccessError as error:
+            print(f"chmod: {error}")
+            return FAILED
+        if not access.permits(state.principal, inode, access.CONTROL):
+            print(f"chmod: changing permissions of '{filename}': Operation not permitted")
+            result = FAILED
+        else:
+            state.fs.writable(filename, state.cwd).chmod(mode)
+    return result
+
+
+@COMMANDS.command("rm", min_args=1, usage="rm: missing operand")
+def cmd_rm(state, args):
+    result = None
+    for filename in args:
+        inode = state.resolve(filename, follow=False)
+        if inode is None:
+            print(f"rm: cannot remove '{filename}': No such file or directory")
+            result = FAILED
+        elif inode.is_dir:
+            print(f"rm: cannot remove '{filename}': Is a directory")
+            result = FAILED
+        elif not access.may_remove(state.principal, state.fs.parent_of(inode), inode):
+            print(f"rm: cannot remove '{filename}': Operation not permitted")
+            result = FAILED
+        else:
+            state.fs.remove(filename, state.cwd)
+    return result
+
+
+@COMMANDS.command("sudo", min_args=1, usage="usage: sudo <command>")
+def cmd_sudo(state, args):
+    user, state.user = state.user, "root"
+    try:
+        result = COMMANDS.run(state, args)
+    finally:
+        state.user = user
+    if result is NOT_FOUND:
+        metrics.missed(COMMANDS.level)
+        print(f"sudo: {args[0]}: command not found")
+        return FAILED
+    return result
+
+
+def execute(state, name, path):
+    # Who the program at path runs as, or None after printing why it can't
+    # be run
+    inode = state.fs.lookup(path)
+    if inode is None:
+        print(f"bash: {name}: No such file or directory")
+        return None
+    runner = access.runs_as(state.principal, inode)
+    if runner is None:
+        print(f"bash: {name}: Permission denied")
+    return runner
+
+
+@COMMANDS.command("who", max_args=0)
+def cmd_who(state, args):
+    logins = state.member.machine.logins.snapshot()
+    for number in sorted(logins):
+        login = logins[number]
+        print(f"{login.account:<8} {login.tty:<12} {login.since:%Y-%m-%d %H:%M} ({login.address})")
+
+
+@COMMANDS.command("ps")
+def cmd_ps(state, args):
+    # ps: this terminal's processes; ps aux, ps -e or ps -ef: everybody's
+    machine = state.member.machine
+    login = state.member.login
+    processes = sorted(machine.processes.snapshot().values(), key=lambda process: process.pid)
+    own = world.Process(next(machine.pids), state.user, login.tty, login.since, "ps " + " ".join(args))
+    if not args:
+        print("    PID TTY          TIME CMD")
+        for process in processes + [own]:
+            if process.tty == login.tty:
+                print(f"{process.pid:>7} {process.tty:<8} 00:00:00 {process.command.split()[0].lstrip('-')}")
+        return
+    print("USER         PID TTY      STAT START   COMMAND")
+    for process in processes + [own]:
+        started = f"{process.started:%H:%M}" if process.started is not None else "Oct04"
+        stat = "R+" if process is own else "Ss"
+        print(f"{process.user:<8} {process.pid:>7} {process.tty or '?':<8} {stat:<4} {started:<7} "
+              f"{process.command.rstrip()}")
+
+
+@COMMANDS.command("helper_script", max_args=0)
+def cmd_helper_script(state, args):
+    runner = execute(state, "helper_script", "/usr/local/bin/helper_script")
+    if runner is None:
+        return FAILED
+    if not runner.root:
+        print(f"Running helper_script as {runner.name}...")
+        print("Helper script outputs: 'cannot read the secret token: Permission denied'")
+        return FAILED
+    print("Running helper_script with elevated privileges (simulated SUID root)...")
+    print(f"Helper script outputs: 'Only root should see this secret token: {state.helper_token}'")
+    state.complete(4)
+
+
+@COMMANDS.command("find", stream=True)
+def cmd_find(state, args, stdin):
+    matches = find_matches(state, args)
+    if matches is None:
+        return FAILED
+    for shown, path in matches:
+        if path == state.suid_tool:
+            state.suid_found = True
+        yield shown
+    return None
+
+
+@COMMANDS.command("suid_tool", max_args=0)
+def cmd_suid_tool(state, args):
+    if not state.suid_found:
+        print("bash: suid_tool: command not found (try finding it first with 'find').")
+        return FAILED
+    runner = execute(state, "suid_tool", state.suid_tool)
+    if runner is None:
+        return FAILED
+    if not runner.root:
+        print(f"Running suid_tool as {runner.name}...")
+        print("suid_tool: cannot open the root-only file: Permission denied")
+        return FAILED
+    if not state.done(6):
+        print("Running suid_tool as root (simulated)...")
+        print(f"Root-only file contents: FINAL PERMISSIONS FLAG: {state.flag}")
+        state.complete(6)
+    else:
+        print("suid_tool already used. Root-only data already exposed.")
+
+
+def join(state, member):
+    # In shared-world mode the player is a user of their own on a machine
+    # other players are logged in to as well
+    state.member = member
+    if world.current() is None:
+        return
+    state.user = member.account
+    state.proof = f"/var/shared/proof-{member.account}.txt"
+    state.fs.writable("/home/user").chown(member.account, member.account)
+    print(f"Shared machine: {member.others()} other player(s) logged in. /var/shared is theirs too,")
+    print(f"so create {posixpath.basename(state.proof)} there for challenge 3.\n")
 
-        if command == "suid_tool":
-            if not suid_found:
-                print("bash: suid_tool: command not found (try finding it first with 'find').")
-            else:
-                if not suid_used:
-                    suid_used = True
-                    if not challenge_state[6]:
-                        challenge_state[6] = True
-                    print("Running suid_tool as root (simulated)...")
-                    print("Root-only file contents: FINAL PERMISSIONS FLAG: PERM-LEVEL2-COMPLETE")
-                    print("You completed challenge 6! Type 'challenge' to see your progress.")
-                else:
-                    print("suid_tool already used. Root-only data already exposed.")
-            continue
 
-        print(f"{command}: command not found")
+def main():
+    with persist.resumable(__file__, POOL) as (seed, state, save, resumed):
+        return play(seed, state, save, resumed)
+
+
+def play(seed, state, save, resumed):
+    event("variant", seed=seed)
+
+    if resumed:
+        print(f"Instance: {seed} (resumed from your last save)\n")
+    else:
+        print(f"Instance: {seed}")
+        print("Type command 'challenge' to see your progress.\n")
+        wait_for_enter("Press Enter to start...")
+
+        print("\nWelcome to the Linux CLI Flag challenge LEVEL 2 (Permissions) made by (Fr4nc0eur)\n")
+        wait_for_enter("Press Enter to continue...")
+        print()
+
+    print_challenges(state.progress)
+    print_motd(state.ip_address, variants.rng("linux/2 motd", seed))
+
+    with world.login(COMMANDS.level, state.fs, SHARED_DIRECTORIES, state.user) as member:
+        join(state, member)
+        while True:
+            prompt = f"{state.user}@linux:{state.cwd}$ "
+            try:
+                command = input(prompt).strip()
+                result = COMMANDS.dispatch(state, command)
+            except EOFError:
+                print("logout")
+                break
+            if save is not None:
+                save.checkpoint(state)
+            if result == EXIT:
+                break
+
+    if save is not None and state.all_done:
+        save.finish()
+    return state.all_done
 
 if __name__ == "__main__":
     main()
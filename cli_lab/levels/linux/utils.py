@@ -0,0 +1,640 @@
+import collections
+import datetime
+import functools
+
+from cli_lab import access, clock, crypto, find, network, search, session, shell
+from cli_lab.dispatch import FAILED, CommandRegistry
+from cli_lab.pipeline import drain, lines_of, when_shown
+from cli_lab.render import screen
+from cli_lab.session import clear, event, pause, print, show
+from cli_lab.vfs import EXECUTE, READ, long_listing
+
+WELCOME = screen(
+    "\nWelcome to Ubuntu 20.04.6 LTS (GNU/Linux 5.15.0-91-generic x86_64)\n",
+    "* Documentation: https://help.ubuntu.com",
+    "* Management:    https://landscape.canonical.com",
+    "* Support:       https://ubuntu.com/advantage\n",
+)
+
+
+def timestamp(moment):
+    return f"{moment:%a %b} {moment.day} {moment:%H:%M:%S} UTC {moment.year}"
+
+
+def print_motd(ip_address, rng):
+    # The player logs in now: the session clock starts at a login time in
+    # October 2025 and the previous login was up to three days before. The
+    # random bits are drawn from the session instance's rng.
+    processes = rng.randint(100, 200)
+    memoryusage = rng.randint(100, 800)
+    login = clock.EPOCH.replace(day=1, hour=0) + datetime.timedelta(seconds=rng.randrange(28 * 86400))
+    last_login = login - datetime.timedelta(seconds=rng.randint(3600, 3 * 86400))
+    session.clock().set(login)
+
+    show(WELCOME)
+    print(f"System information as of [{timestamp(login)}]\n")
+    print(f"System load: 0.00               Processes:          {processes}")
+    print("Usage of /:   20.75% of 49.11GB  Users logged in:     1")
+    print(f"Memory usage: {memoryusage}MB             IP address for eth0: {ip_address}")
+    print("Swap usage:   0%\n")
+    print("0 updates can be applied immediately\n")
+    print(f"Last Login: {timestamp(last_login)}\n")
+
+
+class ShellState:
+    # Everything shared between sessions (files, text, challenge hooks) lives
+    # at class or module level; an instance only holds the session's delta.
+    __slots__ = ("fs", "cwd", "user", "progress")
+    groups = ("user",)
+    challenges = 6
+    # path -> fn(state, inode), run once a file read with 'cat' (or named
+    # to grep) has shown something on the screen
+    on_read = {}
+
+    def __init__(self, fs, cwd, user="user"):
+        self.fs = fs
+        self.cwd = cwd
+        self.user = user
+        # bit n-1 is set once challenge n is done
+        self.progress = 0
+
+    def done(self, number):
+        return bool(self.progress >> (number - 1) & 1)
+
+    @property
+    def all_done(self):
+        return self.progress == (1 << self.challenges) - 1
+
+    def complete(self, number, message=None):
+        if not self.done(number):
+            self.progress |= 1 << (number - 1)
+            print(message or f"You completed challenge {number}! Type 'challenge' to see your progress.")
+            event("challenge", number=number)
+            if self.all_done:
+                event("level_complete")
+
+    @property
+    def principal(self):
+        # Who the access checks see: the current user with the session's groups
+        return access.principal(self.user, groups=self.groups)
+
+    def resolve(self, path, follow=True):
+        return self.fs.lookup(path, self.cwd, follow)
+
+    def save(self):
+        # Plain values for a save file (cli_lab.persist); restore() puts
+        # them back on a fresh instance of the same seed
+        return (self.cwd, self.user, self.progress, self.fs.changes())
+
+    def restore(self, fields):
+        self.cwd, self.user, self.progress, changes = fields
+        self.fs.apply(changes)
+
+
+COMMON_COMMANDS = CommandRegistry(not_found=lambda state, name: print(f"{name}: command not found"))
+
+
+@COMMON_COMMANDS.command("clear", max_args=0)
+def cmd_clear(state, args):
+    clear()
+
+
+@COMMON_COMMANDS.command("pwd", max_args=0)
+def cmd_pwd(state, args):
+    print(state.cwd)
+
+
+@COMMON_COMMANDS.command("whoami", max_args=0)
+def cmd_whoami(state, args):
+    print(state.user)
+
+
+@COMMON_COMMANDS.command("cd", max_args=1, usage="cd: too many arguments")
+def cmd_cd(state, args):
+    target = args[0] if args else "~"
+    inode = state.resolve(target)
+    if inode is None:
+        print(f"cd: no such file or directory: {target}")
+    elif not inode.is_dir:
+        print(f"cd: not a directory: {target}")
+    elif not access.permits(state.principal, inode, EXECUTE):
+        print(f"cd: permission denied: {target}")
+    else:
+        state.cwd = state.fs.path_of(inode)
+        return None
+    return FAILED
+
+
+@COMMON_COMMANDS.command("ls")
+def cmd_ls(state, args):
+    flags, paths = shell.split_flags(args)
+    show_hidden = "a" in flags
+    result = None
+    for path in paths or ["."]:
+        inode = state.resolve(path, follow=False)
+        if inode is None:
+            print(f"ls: cannot access '{path}': No such file or directory")
+            result = FAILED
+            continue
+        if inode.is_link and "l" not in flags:
+            inode = state.resolve(path)
+
+        if inode.is_dir:
+            if not access.permits(state.principal, inode, READ):
+                print(f"ls: cannot open directory '{path}': Permission denied")
+                result = FAILED
+                continue
+            entries = [(child.name, child) for child in state.fs.listdir(inode, show_hidden)]
+            if show_hidden:
+                entries[:0] = [(".", inode), ("..", state.fs.parent_of(inode))]
+        else:
+            entries = [(path, inode)]
+
+        if "l" in flags:
+            print(f"total {len(entries)}")
+            for line in long_listing(entries):
+                print(line)
+        else:
+            print("  ".join(name for name, _ in entries))
+    return result
+
+
+def watch_read(state, inode):
+    # Runs the level's read hook of inode once the command's output is
+    # seen; an empty file is seen when the command writes to the terminal
+    hook = state.on_read.get(state.fs.path_of(inode))
+    if hook is not None:
+        when_shown(functools.partial(hook, state, inode), shown=not inode.content)
+
+
+def read_files(state, command, filenames):
+    # Lines of each readable file in turn, watched by the level's read
+    # hooks; returns FAILED when one of them couldn't be read
+    result = None
+    for filename in filenames:
+        inode = state.resolve(filename)
+        if inode is None:
+            print(f"{command}: {filename}: No such file")
+            result = FAILED
+        elif inode.is_dir:
+            print(f"{command}: {filename}: Is a directory")
+            result = FAILED
+        elif not access.permits(state.principal, inode, READ):
+            print(f"{command}: {filename}: Permission denied")
+            result = FAILED
+        else:
+            watch_read(state, inode)
+            yield from lines_of(inode.content)
+    return result
+
+
+def input_lines(state, command, filenames, stdin):
+    if filenames:
+        return read_files(state, command, filenames)
+    return stdin if stdin is not None else iter(())
+
+
+@COMMON_COMMANDS.command("cat", stream=True)
+def cmd_cat(state, args, stdin):
+    if not args and stdin is None:
+        print("cat: missing file operand")
+        return FAILED
+    return (yield from input_lines(state, "cat", args, stdin))
+
+
+@COMMON_COMMANDS.command("echo", stream=True)
+def cmd_echo(state, args, stdin):
+    yield " ".join(args)
+
+
+def line_count(command, args):
+    # -n N, -N or -nN as accepted by head and tail; None after an error
+    count = 10
+    filenames = []
+    args = iter(args)
+    for arg in args:
+        if arg == "-n":
+            arg = "-n" + next(args, "")
+        if arg.startswith("-") and len(arg) > 1:
+            value = arg[2:] if arg.startswith("-n") else arg[1:]
+            if not value.isdigit():
+                print(f"{command}: invalid number of lines: '{value}'")
+                return None, ()
+            count = int(value)
+        else:
+            filenames.append(arg)
+    return count, filenames
+
+
+@COMMON_COMMANDS.command("head", stream=True)
+def cmd_head(state, args, stdin):
+    count, filenames = line_count("head", args)
+    if count is None:
+        return FAILED
+    # Stops pulling after count lines, so upstream stages stop too
+    lines = input_lines(state, "head", filenames, stdin)
+    for _ in range(count):
+        try:
+            line = next(lines)
+        except StopIteration as stop:
+            return stop.value
+        yield line
+    return None
+
+
+@COMMON_COMMANDS.command("tail", stream=True)
+def cmd_tail(state, args, stdin):
+    count, filenames = line_count("tail", args)
+    if count is None:
+        return FAILED
+    last = collections.deque(maxlen=count)
+    result = drain(input_lines(state, "tail", filenames, stdin), last.append)
+    yield from last
+    return result
+
+
+GREP_USAGE = "Usage: grep [-cinrvEF] PATTERN [FILE]..."
+GREP_OPTIONS = frozenset("cinrRvEF")
+
+
+def grep_targets(state, filenames, recursive):
+    # (name as shown, inode, named) of every file to search; with -r
+    # directories are searched through, without following symlinks
+    for filename in filenames:
+        inode = state.resolve(filename)
+        if inode is None:
+            print(f"grep: {filename}: No such file or directory")
+            continue
+        if not inode.is_dir:
+            yield filename, inode, True
+            continue
+        if not recursive:
+            print(f"grep: {filename}: Is a directory")
+            continue
+        stack = [(inode, filename)]
+        while stack:
+            node, path = stack.pop()
+            if not node.is_dir:
+                yield path, node, False
+            elif not access.permits(state.principal, node, READ | EXECUTE):
+                print(f"grep: {path}: Permission denied")
+            else:
+                prefix = path if path.endswith("/") else path + "/"
+                for child in reversed(list(node.children.values())):
+                    if not child.is_link:
+                        stack.append((child, prefix + child.name))
+
+
+def grep_file(state, path, inode, named, matcher, invert):
+    if not access.permits(state.principal, inode, READ):
+        print(f"grep: {path}: Permission denied")
+        return
+    # Files only reached through -r don't count as read
+    if named:
+        watch_read(state, inode)
+    yield from search.scan(inode.content, matcher, invert, inode.content_id())
+
+
+@COMMON_COMMANDS.command("grep", stream=True)
+def cmd_grep(state, args, stdin):
+    flags, operands = shell.split_flags(args)
+    for flag in flags:
+        if flag not in GREP_OPTIONS:
+            print(f"grep: unrecognized option '--{flag}'" if len(flag) > 1 else f"grep: invalid option -- '{flag}'")
+            print(GREP_USAGE)
+            return FAILED
+    if not operands:
+        print(GREP_USAGE)
+        return FAILED
+    try:
+        matcher = search.compile_pattern(operands[:1], ignore_case="i" in flags,
+                                         regex="F" not in flags, basic="E" not in flags)
+    except search.PatternError as error:
+        print(f"grep: {error}")
+        return FAILED
+
+    invert = "v" in flags
+    recursive = "r" in flags or "R" in flags
+    filenames = operands[1:] or (["."] if recursive else [])
+    if filenames:
+        sources = ((path, grep_file(state, path, inode, named, matcher, invert))
+                   for path, inode, named in grep_targets(state, filenames, recursive))
+        labeled = recursive or len(filenames) > 1
+    else:
+        sources = [(None, search.filter_lines(stdin or (), matcher, invert))]
+        labeled = False
+
+    # Like grep's exit status, nothing selected is a failure
+    selected = 0
+    for path, matches in sources:
+        prefix = f"{path}:" if labeled else ""
+        if "c" in flags:
+            count = sum(1 for _ in matches)
+            selected += count
+            yield f"{prefix}{count}"
+        elif "n" in flags:
+            for number, line in matches:
+                selected += 1
+                yield f"{prefix}{number}:{line}"
+        else:
+            for _, line in matches:
+                selected += 1
+                yield prefix + line
+    return None if selected else FAILED
+
+
+def find_matches(state, args):
+    # (shown path, real path) pairs for 'find args' as the session's user,
+    # or None after an error
+    try:
+        query = find.parse(tuple(args))
+    except find.FindError as error:
+        print(f"find: {error}")
+        return None
+    return find.search(state.fs, query, state.cwd, state.principal)
+
+
+@COMMON_COMMANDS.command("find", stream=True)
+def cmd_find(state, args, stdin):
+    matches = find_matches(state, args)
+    if matches is None:
+        return FAILED
+    for shown, _ in matches:
+        yield shown
+    return None
+
+
+def readable(state, command, filename):
+    # The file's inode when the session's user may read it
+    inode = state.resolve(filename)
+    if inode is None:
+        print(f"{command}: {filename}: No such file or directory")
+    elif inode.is_dir:
+        print(f"{command}: {filename}: Is a directory")
+    elif not access.permits(state.principal, inode, READ):
+        print(f"{command}: {filename}: Permission denied")
+    else:
+        return inode
+    return None
+
+
+def input_chunks(state, command, filename, stdin):
+    # Byte chunks of a file, or of stdin for none or "-"; None after an error
+    if filename is None or filename == "-":
+        return crypto.line_chunks(stdin if stdin is not None else ())
+    inode = readable(state, command, filename)
+    return None if inode is None else crypto.chunks(inode.content)
+
+
+@COMMON_COMMANDS.command("base64", stream=True)
+def cmd_base64(state, args, stdin):
+    decode, wrap, filenames = False, 76, []
+    arguments = iter(args)
+    for arg in arguments:
+        if arg in ("-d", "--decode"):
+            decode = True
+        elif arg in ("-w", "--wrap") or arg.startswith("--wrap="):
+            value = arg.partition("=")[2] or next(arguments, "")
+            if not value.isdigit():
+                print(f"base64: invalid wrap size: '{value}'")
+                return FAILED
+            wrap = int(value)
+        elif arg.startswith("-") and arg != "-":
+            print(f"base64: invalid option -- '{arg.lstrip('-')}'")
+            return FAILED
+        else:
+            filenames.append(arg)
+    if len(filenames) > 1:
+        print(f"base64: extra operand '{filenames[1]}'")
+        return FAILED
+    source = input_chunks(state, "base64", filenames[0] if filenames else None, stdin)
+    if source is None:
+        return FAILED
+    if not decode:
+        yield from crypto.b64encode_lines(source, wrap)
+        return None
+    try:
+        yield from crypto.text_lines(crypto.b64decode_chunks(crypto.text_lines(source)))
+    except crypto.CryptoError:
+        print("base64: invalid input")
+        return FAILED
+    return None
+
+
+def cmd_checksum(algorithm, state, args, stdin):
+    # md5sum and friends; digests of files are shared by every session
+    result = None
+    for filename in args or ["-"]:
+        if filename == "-":
+            yield f"{crypto.hash_chunks(crypto.line_chunks(stdin or ()), algorithm)}  -"
+            continue
+        inode = readable(state, f"{algorithm}sum", filename)
+        if inode is None:
+            result = FAILED
+        else:
+            yield f"{crypto.digest(inode, algorithm)}  {filename}"
+    return result
+
+
+for algorithm in ("md5", "sha1", "sha256", "sha512"):
+    COMMON_COMMANDS.register(f"{algorithm}sum", functools.partial(cmd_checksum, algorithm), stream=True)
+
+
+@COMMON_COMMANDS.command("xxd", stream=True)
+def cmd_xxd(state, args, stdin):
+    filenames = [arg for arg in args if not arg.startswith("-") or arg == "-"]
+    source = input_chunks(state, "xxd", filenames[0] if filenames else None, stdin)
+    if source is None:
+        return FAILED
+    yield from crypto.xxd_lines(source)
+    return None
+
+
+@COMMON_COMMANDS.command("hexdump", stream=True)
+def cmd_hexdump(state, args, stdin):
+    # Always the canonical -C layout
+    filenames = [arg for arg in args if not arg.startswith("-") or arg == "-"]
+    source = input_chunks(state, "hexdump", filenames[0] if filenames else None, stdin)
+    if source is None:
+        return FAILED
+    yield from crypto.hexdump_lines(source)
+    return None
+
+
+@COMMON_COMMANDS.command("tr", stream=True)
+def cmd_tr(state, args, stdin):
+    # tr SET1 SET2 and tr -d SET1 over stdin, e.g. tr 'A-Za-z' 'N-ZA-Mn-za-m'
+    delete = bool(args) and args[0] == "-d"
+    sets = args[1:] if delete else args
+    if len(sets) != (1 if delete else 2):
+        print("tr: missing operand" if len(sets) < (1 if delete else 2) else f"tr: extra operand '{sets[-1]}'")
+        return FAILED
+    try:
+        table = crypto.tr_table(sets[0], "" if delete else sets[1], delete)
+    except crypto.CryptoError as error:
+        print(f"tr: {error}")
+        return FAILED
+    for line in stdin or ():
+        yield line.translate(table)
+    return None
+
+
+# Commands of levels with a network: their state has a cli_lab.network.Network
+# as `network` and the host the player is on as `host`
+NETWORK_COMMANDS = CommandRegistry(parent=COMMON_COMMANDS)
+# Ports nmap scans without -p
+NMAP_PORTS = ((1, 1000),)
+
+
+def resolve_host(state, command, name):
+    # Host of a name or address, an address nobody has as a bare Host
+    target = state.network.resolve(name)
+    if target is None:
+        print(f"{command}: {name}: Name or service not known")
+        return None
+    if isinstance(target, int):
+        target = network.Host(None, name, target)
+    return target
+
+
+@NETWORK_COMMANDS.command("ping")
+def cmd_ping(state, args):
+    count, operands = 4, []
+    arguments = iter(args)
+    for arg in arguments:
+        if arg == "-c":
+            value = next(arguments, "")
+            if not value.isdigit() or int(value) < 1:
+                print(f"ping: invalid argument: '{value}'")
+                return FAILED
+            count = int(value)
+        elif not arg.startswith("-"):
+            operands.append(arg)
+    if not operands:
+        print("ping: usage error: Destination address required")
+        return FAILED
+    target = resolve_host(state, "ping", operands[-1])
+    if target is None:
+        return FAILED
+    route = state.network.route(state.host, target)
+    if route is None:
+        print("ping: connect: Network is unreachable")
+        return FAILED
+
+    print(f"PING {target.name} ({target.ip}) 56(84) bytes of data.")
+    for sequence in range(1, count + 1):
+        if sequence > 1:
+            pause(1)
+        if route.reached:
+            print(f"64 bytes from {target.label()}: icmp_seq={sequence} ttl={target.ttl - route.routers} "
+                  f"time={route.latency:.1f} ms")
+        else:
+            print(f"From {route.hops[-1][0].ip} icmp_seq={sequence} Destination Host Unreachable")
+    print(f"\n--- {target.name} ping statistics ---")
+    if route.reached:
+        print(f"{count} packets transmitted, {count} received, 0% packet loss, time {(count - 1) * 1000}ms")
+        print(f"rtt min/avg/max/mdev = {route.latency:.3f}/{route.latency:.3f}/{route.latency:.3f}/0.000 ms")
+    else:
+        print(f"{count} packets transmitted, 0 received, +{count} errors, 100% packet loss, "
+              f"time {(count - 1) * 1000}ms")
+        return FAILED
+    return None
+
+
+@NETWORK_COMMANDS.command("traceroute")
+def cmd_traceroute(state, args):
+    operands = [arg for arg in args if not arg.startswith("-")]
+    if not operands:
+        print("Usage: traceroute host")
+        return FAILED
+    target = resolve_host(state, "traceroute", operands[-1])
+    if target is None:
+        return FAILED
+    route = state.network.route(state.host, target)
+    print(f"traceroute to {target.name} ({target.ip}), 30 hops max, 60 byte packets")
+    hops = route.hops if route is not None else []
+    for number, (hop, latency) in enumerate(hops, 1):
+        if number > 1:
+            pause(0.5)
+        probes = "  ".join(f"{probe:.3f} ms" for probe in (latency, latency, latency * 1.1))
+        print(f"{number:2}  {hop.label()}  {probes}")
+    if route is None or not route.reached:
+        print(f"{len(hops) + 1:2}  * * *")
+
+
+def port_ranges(text):
+    # [(low, high)] of a -p list like "22,80,1000-2000" or "-", or None
+    ranges = []
+    for part in text.split(","):
+        low, dash, high = part.partition("-")
+        if not (low or dash) or not all(value.isdigit() for value in (low, high) if value):
+            return None
+        low = int(low) if low else 1
+        high = int(high) if high else (65535 if dash else low)
+        if not 1 <= low <= high <= 65535:
+            return None
+        ranges.append((low, high))
+    return ranges
+
+
+@NETWORK_COMMANDS.command("nmap")
+def cmd_nmap(state, args):
+    # TCP connect scan of hosts (names, addresses, CIDRs, a.b.c.1-50) by
+    # -p ports; -sn only finds the hosts that are up
+    ranges, discover, targets = NMAP_PORTS, False, []
+    arguments = iter(args)
+    for arg in arguments:
+        if arg == "-p" or (arg.startswith("-p") and len(arg) > 2):
+            ranges = port_ranges(arg[2:] or next(arguments, ""))
+            if ranges is None:
+                print("Your port specifications are illegal.  Example of proper form: \"-100,200-1024,T:3000-4000,U:60000-\"")
+                return FAILED
+        elif arg == "-sn":
+            discover = True
+        elif not arg.startswith("-"):
+            targets.append(arg)
+    if not targets:
+        print("Nmap 7.94 ( https://nmap.org )\nUsage: nmap [Scan Type(s)] [Options] {target specification}")
+        return FAILED
+
+    now = session.clock().now()
+    print(f"Starting Nmap 7.94 ( https://nmap.org ) at {now:%Y-%m-%d %H:%M} UTC")
+    scanned, up = 0, 0
+    ports = sum(high - low + 1 for low, high in ranges)
+    for text in targets:
+        span = network.parse_targets(text)
+        if span is None:
+            host = state.network.named(text)
+            if host is None:
+                print(f"Failed to resolve \"{text}\".")
+                continue
+            span = host.address, host.address
+        scanned += span[1] - span[0] + 1
+        for host, open_ports in state.network.scan(state.host, *span, ranges):
+            route = state.network.route(state.host, host)
+            if route is None:
+                continue
+            up += 1
+            print(f"Nmap scan report for {host.label()}")
+            print(f"Host is up ({route.latency / 1000:.4f}s latency).")
+            if discover:
+                continue
+            if not open_ports:
+                print(f"All {ports} scanned ports on {host.label()} are in ignored states.")
+                print(f"Not shown: {ports} closed tcp ports (conn-refused)")
+                print()
+                continue
+            if ports > len(open_ports):
+                print(f"Not shown: {ports - len(open_ports)} closed tcp ports (conn-refused)")
+            width = max(len(f"{port}/tcp") for port in open_ports)
+            print(f"{'PORT':<{width}} STATE SERVICE")
+            for port in open_ports:
+                print(f"{f'{port}/tcp':<{width}} open  {host.services[port]}")
+            print()
+    if not scanned:
+        print("WARNING: No targets were specified, so 0 hosts scanned.")
+    elif not up and scanned == 1:
+        print("Note: Host seems down. If it is really up, but blocking our ping probes, try -Pn")
+    plural = "" if scanned == 1 else "es"
+    hosts = "host" if up == 1 else "hosts"
+    print(f"Nmap done: {scanned} IP address{plural} ({up} {hosts} up) scanned in {0.05 + 0.01 * scanned:.2f} seconds")
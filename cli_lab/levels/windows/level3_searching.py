@@ -1,75 +1,54 @@
 # FILE: level3_searching.py (NEW FILE)
-import time
-from .utils import (
-    clear_screen,
-    print_header,
-    print_objectives,
-    print_success,
-    generic_cmd_handler,
-    CURRENT_DIR,
-)
+from cli_lab.session import pause
 
+from .utils import SpecLevel, cmd_findstr, print_success
 
-LOG_CONTENT = (
-    "12:01:05 SYSTEM Starting service logon.\n"
-    "12:01:10 ERROR Failed connection attempt from 10.0.0.1.\n"
-    "12:01:15 SYSTEM Audit success for user guest.\n"
-    "12:01:20 ALERT FLAG_KEY:HUNT3R_L0G_TRACER\n" # <-- The hidden flag string
-    "12:01:25 SYSTEM Service shutdown complete.\n"
-)
+# Files live in level3_searching.json; the level is won by streaming the key
+# out of system.log with findstr, e.g. 'type system.log | findstr FLAG'.
+LEVEL = SpecLevel(__file__)
+COMMANDS = LEVEL.commands
 
-def run_level():
-    title = "LEVEL 3: SEARCHING THE SYSTEM"
-    objectives = [
-        "A suspicious log file has been created: 'system.log'.",
-        "Use search tools to find the hidden challenge key inside."
-    ]
-    hint = "Use 'findstr' to search the content of 'system.log' for the word 'FLAG'."
-    
-    print_header(title)
-    print_objectives(objectives, hint)
 
-    while True:
-        try:
-            prompt = f"{CURRENT_DIR}> "
-            user_input = input(prompt).strip() # Keep case for findstr
-            parts = user_input.lower().split()
-            cmd = parts[0] if parts else ""
-            
-            common = generic_cmd_handler(cmd, '') # Use empty string for arg check
-            if common == "EXIT": return False
-            if common: continue
-            
-            # Level 3 Specific Logic (Searching)
-            if cmd == "dir" or cmd == "ls":
-                print(f" Directory of {CURRENT_DIR}")
-                print("12/01/2025  12:02 PM             1,200 system.log")
-                print("               1 File(s)          1,200 bytes\n")
+class HuntState(LEVEL.state):
+    # found: the key was printed, so a second findstr in the same pipeline
+    # doesn't announce the win again. shown: the key reached the terminal
+    # during the current command; a key redirected into a file doesn't count.
+    __slots__ = ("found", "shown")
+
+    def __init__(self, level):
+        super().__init__(level)
+        self.found = False
+        self.shown = False
+
+    def on_shown(self, line):
+        if self.level.vars["key"] in line:
+            self.shown = True
+
+    def save(self):
+        return super().save() + (self.found,)
+
+    def restore(self, fields):
+        super().restore(fields[:-1])
+        self.found = fields[-1]
 
-            elif cmd == "type" or cmd == "cat":
-                if "system.log" in user_input:
-                    print("\n[LOG FILE CONTENT PREVIEW]")
-                    print("-" * 30)
-                    print(LOG_CONTENT)
-                    print("-" * 30)
-                else:
-                    print("File not found.")
 
-            elif cmd == "findstr":
-                # Check for the key command: findstr FLAG system.log
-                if "flag" in user_input.lower() and "system.log" in user_input.lower():
-                    print("\n[SEARCH RESULTS]")
-                    print("12:01:20 ALERT FLAG_KEY:HUNT3R_L0G_TRACER")
-                    
-                    # WIN CONDITION
-                    time.sleep(1)
-                    print_success("Key Found! Level 3 Complete.")
-                    return True
-                else:
-                    print("findstr: Search string or file name not specified.")
-            
-            else:
-                print(f"'{user_input}' is not recognized.")
+LEVEL.state = HuntState
 
-        except KeyboardInterrupt:
-            return False
+
+@COMMANDS.command("findstr", stream=True)
+def cmd_hunt(state, args, stdin):
+    # Each line is printed, if it reaches the terminal at all, before the
+    # next one is asked for, so by the time findstr runs out every key it
+    # passed on has been shown
+    state.shown = False
+    result = yield from cmd_findstr(state, args, stdin)
+    if state.shown and not state.found:
+        state.found = True
+        pause(1)
+        print_success("Key Found! Level 3 Complete.")
+        return True
+    return result
+
+
+def run_level():
+    return LEVEL.run()
@@ -1,51 +1,787 @@
+import functools
+import itertools
 import os
+import posixpath
+
+from cli_lab import access, crypto, levels, levelspec, network, persist, search, shell, variants
+from cli_lab.dispatch import EXIT, FAILED, CommandRegistry
+from cli_lab.pipeline import lines_of, when_shown, write_output
+from cli_lab.render import screen
+from cli_lab.session import clear, event, input, pause, print, show, wait_for_enter
+from cli_lab.vfs import DEFAULT_MTIME, EXECUTE, READ, WRITE, VirtualFS
 
 # Shared Game State
 CURRENT_DIR = "C:\\Users\\User"
+HOME = "/Users/User"
+FREE_BYTES = 12345678901
+COMPUTER = "DESKTOP-PC234"
+# Accounts icacls shows under another domain than the computer's
+DOMAINS = {"administrators": "BUILTIN", "users": "BUILTIN", "system": "NT AUTHORITY",
+           "authenticated users": "NT AUTHORITY", "everyone": ""}
+
+
+def build_filesystem(mtime=DEFAULT_MTIME):
+    fs = VirtualFS(home=HOME, drive="C:", ignore_case=True)
+    fs.mkdir(HOME, owner="User", group="Users", mtime=mtime)
+    return fs
+
+
+class LevelState:
+    # Per-session state is just a copy-on-write fork of the level's template
+    # filesystem plus the working directory; files and text stay shared.
+    __slots__ = ("fs", "cwd")
+    template = build_filesystem()
+    # The player, as ACLs see them (cli_lab.access)
+    principal = access.principal("User", "Users", ("Authenticated Users",), windows=True)
+    # path -> fn(state, inode) that replaces the plain 'type' output; it may
+    # return True to finish the level
+    readers = {}
+
+    def __init__(self):
+        self.fs = self.template.fork()
+        self.cwd = HOME
+
+    def resolve(self, path):
+        return self.fs.lookup(path, self.cwd)
+
+
+def format_time(mtime):
+    return f"{mtime:%m/%d/%Y  %I:%M %p}"
+
+
+def print_dir(state, directory):
+    files = [child for child in directory.children.values() if not child.is_dir]
+    dirs = [child for child in directory.children.values() if child.is_dir]
+
+    print(f" Directory of {state.fs.display(state.fs.path_of(directory))}")
+    print()
+    print(f"{format_time(directory.mtime)}    <DIR>          .")
+    print(f"{format_time(state.fs.parent_of(directory).mtime)}    <DIR>          ..")
+    for child in directory.children.values():
+        if child.is_dir:
+            print(f"{format_time(child.mtime)}    <DIR>          {child.name}")
+        else:
+            print(f"{format_time(child.mtime)} {child.file_size():>17,} {child.name}")
+    print(f"{len(files):>16} File(s) {sum(child.file_size() for child in files):>14,} bytes")
+    print(f"{len(dirs) + 2:>16} Dir(s) {FREE_BYTES:>16,} bytes free")
 
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    clear()
+
+@functools.lru_cache(maxsize=None)
+def header_screen(title):
+    banner_width = 70
+    return screen(
+        "*" * banner_width,
+        f"** {title} **".center(banner_width),
+        "*" * banner_width,
+        "| PLATFORM: Windows CTF by Therootexec",
+        "| STATUS:   System Status Nominal.",
+        "+" + "-" * banner_width + "+",
+        "",
+    )
 
 def print_header(title):
     clear_screen()
-    banner_width = 70
-    print("*" * banner_width)
-    print(f"** {title} **".center(banner_width))
-    print("*" * banner_width)
-    print("| PLATFORM: Windows CTF by Therootexec")
-    print("| STATUS:   System Status Nominal.")
-    print("+" + "-" * banner_width + "+")
-    print()
+    show(header_screen(title))
+
+@functools.lru_cache(maxsize=64)
+def objectives_screen(objectives, hint):
+    return screen(
+        ":: CURRENT MISSION OBJECTIVES ::",
+        *(f" [!] {obj}" for obj in objectives),
+        f"\n >> HINT: {hint}",
+        "-" * 50,
+        "",
+    )
 
 def print_objectives(objectives, hint):
-    print(":: CURRENT MISSION OBJECTIVES ::")
-    for obj in objectives:
-        print(f" [!] {obj}")
-    print(f"\n >> HINT: {hint}")
-    print("-" * 50)
-    print()
+    show(objectives_screen(tuple(objectives), hint))
 
 def print_success(message):
     print("\n" + "="*60)
     print(f" SUCCESS: {message}")
     print("="*60)
-    input(" Press ENTER to proceed...")
+    wait_for_enter(" Press ENTER to proceed...")
 
-def generic_cmd_handler(cmd, args):
-    if cmd in ["cls", "clear"]:
-        clear_screen()
-        return True
-    elif cmd == "help" or cmd == "?":
-        print("\n CORE:      HELP      CLS       EXIT")
-        print(" NETWORK:   IPCONFIG  PING      CONNECT")
-        print(" FILE:      DIR       TYPE      PWD")
-        return True
-    elif cmd == "whoami":
-        print("user\\desktop-pc234")
+COMMON_COMMANDS = CommandRegistry(
+    ignore_case=True,
+    dialect=shell.CMD,
+    not_found=lambda state, name: print(f"'{name}' is not recognized."),
+)
+
+
+@COMMON_COMMANDS.command("cls", "clear")
+def cmd_cls(state, args):
+    clear_screen()
+
+
+HELP = screen(
+    "\n CORE:      HELP      CLS       EXIT",
+    " NETWORK:   IPCONFIG  PING      CONNECT",
+    " FILE:      DIR       TYPE      PWD",
+    " TEXT:      ECHO      FINDSTR   MORE",
+    " SECURITY:  ICACLS    TAKEOWN   ATTRIB",
+)
+
+
+@COMMON_COMMANDS.command("help", "?")
+def cmd_help(state, args):
+    show(HELP)
+
+
+@COMMON_COMMANDS.command("whoami")
+def cmd_whoami(state, args):
+    print("user\\desktop-pc234")
+
+
+@COMMON_COMMANDS.command("pwd")
+def cmd_pwd(state, args):
+    print(state.fs.display(state.cwd))
+
+
+@COMMON_COMMANDS.command("cd", "chdir")
+def cmd_cd(state, args):
+    if not args:
+        print(state.fs.display(state.cwd))
+        return
+    target = " ".join(args)
+    inode = state.resolve(target)
+    if inode is None or not inode.is_dir:
+        print("The system cannot find the path specified.")
+    elif not access.permits(state.principal, inode, EXECUTE):
+        print("Access is denied.")
+    else:
+        state.cwd = state.fs.path_of(inode)
+        return None
+    return FAILED
+
+
+@COMMON_COMMANDS.command("dir", "ls")
+def cmd_dir(state, args):
+    paths = [arg for arg in args if not arg.startswith("/")]
+    inode = state.resolve(paths[0]) if paths else state.resolve(".")
+    if inode is None:
+        print("File Not Found")
+    elif not access.permits(state.principal, inode, READ):
+        print("Access is denied.")
+    elif not inode.is_dir:
+        print(f"{format_time(inode.mtime)} {inode.file_size():>17,} {inode.name}")
+        return None
+    else:
+        print_dir(state, inode)
+        return None
+    return FAILED
+
+
+@COMMON_COMMANDS.command("type", "cat", stream=True)
+def cmd_type(state, args, stdin):
+    if not args:
+        print("The syntax of the command is incorrect.")
+        return FAILED
+    result = None
+    for filename in args:
+        inode = state.resolve(filename)
+        if inode is None:
+            print(f"The system cannot find the file specified: {filename}")
+            result = FAILED
+        elif inode.is_dir or not access.permits(state.principal, inode, READ):
+            print("Access is denied.")
+            result = FAILED
+        else:
+            reader = state.readers.get(state.fs.path_of(inode).lower())
+            if reader is not None:
+                yield from reader(state, inode)
+            else:
+                yield from lines_of(inode.content)
+    return result
+
+
+@COMMON_COMMANDS.command("echo", stream=True)
+def cmd_echo(state, args, stdin):
+    yield " ".join(args) if args else "ECHO is on."
+
+
+def input_lines(state, command, filenames, stdin):
+    # Raw lines of the named files (level readers don't apply), else stdin;
+    # returns FAILED when one of them couldn't be opened
+    if not filenames:
+        yield from stdin if stdin is not None else ()
+    result = None
+    for filename in filenames:
+        inode = state.resolve(filename)
+        if inode is None or inode.is_dir or not access.permits(state.principal, inode, READ):
+            print(f"{command}: Cannot open {filename}")
+            result = FAILED
+        else:
+            yield from lines_of(inode.content)
+    return result
+
+
+@COMMON_COMMANDS.command("more", stream=True)
+def cmd_more(state, args, stdin):
+    return (yield from input_lines(state, "MORE", args, stdin))
+
+
+@COMMON_COMMANDS.command("findstr", stream=True)
+def cmd_findstr(state, args, stdin):
+    # findstr [/i] [/v] [/n] [/r] (strings | /c:"literal string") [files]
+    switches = set()
+    strings = None
+    operands = []
+    for arg in args:
+        if arg.lower().startswith("/c:"):
+            strings = (arg[3:],)
+        elif arg.startswith("/") and len(arg) > 1:
+            switches.add(arg[1:].lower())
+        else:
+            operands.append(arg)
+    if strings is None:
+        if not operands:
+            print("FINDSTR: Bad command line")
+            return FAILED
+        strings = tuple(operands.pop(0).split())
+    if not operands and stdin is None:
+        print("FINDSTR: Search string or file name not specified.")
+        return FAILED
+    try:
+        matcher = search.compile_pattern(strings, ignore_case="i" in switches,
+                                         regex="r" in switches, basic=False)
+    except search.PatternError:
+        print("FINDSTR: Bad command line")
+        return FAILED
+
+    invert = "v" in switches
+    if operands:
+        sources = []
+        for filename in operands:
+            inode = state.resolve(filename)
+            if inode is None or inode.is_dir or not access.permits(state.principal, inode, READ):
+                print(f"FINDSTR: Cannot open {filename}")
+            else:
+                sources.append((filename, search.scan(inode.content, matcher, invert, inode.content_id())))
+    else:
+        sources = [(None, search.filter_lines(stdin, matcher, invert))]
+
+    labeled = len(operands) > 1
+    # Like findstr's errorlevel, no line found is a failure
+    found = False
+    for filename, matches in sources:
+        prefix = f"{filename}:" if labeled else ""
+        for number, line in matches:
+            found = True
+            yield f"{prefix}{number}:{line}" if "n" in switches else prefix + line
+    return None if found else FAILED
+
+
+def counted(source, total):
+    # source, adding the length of every chunk to total[0]
+    for chunk in source:
+        total[0] += len(chunk)
+        yield chunk
+
+
+def certutil(state, args):
+    # certutil -decode|-encode infile outfile and -hashfile infile
+    # [algorithm]; returns the inode written, if any, or FAILED. Without an
+    # outfile -decode writes infile.txt and -encode infile.b64.
+    verb = args[0].lower() if args else ""
+    if verb not in ("-decode", "-encode", "-hashfile") or len(args) not in (2, 3):
+        print("CertUtil: Syntax or parameters invalid.")
+        return FAILED
+    source = args[1]
+    inode = state.resolve(source)
+    if inode is None or inode.is_dir:
+        print(f"CertUtil: {verb} command FAILED: {source}: The system cannot find the file specified.")
+        return FAILED
+    if not access.permits(state.principal, inode, READ):
+        print(f"CertUtil: {verb} command FAILED: 0x80070005 (WIN32: 5 ERROR_ACCESS_DENIED)")
+        print("CertUtil: Access is denied.")
+        return FAILED
+
+    if verb == "-hashfile":
+        algorithm = args[2].lower() if len(args) == 3 else "sha1"
+        if algorithm not in crypto.ALGORITHMS:
+            print("CertUtil: -hashfile command FAILED: 0x80090008 (-2146893816 NTE_BAD_ALGID)")
+            return FAILED
+        print(f"{algorithm.upper()} hash of {source}:")
+        print(crypto.digest(inode, algorithm))
+        print("CertUtil: -hashfile command completed successfully.")
+        return None
+
+    extension = ".txt" if verb == "-decode" else ".b64"
+    target = args[2] if len(args) == 3 else posixpath.splitext(source)[0] + extension
+    read, written = [0], [0]
+    source_chunks = counted(crypto.chunks(inode.content), read)
+    if verb == "-decode":
+        body = crypto.pem_body(crypto.text_lines(source_chunks))
+        lines = crypto.text_lines(counted(crypto.b64decode_chunks(body), written))
+    else:
+        lines = counted(itertools.chain(["-----BEGIN CERTIFICATE-----"],
+                                        crypto.b64encode_lines(source_chunks, 64),
+                                        ["-----END CERTIFICATE-----"]), written)
+    # Both are generators, decoded or encoded while write_output joins them
+    try:
+        output = write_output(state, target, lines, dialect=shell.CMD)
+    except crypto.CryptoError:
+        print(f"CertUtil: {verb} command FAILED: The data is invalid.")
+        return FAILED
+    if output is None:
+        return FAILED
+    if verb == "-encode":
+        # Written with CRLF line ends
+        written[0] += 2 * (output.content.count("\n") + 1)
+    print(f"Input Length = {read[0]}")
+    print(f"Output Length = {written[0]}")
+    print(f"\nCertUtil: {verb} command completed successfully.")
+    print(f"Output written to {target}.")
+    return output
+
+
+@COMMON_COMMANDS.command("certutil")
+def cmd_certutil(state, args):
+    return FAILED if certutil(state, args) is FAILED else None
+
+
+# Ownership and ACLs, checked and cached by cli_lab.access
+
+def qualified(trustee):
+    # "User" as icacls shows it, "DESKTOP-PC234\User"
+    if "\\" in trustee:
+        return trustee
+    domain = DOMAINS.get(trustee.lower(), COMPUTER)
+    return f"{domain}\\{trustee}" if domain else trustee
+
+
+def processed(done, failed):
+    print(f"Successfully processed {done} files; Failed processing {failed} files")
+
+
+# The entry a file without an ACL behaves as if it had
+NULL_ACE = ("Everyone", True, access.ALL)
+ICACLS_USAGE = "Usage: ICACLS name [/grant[:r] user:perm] [/deny user:perm] [/remove[:g|:d] user] [/reset]"
+
+
+def changed_acl(acl, args):
+    # acl after icacls' /grant, /deny, /remove and /reset switches; raises
+    # AccessError. No ACL at all grants Everyone full control, which a first
+    # /grant or /deny adds to rather than replaces.
+    acl = list(acl) if acl is not None else [NULL_ACE]
+    switch = None
+    # Whether switch still needs the trustee after it
+    expected = False
+    for arg in args:
+        lowered = arg.lower()
+        if lowered.startswith("/"):
+            if expected:
+                raise access.AccessError(f"Invalid parameter \"{switch}\"")
+            switch = lowered
+            if switch == "/reset":
+                acl = None
+            elif switch not in ("/grant", "/grant:r", "/deny", "/remove", "/remove:g", "/remove:d"):
+                raise access.AccessError(f"Invalid parameter \"{arg}\"")
+            expected = switch != "/reset"
+            continue
+        expected = False
+        if acl is None:
+            acl = [NULL_ACE]
+        if switch is None or switch == "/reset":
+            raise access.AccessError(f"Invalid parameter \"{arg}\"")
+        if switch.startswith("/remove"):
+            key = access.trustee_key(arg)
+            kinds = {"/remove": (True, False), "/remove:g": (True,), "/remove:d": (False,)}[switch]
+            acl = [ace for ace in acl if access.trustee_key(ace[0]) != key or ace[1] not in kinds]
+            continue
+        trustee, allow, mask = access.parse_ace(arg, allow=switch != "/deny")
+        key = access.trustee_key(trustee)
+        if allow:
+            # A grant adds to the trustee's existing one, /grant:r replaces it
+            for index, (name, granted, rights) in enumerate(acl):
+                if granted and access.trustee_key(name) == key:
+                    acl[index] = (name, True, mask if switch == "/grant:r" else rights | mask)
+                    break
+            else:
+                acl.append((qualified(trustee), True, mask))
+        else:
+            # Denials come first, as Windows orders them
+            acl.insert(0, (qualified(trustee), False, mask))
+    if expected:
+        raise access.AccessError(f"Invalid parameter \"{switch}\"")
+    return acl
+
+
+@COMMON_COMMANDS.command("icacls")
+def cmd_icacls(state, args):
+    if not args:
+        print(ICACLS_USAGE)
+        return FAILED
+    filename = args[0]
+    inode = state.resolve(filename)
+    if inode is None:
+        print(f"{filename}: The system cannot find the file specified.")
+        processed(0, 1)
+        return FAILED
+    if len(args) == 1:
+        entries = [access.format_ace(ace) for ace in inode.acl] if inode.acl is not None else ["Everyone:(F)"]
+        for number, entry in enumerate(entries):
+            print(f"{filename if number == 0 else ' ' * len(filename)} {entry}")
+        print()
+        processed(1, 0)
+        return
+    try:
+        acl = changed_acl(inode.acl, args[1:])
+    except access.AccessError as error:
+        print(error)
+        return FAILED
+    if not access.permits(state.principal, inode, access.CONTROL):
+        print(f"{filename}: Access is denied.")
+        processed(0, 1)
+        return FAILED
+    state.fs.writable(filename, state.cwd).set_acl(acl)
+    print(f"processed file: {filename}")
+    processed(1, 0)
+
+
+@COMMON_COMMANDS.command("takeown")
+def cmd_takeown(state, args):
+    lowered = [arg.lower() for arg in args]
+    if "/f" not in lowered or lowered.index("/f") + 1 >= len(args):
+        print("ERROR: Invalid syntax. Value expected for '/F'.")
+        print('Type "TAKEOWN /?" for usage.')
+        return FAILED
+    filename = args[lowered.index("/f") + 1]
+    inode = state.resolve(filename)
+    if inode is None:
+        print("ERROR: The system cannot find the file specified.")
+        return FAILED
+    shown = state.fs.display(state.fs.path_of(inode))
+    if not access.permits(state.principal, inode, access.TAKE):
+        print("ERROR: The current logged on user does not have ownership privileges on")
+        print(f'       the file (or folder) "{shown}".')
+        return FAILED
+    state.fs.writable(filename, state.cwd).chown(state.principal.name)
+    print(f'SUCCESS: The file (or folder): "{shown}" now owned by user "{qualified(state.principal.name)}".')
+
+
+@COMMON_COMMANDS.command("attrib")
+def cmd_attrib(state, args):
+    # attrib [+R | -R] [file]; the read-only attribute is the owner's write bit
+    switches = [arg.upper() for arg in args if arg[:1] in "+-"]
+    names = [arg for arg in args if arg[:1] not in "+-"]
+    for switch in switches:
+        if switch not in ("+R", "-R"):
+            print(f"Parameter format not correct - {switch}")
+            return FAILED
+    result = None
+    if names:
+        inodes = []
+        for name in names:
+            inode = state.resolve(name)
+            if inode is None:
+                print(f"File not found - {name}")
+                result = FAILED
+            else:
+                inodes.append((name, inode))
+    else:
+        directory = state.resolve(".")
+        inodes = [(child.name, child) for child in directory.children.values() if not child.is_dir]
+    for name, inode in inodes:
+        shown = state.fs.display(state.fs.path_of(inode))
+        if not switches:
+            readonly = "R" if not inode.is_dir and not inode.mode & 0o200 else " "
+            print(f"A    {readonly}        {shown}")
+        elif not access.effective(state.principal, inode) & (WRITE | access.CONTROL):
+            print(f"Access denied - {shown}")
+            result = FAILED
+        else:
+            node = state.fs.writable(state.fs.path_of(inode))
+            mode = node.mode & 0o7777
+            node.chmod(mode & ~0o222 if switches[-1] == "+R" else mode | 0o200)
+    return result
+
+
+@COMMON_COMMANDS.command("exit", "quit")
+def cmd_exit(state, args):
+    return EXIT
+
+
+def run_commands(commands, state, keep_case=False, save=None):
+    # Shared prompt loop: True when the level is beaten, False on exit.
+    # With a save (cli_lab.persist) the state is checkpointed after every
+    # command.
+    while True:
+        try:
+            prompt = f"{state.fs.display(state.cwd)}> "
+            user_input = input(prompt).strip()
+            if not keep_case:
+                user_input = user_input.lower()
+
+            result = commands.dispatch(state, user_input)
+            if save is not None:
+                if result is True:
+                    save.finish()
+                else:
+                    save.checkpoint(state)
+            if result == EXIT: return False
+            if result is True:
+                event("challenge", number=1)
+                event("level_complete")
+                return True
+
+        except (KeyboardInterrupt, EOFError):
+            return False
+
+
+class SpecState(LevelState):
+    # level: the compiled variant this session plays; flags: bitset of the
+    # flags its rules set and test
+    __slots__ = ("level", "flags")
+
+    def __init__(self, level):
+        self.level = level
+        self.fs = level.template.fork()
+        self.cwd = HOME
+        self.flags = 0
+
+    def save(self):
+        # Plain values for a save file (cli_lab.persist); restore() puts
+        # them back on a fresh instance of the same seed
+        return (self.cwd, self.flags, self.fs.changes())
+
+    def restore(self, fields):
+        self.cwd, self.flags, changes = fields
+        self.fs.apply(changes)
+
+
+def matching_rule(state, rules, args):
+    joined = " ".join(args).lower()
+    for rule in rules:
+        if rule.matches(state.flags, args, joined):
+            return rule
+    return None
+
+
+def apply_rules(state, rules, args, fields):
+    rule = matching_rule(state, rules, args)
+    if rule is None:
+        return None
+    if rule.text is not None and rule.pace:
+        lines = rule.render(fields).split("\n")
+        for number, line in enumerate(lines):
+            if number:
+                pause(rule.pace)
+            print(line)
+    elif rule.text is not None:
+        print(rule.render(fields))
+    return finish_rule(state, rule)
+
+
+def finish_rule(state, rule):
+    state.flags |= rule.set
+    if rule.pause:
+        pause(rule.pause)
+    if rule.win is not None:
+        print_success(rule.win)
         return True
-    elif cmd == "pwd":
-        print(CURRENT_DIR)
+    return None
+
+
+def run_spec_command(name, state, args):
+    fields = {"command": " ".join([name, *args]), "args": " ".join(args),
+              "arg": args[0] if args else ""}
+    return apply_rules(state, state.level.commands[name], args, fields)
+
+
+def read_spec_file(path, state, inode):
+    # What 'type' shows of a file with a reader, as lines of output. The
+    # rule's flags, pause and win only count once they reach the screen.
+    rule = matching_rule(state, state.level.readers[path], ())
+    if rule is None:
+        return
+    when_shown(functools.partial(finish_rule, state, rule))
+    if rule.text is not None:
+        for number, line in enumerate(lines_of(rule.render({"content": inode.content}))):
+            if number and rule.pace:
+                pause(rule.pace)
+            yield line
+
+
+# Built-in commands of levels whose spec has a "network", played from its
+# local host. The spec's rules for the same command run after them and can
+# add a win, flags or a hint.
+NETWORK_COMMANDS = CommandRegistry(ignore_case=True, dialect=shell.CMD)
+
+
+def run_network_command(handler, name, state, args):
+    result = handler(state, args)
+    if name in state.level.commands and run_spec_command(name, state, args):
         return True
-    elif cmd == "exit" or cmd == "quit":
-        return "EXIT"
-    return False
+    return result
+
+
+def milliseconds(latency):
+    return "<1" if latency < 1 else str(round(latency))
+
+
+def network_target(args):
+    # (target, count) of ping/tracert arguments, count from -n
+    operands, count = [], 4
+    arguments = iter(args)
+    for arg in arguments:
+        if arg.lower() == "-n":
+            value = next(arguments, "")
+            count = int(value) if value.isdigit() and int(value) > 0 else count
+        elif not arg.startswith("-"):
+            operands.append(arg)
+    return (operands[-1] if operands else None), count
+
+
+def describe(target, name):
+    # "name [ip]" when the target was given by name
+    return f"{name} [{target.ip}]" if name.lower() != target.ip else target.ip
+
+
+@NETWORK_COMMANDS.command("ipconfig")
+def cmd_ipconfig(state, args):
+    host = state.level.network.local
+    subnet = host.subnet
+    print("\nWindows IP Configuration\n")
+    print("Ethernet adapter Ethernet:\n")
+    print(f"   IPv4 Address. . . . . . . . . . . : {host.ip}")
+    if subnet is not None:
+        mask = network.format_address(~((1 << 32 - subnet.prefix) - 1) & 0xFFFFFFFF)
+        print(f"   Subnet Mask . . . . . . . . . . . : {mask}")
+        print(f"   Default Gateway . . . . . . . . . : {subnet.gateway.ip}")
+    print()
+
+
+@NETWORK_COMMANDS.command("ping")
+def cmd_ping(state, args):
+    name, count = network_target(args)
+    if name is None:
+        print("Usage: ping [-n count] target_name")
+        return FAILED
+    net = state.level.network
+    target = net.resolve(name)
+    if target is None:
+        print(f"Ping request could not find host {name}. Please check the name and try again.")
+        return FAILED
+    if isinstance(target, int):
+        target = network.Host(None, name, target)
+    route = net.route(net.local, target)
+    print(f"\nPinging {describe(target, name)} with 32 bytes of data:")
+    received = []
+    for number in range(count):
+        if number:
+            pause(1)
+        if route is None:
+            print("PING: transmit failed. General failure.")
+        elif not route.reached:
+            print(f"Reply from {route.hops[-1][0].ip}: Destination host unreachable.")
+        else:
+            received.append(route.latency)
+            shown = milliseconds(route.latency)
+            print(f"Reply from {target.ip}: bytes=32 time{'' if shown[0] == '<' else '='}{shown}ms "
+                  f"TTL={target.ttl - route.routers}")
+    lost = count - len(received)
+    print(f"\nPing statistics for {target.ip}:")
+    print(f"    Packets: Sent = {count}, Received = {count - lost}, Lost = {lost} "
+          f"({lost * 100 // count}% loss),")
+    if received:
+        print("Approximate round trip times in milli-seconds:")
+        print(f"    Minimum = {round(min(received))}ms, Maximum = {round(max(received))}ms, "
+              f"Average = {round(sum(received) / len(received))}ms")
+    print()
+    return None if received else FAILED
+
+
+@NETWORK_COMMANDS.command("tracert")
+def cmd_tracert(state, args):
+    name, _ = network_target(args)
+    if name is None:
+        print("Usage: tracert target_name")
+        return FAILED
+    net = state.level.network
+    target = net.resolve(name)
+    if target is None:
+        print(f"Unable to resolve target system name {name}.")
+        return FAILED
+    if isinstance(target, int):
+        target = network.Host(None, name, target)
+    route = net.route(net.local, target)
+    print(f"\nTracing route to {describe(target, name)}")
+    print("over a maximum of 30 hops:\n")
+    if route is None:
+        print(f"  1  {net.local.ip}  reports: Destination net unreachable.")
+    else:
+        for number, (hop, latency) in enumerate(route.hops, 1):
+            if number > 1:
+                pause(0.5)
+            probes = "".join(f"{milliseconds(probe):>6} ms" for probe in (latency, latency, latency * 1.1))
+            label = hop.ip if hop.name == hop.ip else f"{hop.name} [{hop.ip}]"
+            print(f"{number:3}{probes}  {label}")
+        if not route.reached:
+            pause(0.5)
+            print(f"{len(route.hops) + 1:3}  {hop.ip}  reports: Destination host unreachable.")
+    print("\nTrace complete.")
+
+
+@NETWORK_COMMANDS.command("netstat")
+def cmd_netstat(state, args):
+    # -a adds the listening ports; addresses are always numeric
+    host = state.level.network.local
+    switches = "".join(arg.lstrip("-/").lower() for arg in args)
+    print("\nActive Connections\n")
+    print("  Proto  Local Address          Foreign Address        State")
+    if "a" in switches:
+        for port in sorted(host.services):
+            print(f"  TCP    {f'0.0.0.0:{port}':<23}{'0.0.0.0:0':<23}LISTENING")
+    for port, remote, remote_port, status in host.connections:
+        local = f"{host.ip}:{port}"
+        foreign = f"{network.format_address(remote)}:{remote_port}"
+        print(f"  TCP    {local:<23}{foreign:<23}{status}")
+    print()
+
+
+class SpecLevel:
+    # A level defined by the JSON file next to its module (see
+    # cli_lab.levelspec). Modules may register extra Python commands on
+    # self.commands. Every session plays its own variant of the spec, taken
+    # ready-made from self.pool.
+
+    def __init__(self, module_file):
+        self.path = os.path.splitext(module_file)[0] + ".json"
+        self.level = levelspec.load(self.path)
+        self.commands = CommandRegistry(parent=COMMON_COMMANDS, ignore_case=True,
+                                        level=levels.name_of(module_file))
+        # Command names and reader paths are the same in every variant
+        for name in self.level.commands:
+            self.commands.register(name, functools.partial(run_spec_command, name))
+        if self.level.network is not None:
+            for name, command in NETWORK_COMMANDS.commands.items():
+                self.commands.register(name, functools.partial(run_network_command, command.handler, name))
+        readers = {path: functools.partial(read_spec_file, path) for path in self.level.readers}
+        self.state = type("LevelState", (SpecState,), {"__slots__": (), "readers": readers})
+        self.pool = variants.VariantPool(self.make)
+        self._spec = None
+
+    def variant(self, seed):
+        # The level compiled with the vars of seed
+        if not self.level.variants:
+            return self.level
+        if self._spec is None:
+            self._spec = levelspec.parse(self.path)
+        return levelspec.compile_variant(self._spec, self.level,
+                                         variants.generate(self.level.variants, self.level.name, seed))
+
+    def make(self, seed):
+        return self.state(self.variant(seed))
+
+    def run(self):
+        with persist.resumable(self.path, self.pool) as (seed, state, save, resumed):
+            event("variant", seed=seed)
+            level = state.level
+            print_header(level.title)
+            print(f" Instance: {seed}" + (" (resumed from your last save)" if resumed else "") + "\n")
+            print_objectives(level.objectives, level.hint)
+            return run_commands(self.commands, state, keep_case=level.keep_case, save=save)
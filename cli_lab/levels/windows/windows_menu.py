@@ -1,21 +1,32 @@
 # FILE: windows_menu.py (UPDATED FLOW)
 import sys
-import time
+
+from cli_lab import levels, persist
+from cli_lab.session import input, print
 from .utils import (
     clear_screen,
     print_header,
-    print_objectives,
-    print_success,
-    generic_cmd_handler,
-    CURRENT_DIR,
 )
 
+# Campaign order; each level is imported only when the player reaches it.
+CAMPAIGN = ("windows/1", "windows/2", "windows/3", "windows/4", "windows/5")
+
 
-import level1_recon 
-import level2_permissions 
-import level3_searching
-import level4_networking
-import level5_cryptography
+def run_campaign():
+    # True once every level is beaten. With a save slot, levels beaten
+    # before are skipped and an unfinished one resumes where it was left.
+    slot = persist.current()
+    completed = slot.completed() if slot is not None else set()
+    for name in CAMPAIGN:
+        if name in completed:
+            continue
+        if not levels.get(name).run():
+            return False
+        if slot is not None:
+            slot.complete(name)
+    if slot is not None:
+        slot.clear_completed()
+    return True
 
 def main_menu():
     print_header("THEROOTEXEC CHALLENGE SYSTEM | MAIN CONSOLE")
@@ -29,17 +40,13 @@ def main_menu():
         choice = input("Selection: ")
         
         if choice == "1":
-            if level1_recon.run_level():
-                 if level2_permissions.run_level(): 
-                    if level3_searching.run_level(): 
-                        if level4_networking.run_level():
-                            if level5_cryptography.run_level():
-                                clear_screen()
-                                print("\n\n")
-                                print("*" * 50)
-                                print("MISSION COMPLETE! WINDOWS CAMPAIGN ACHEIVED")
-                                print("*" * 50)
-                                input()
+            if run_campaign():
+                clear_screen()
+                print("\n\n")
+                print("*" * 50)
+                print("MISSION COMPLETE! WINDOWS CAMPAIGN ACHEIVED")
+                print("*" * 50)
+                input()
             return 
         elif choice == "2":
             print("System Disconnected.")
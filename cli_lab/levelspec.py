@@ -0,0 +1,469 @@
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import string
+import sys
+import tempfile
+
+from cli_lab import access, network, variants
+from cli_lab.content import Blob
+from cli_lab.vfs import DEFAULT_MTIME, VirtualFS
+
+# Declarative level definitions. A level is a JSON file describing its
+# filesystem, its commands as lists of rules, readers for special files and
+# the rules that win the level. compile_spec() turns it into a CompiledLevel:
+# a ready VirtualFS template plus flat rule tables the level runtime
+# dispatches on. load() caches the compiled result in __pycache__ next to
+# the spec, keyed by a hash of the source, so a normal start only unpickles.
+#
+# A file or directory may carry an "acl": entries in icacls' notation such
+# as "BUILTIN\\Administrators:(F)" or "User:(DENY)(W)" (see cli_lab.access).
+# Without one, Windows sessions treat it as open to everyone.
+#
+# A file's body is either inline "content" or a "source" path relative to
+# the spec. Sources are large assets: they are memory-mapped as a
+# content.Blob, shared by every session and process, and never copied into
+# the compiled level.
+#
+# A rule matches when all of its conditions hold:
+#   "first":    the first argument equals this value
+#   "args":     every listed token is one of the arguments
+#   "contains": every listed substring occurs in the lowercased arguments
+#   "switches": every listed letter is a switch, alone or combined ("an"
+#               matches -an, -ano, -a -n and /a /n)
+#   "if":       the named state flags are set
+#   "unless":   the named state flags are not set
+# and then prints "print" (a string or list of lines), sets the "set" flags,
+# pauses "pause" seconds and, with "win", finishes the level with that
+# message. With "pace", the printed lines come out that many seconds apart,
+# like replies arriving over a network. Pauses are virtual time (see
+# cli_lab.clock): headless runs don't wait for them. Text may use the
+# spec's "vars" plus {command}, {args}, {arg} (first argument) and, in
+# readers, {content}; literal braces are written {{ and }} as in str.format.
+#
+# "network" describes the level's network (see cli_lab.network), with vars
+# filled in like text:
+#   "routers":  [{"name", "address"}]
+#   "links":    [[router, router, latency]]
+#   "subnets":  [{"cidr", "gateway": router, "latency"}]
+#   "hosts":    [{"name", "address", "listen": {port: service}, "ttl",
+#                 "connections": [[local port, "address:port", state]]}]
+#   "local":    the name or address of the player's own host
+# Latencies are round-trip milliseconds.
+#
+# "variants" lists generators for vars that differ per player (see
+# cli_lab.variants); "vars" still gives each of them the value used when
+# the level is compiled as written. compile_variant() compiles the spec
+# again with other vars on top of the level as written: its template is a
+# fork that only rewrites the files whose text changed, and rules that come
+# out the same are the very same objects.
+
+FORMAT_VERSION = 9
+
+
+class LevelSpecError(ValueError):
+    pass
+
+
+class Rule:
+    __slots__ = ("first", "args", "contains", "switches", "require", "forbid",
+                 "text", "dynamic", "set", "pause", "pace", "win")
+
+    def __init__(self, first=None, args=(), contains=(), switches="", require=0, forbid=0,
+                 text=None, dynamic=False, set=0, pause=0, pace=0, win=None):
+        self.first = first
+        self.args = args
+        self.contains = contains
+        self.switches = switches
+        self.require = require
+        self.forbid = forbid
+        self.text = text
+        self.dynamic = dynamic
+        self.set = set
+        self.pause = pause
+        self.pace = pace
+        self.win = win
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in Rule.__slots__)
+
+    def __setstate__(self, fields):
+        for slot, value in zip(Rule.__slots__, fields):
+            setattr(self, slot, value)
+
+    def matches(self, flags, args, joined):
+        if flags & self.require != self.require or flags & self.forbid:
+            return False
+        if self.first is not None and (args[0] if args else "") != self.first:
+            return False
+        if any(token not in args for token in self.args):
+            return False
+        if self.switches:
+            given = "".join(arg[1:].lower() for arg in args if arg[:1] in "-/")
+            if any(letter not in given for letter in self.switches):
+                return False
+        return all(part in joined for part in self.contains)
+
+    def render(self, fields):
+        return self.text.format_map(fields) if self.dynamic else self.text
+
+
+class CompiledLevel:
+    __slots__ = ("name", "title", "objectives", "hint", "keep_case", "template", "flags",
+                 "commands", "readers", "sources", "vars", "variants", "network")
+
+    def __init__(self, name, title, objectives, hint, keep_case, template,
+                 flags, commands, readers, sources=(), vars=None, variants=None, network=None):
+        self.name = name
+        self.title = title
+        self.objectives = objectives
+        self.hint = hint
+        self.keep_case = keep_case
+        self.template = template
+        # flag name -> bit
+        self.flags = flags
+        # command name -> tuple of Rules, first match wins
+        self.commands = commands
+        # normalized path -> tuple of Rules
+        self.readers = readers
+        # (path, size, mtime_ns) of the mapped source files
+        self.sources = sources
+        # var -> value this level was compiled with
+        self.vars = vars or {}
+        # var -> generator spec for the vars that differ per variant
+        self.variants = variants or {}
+        # cli_lab.network.Network, None for levels without one
+        self.network = network
+
+    @property
+    def stale(self):
+        # True when a source file changed since the level was compiled
+        for path, size, mtime in self.sources:
+            try:
+                info = os.stat(path)
+            except OSError:
+                return True
+            if (info.st_size, info.st_mtime_ns) != (size, mtime):
+                return True
+        return False
+
+
+class _Compiler:
+    def __init__(self, spec, name, directory=".", vars=None, base=None):
+        self.spec = spec
+        self.name = name
+        self.directory = directory
+        self.sources = []
+        self.vars = {key: str(value) for key, value in spec.get("vars", {}).items()}
+        self.vars.update(vars or {})
+        self.flags = {}
+        # base: the level as written, when compiling a variant of it
+        self.base = base
+        self.known = {}
+        if base is not None:
+            for rules in (*base.commands.values(), *base.readers.values()):
+                for rule in rules:
+                    self.known[rule.__getstate__()] = rule
+
+    def error(self, message):
+        return LevelSpecError(f"{self.name}: {message}")
+
+    def text(self, value, runtime=()):
+        # Fills in the spec's vars now; only text that needs per-call
+        # fields is left for str.format at runtime.
+        if isinstance(value, list):
+            value = "\n".join(value)
+        names = {field for _, field, _, _ in string.Formatter().parse(value) if field}
+        unknown = names - set(self.vars) - set(runtime)
+        if unknown:
+            raise self.error(f"unknown field(s) {', '.join(sorted(unknown))} in {value!r}")
+        if not names & set(runtime):
+            return value.format(**self.vars), False
+        formatter = string.Formatter()
+        parts = []
+        for literal, field, spec, conversion in formatter.parse(value):
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if field in runtime:
+                parts.append("{" + field + (f"!{conversion}" if conversion else "")
+                             + (f":{spec}" if spec else "") + "}")
+            else:
+                filled = formatter.format_field(formatter.convert_field(self.vars[field], conversion), spec)
+                parts.append(filled.replace("{", "{{").replace("}", "}}"))
+        return "".join(parts), True
+
+    def flag_mask(self, names):
+        mask = 0
+        for name in [names] if isinstance(names, str) else names:
+            bit = self.flags.setdefault(name, 1 << len(self.flags))
+            mask |= bit
+        return mask
+
+    def rule(self, spec, runtime):
+        unknown = set(spec) - {"first", "args", "contains", "switches", "if", "unless",
+                               "print", "set", "pause", "pace", "win"}
+        if unknown:
+            raise self.error(f"unknown rule key(s) {', '.join(sorted(unknown))}")
+        text, dynamic = self.text(spec["print"], runtime) if "print" in spec else (None, False)
+        rule = Rule(
+            first=self.text(spec["first"])[0] if "first" in spec else None,
+            args=tuple(self.text(token)[0] for token in spec.get("args", ())),
+            contains=tuple(self.text(part)[0].lower() for part in spec.get("contains", ())),
+            switches=spec.get("switches", "").lower(),
+            require=self.flag_mask(spec.get("if", ())),
+            forbid=self.flag_mask(spec.get("unless", ())),
+            text=text,
+            dynamic=dynamic,
+            set=self.flag_mask(spec.get("set", ())),
+            pause=spec.get("pause", 0),
+            pace=spec.get("pace", 0),
+            win=self.text(spec["win"])[0] if "win" in spec else None,
+        )
+        return self.known.get(rule.__getstate__(), rule)
+
+    def rules(self, specs, runtime, shared=None):
+        # shared: the base's rules for the same entry, reused when unchanged
+        rules = tuple(self.rule(rule, runtime) for rule in specs)
+        return shared if rules == shared else rules
+
+    def content(self, entry):
+        if "source" not in entry:
+            return self.text(entry.get("content", ""))[0]
+        source = os.path.abspath(os.path.join(self.directory, entry["source"]))
+        try:
+            info = os.stat(source)
+            blob = Blob(source)
+        except OSError as error:
+            raise self.error(f"cannot map {entry['source']}: {error.strerror}") from None
+        self.sources.append((source, info.st_size, info.st_mtime_ns))
+        return blob
+
+    def variant_filesystem(self):
+        # A fork of the base's template with the files whose text changed
+        fs = self.base.template.fork()
+        for entry in self.spec.get("files", ()):
+            if entry.get("type") == "dir" or "link" in entry or "source" in entry:
+                continue
+            content = self.content(entry)
+            if content != self.base.template.lookup(entry["path"]).content:
+                node = fs.writable(entry["path"])
+                node.write(content, node.size)
+        return fs
+
+    def filesystem(self):
+        spec = self.spec
+        if self.base is not None:
+            return self.variant_filesystem()
+        fs = VirtualFS(home=spec.get("home", "/"), drive=spec.get("drive"),
+                       ignore_case=spec.get("ignore_case", False))
+        for entry in spec.get("files", ()):
+            path = entry["path"]
+            fields = {
+                "owner": entry.get("owner", "root"),
+                "group": entry.get("group", "root"),
+                "mtime": _mtime(entry.get("mtime")),
+            }
+            if entry.get("type") == "dir":
+                node = fs.mkdir(path, mode=int(entry.get("mode", "755"), 8), **fields)
+            elif "link" in entry:
+                node = fs.symlink(path, entry["link"], **fields)
+            else:
+                node = fs.add_file(path, self.content(entry),
+                                   mode=int(entry.get("mode", "644"), 8), size=entry.get("size"), **fields)
+            if "acl" in entry:
+                node.set_acl(self.acl(entry["acl"]))
+        return fs
+
+    def acl(self, entries):
+        try:
+            return tuple(access.parse_ace(self.text(entry)[0]) for entry in entries)
+        except access.AccessError as error:
+            raise self.error(str(error)) from None
+
+    def network(self):
+        spec = self.spec.get("network")
+        if spec is None:
+            return None
+
+        def text(value):
+            return self.text(str(value))[0]
+
+        try:
+            hosts = spec.get("hosts", ())
+            base = self.base.network if self.base is not None else None
+            if base is not None:
+                # A variant forks the level's network as written when only
+                # hosts use the vars it changes, and replaces those hosts
+                changed = {name for name, value in self.vars.items() if value != self.base.vars.get(name)}
+                topology = [part for key in ("routers", "links", "subnets") for part in spec.get(key, ())]
+                if _fields(topology) & changed:
+                    base = None
+            if base is not None:
+                built = base.fork()
+                hosts = [entry for entry in hosts if _fields(entry) & changed]
+                for entry in hosts:
+                    old = built.resolve(str(entry["address"]).format(**self.base.vars))
+                    if isinstance(old, network.Host):
+                        built.remove_host(old)
+            else:
+                built = network.Network()
+                for router in spec.get("routers", ()):
+                    built.add_router(text(router["name"]), text(router["address"]))
+                for first, second, latency in spec.get("links", ()):
+                    built.link(text(first), text(second), latency)
+                for subnet in spec.get("subnets", ()):
+                    built.add_subnet(text(subnet["cidr"]), text(subnet["gateway"]),
+                                     subnet.get("latency", network.LAN_LATENCY))
+            for entry in hosts:
+                services = {int(text(port)): service for port, service in entry.get("listen", {}).items()}
+                host = built.add_host(text(entry.get("name", "")), text(entry["address"]), services,
+                                      ttl=entry.get("ttl", network.DEFAULT_TTL))
+                for port, remote, state in entry.get("connections", ()):
+                    address, _, remote_port = text(remote).rpartition(":")
+                    built.connect(host, int(text(port)), address, int(remote_port), state)
+            if "local" in spec:
+                built.local = built.resolve(text(spec["local"]))
+                if not isinstance(built.local, network.Host):
+                    raise network.NetworkError(f"no local host {text(spec['local'])}")
+        except (network.NetworkError, KeyError, TypeError, ValueError) as error:
+            raise self.error(f"bad network: {error}") from None
+        return built
+
+    def generators(self):
+        generators = self.spec.get("variants", {})
+        if self.base is not None:
+            # Already checked on the level as written
+            return generators
+        try:
+            variants.generate(generators, self.name, 0)
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            raise self.error(f"bad variants: {error}") from None
+        return generators
+
+    def compile(self):
+        spec = self.spec
+        generators = self.generators()
+        template = self.filesystem()
+
+        base = self.base
+        commands = {}
+        for entry in spec.get("commands", ()):
+            shared = base.commands.get(entry["names"][0]) if base is not None else None
+            rules = self.rules(entry["rules"], ("command", "args", "arg"), shared)
+            for name in entry["names"]:
+                commands[name] = rules
+
+        readers = {}
+        for path, rules in spec.get("readers", {}).items():
+            inode = template.lookup(path)
+            if inode is None:
+                raise self.error(f"reader for missing file {path}")
+            key = template.path_of(inode)
+            if template.ignore_case:
+                key = key.lower()
+            shared = base.readers.get(key) if base is not None else None
+            readers[key] = self.rules(rules, ("content",), shared)
+        if base is not None:
+            commands = base.commands if commands == base.commands else commands
+            readers = base.readers if readers == base.readers else readers
+
+        return CompiledLevel(
+            name=self.name,
+            title=self.text(spec.get("title", self.name))[0],
+            objectives=tuple(self.text(line)[0] for line in spec.get("objectives", ())),
+            hint=self.text(spec.get("hint", ""))[0],
+            keep_case=spec.get("keep_case", False),
+            template=template,
+            flags=dict(self.flags),
+            commands=commands,
+            readers=readers,
+            sources=base.sources if base is not None else tuple(self.sources),
+            vars=dict(self.vars),
+            variants=generators,
+            network=self.network(),
+        )
+
+
+def _fields(value):
+    # Names of the vars used anywhere in a spec value
+    if isinstance(value, dict):
+        value = [*value, *value.values()]
+    if isinstance(value, list):
+        return set().union(*map(_fields, value))
+    if isinstance(value, str):
+        return {field for _, field, _, _ in string.Formatter().parse(value) if field}
+    return set()
+
+
+def _mtime(value):
+    return datetime.datetime.fromisoformat(value) if value else DEFAULT_MTIME
+
+
+def compile_spec(spec, name="<level>", directory=".", vars=None):
+    return _Compiler(spec, name, directory, vars).compile()
+
+
+def compile_variant(spec, base, vars):
+    # spec compiled with vars on top of base, the CompiledLevel compiled
+    # from it as written
+    return _Compiler(spec, base.name, vars=vars, base=base).compile()
+
+
+def cache_path(path):
+    directory, filename = os.path.split(os.path.abspath(path))
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, "__pycache__", f"{stem}.level-{FORMAT_VERSION}.pickle")
+
+
+def parse(path, data=None):
+    # The spec as JSON, e.g. to compile variants of it
+    if data is None:
+        with open(path, "rb") as source:
+            data = source.read()
+    try:
+        return json.loads(data)
+    except ValueError as error:
+        raise LevelSpecError(f"{path}: {error}") from None
+
+
+def load(path):
+    with open(path, "rb") as source:
+        data = source.read()
+    digest = hashlib.sha256(data).digest()
+    cached = cache_path(path)
+
+    try:
+        with open(cached, "rb") as cache:
+            if cache.read(len(digest)) == digest:
+                level = pickle.load(cache)
+                if not level.stale:
+                    return level
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+
+    spec = parse(path, data)
+    level = compile_spec(spec, os.path.basename(path), os.path.dirname(os.path.abspath(path)))
+    if not sys.dont_write_bytecode:
+        _write_cache(cached, digest, level)
+    return level
+
+
+def _write_cache(cached, digest, level):
+    # Written to a temporary file and renamed so concurrent starts never see
+    # a torn cache; a read-only install simply recompiles every time.
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(cached))
+        try:
+            with os.fdopen(fd, "wb") as cache:
+                cache.write(digest)
+                pickle.dump(level, cache, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, cached)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except OSError:
+        pass
@@ -1,23 +1,48 @@
-from cli_lab.levels.linux import (
-    level1_intro,
-    level2_permissions as linux_level2,
-)
+import sys
+
+from cli_lab import leaderboard, levels
+from cli_lab.render import screen
+from cli_lab.session import input, print, show
 
-from cli_lab.levels.windows import (
-    level1_recon,
-    level2_permissions as win_level2,
-    level3_searching,
-    level4_networking,
-    level5_cryptography,
+
+MAIN_MENU = screen(
+    "=== TerminalWarrior ===\n",
+    "1) Linux Challenges",
+    "2) Windows Challenges",
+    "0) Exit\n",
+)
+# The same with the leaderboard of a timed event (cli_lab.leaderboard)
+EVENT_MENU = screen(
+    "=== TerminalWarrior ===\n",
+    "1) Linux Challenges",
+    "2) Windows Challenges",
+    "3) Leaderboard",
+    "0) Exit\n",
 )
 
 
+def level_choices(platform):
+    return {str(number): level for number, level in enumerate(levels.platform(platform), 1)}
+
+
+def menu_screen(heading, choices):
+    return screen(
+        f"\n=== {heading} ===",
+        *(f"{number}) Level {number} - {level.title}" for number, level in choices.items()),
+        "0) Back\n",
+    )
+
+
+LINUX_LEVELS = level_choices("linux")
+WINDOWS_LEVELS = level_choices("windows")
+LINUX_MENU = menu_screen("Linux Levels", LINUX_LEVELS)
+WINDOWS_MENU = menu_screen("Windows Levels", WINDOWS_LEVELS)
+
+
 def main():
+    board = leaderboard.current()
     while True:
-        print("=== TerminalWarrior ===\n")
-        print("1) Linux Challenges")
-        print("2) Windows Challenges")
-        print("0) Exit\n")
+        show(MAIN_MENU if board is None else EVENT_MENU)
 
         terminal_choice = input("Select a Terminal: ").strip()
 
@@ -25,6 +50,8 @@ def main():
             linux_menu()
         elif terminal_choice == "2":
             windows_menu()
+        elif terminal_choice == "3" and board is not None:
+            print(board.render())
         elif terminal_choice == "0":
             print("Goodbye")
             break
@@ -32,63 +59,100 @@ def main():
             print("Invalid choice!\n")
 
 
-def linux_menu():
+def level_menu(menu, choices):
     while True:
-        print("\n=== Linux Levels ===")
-        print("1) Level 1 - Intro Challenge")
-        print("2) Level 2 - Permissions")
-        print("3) Level 3 - COMING SOON")
-        print("4) Level 4 - COMING SOON")
-        print("5) Level 5 - COMING SOON")
-        print("0) Back\n")
+        show(menu)
 
         choice = input("Select a level: ").strip()
 
-        if choice == "1":
-            level1_intro.main()
-        elif choice == "2":
-            linux_level2.main()
-        elif choice == "3":
-            print("COMING SOON!")
-        elif choice == "4":
-            print("COMING SOON!")
-        elif choice == "5":
-            print("COMING SOON!")
-        elif choice == "0":
+        level = choices.get(choice)
+        if choice == "0":
             return
-        else:
+        elif level is None:
             print("Invalid choice!\n")
+        elif not level.available:
+            print("COMING SOON!")
+        else:
+            level.run()
 
 
-def windows_menu():
-    while True:
-        print("\n=== Windows Levels ===")
-        print("1) Level 1 - Recon")
-        print("2) Level 2 - Permissions")
-        print("3) Level 3 - Searching")
-        print("4) Level 4 - Networking")
-        print("5) Level 5 - Cryptography")
-        print("0) Back\n")
+def linux_menu():
+    level_menu(LINUX_MENU, LINUX_LEVELS)
 
-        choice = input("Select a level: ").strip()
 
-        if choice == "1":
-            level1_recon.main()
-        elif choice == "2":
-            win_level2.main()
-        elif choice == "3":
-            level3_searching.main()
-        elif choice == "4":
-            level4_networking.main()
-        elif choice == "5":
-            level5_cryptography.main()
-        elif choice == "0":
-            return
-        else:
-            print("Invalid choice!\n")
+def windows_menu():
+    level_menu(WINDOWS_MENU, WINDOWS_LEVELS)
+
+
+def cli(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        # Plain start (also the Docker entrypoint): skip argparse entirely.
+        main()
+        return 0
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m cli_lab.main")
+    parser.add_argument("--script", metavar="FILE",
+                        help="run a command transcript without a TTY ('-' reads stdin)")
+    parser.add_argument("--level", metavar="NAME",
+                        help="level to run the transcript against, e.g. linux/2 or windows/3")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="play this instance of the level (as printed after a run) instead of a fresh one")
+    parser.add_argument("--save", metavar="DIR",
+                        help="save progress to this directory and resume from it")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only print the summary line, not the level output")
+    parser.add_argument("--profile", metavar="MODES", nargs="?", const="cpu",
+                        help="profile the levels played: comma-separated cpu, sample, alloc (default cpu)")
+    parser.add_argument("--profile-dir", metavar="DIR", default="profile",
+                        help="where --profile writes its results (default ./profile)")
+    args = parser.parse_args(argv)
+
+    if args.profile is not None:
+        from cli_lab import profiling
+
+        try:
+            profiler = profiling.Profiler(args.profile_dir, args.profile.split(","))
+        except ValueError as error:
+            parser.error(str(error))
+        profiling.start(profiler)
+        try:
+            return play_saved(parser, args)
+        finally:
+            for path in profiling.stop():
+                sys.stderr.write(f"profile: wrote {path}\n")
+    return play_saved(parser, args)
+
+
+def play_saved(parser, args):
+    if args.save is not None:
+        from cli_lab import persist
+
+        with persist.saving(persist.SaveSlot(args.save)):
+            return play(parser, args)
+    return play(parser, args)
+
+
+def play(parser, args):
+    if args.script is None:
+        main()
+        return 0
+    if args.level is None:
+        parser.error("--script needs --level")
+
+    from cli_lab import headless
+
+    try:
+        result = headless.run_file(args.level, args.script, None if args.quiet else sys.stdout, seed=args.seed)
+    except ValueError as error:
+        parser.error(str(error))
+    sys.stdout.write(result.summary() + "\n")
+    return 0 if result.completed else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
   
 
@@ -0,0 +1,168 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Built-in instrumentation of command dispatch. Every line a level
+# dispatches is timed into a fixed-bucket latency histogram per (level,
+# command), labelled with its first command; the histogram counts are the
+# per-command counters and add up to the per-level ones. Unrecognized
+# commands are counted per level. Each thread records into its own shard
+# without locking, a bisect over the bucket bounds and two increments, and
+# readers add the shards up.
+#
+# The numbers are exported as Prometheus text (the server's --metrics-port)
+# or as JSON (snapshot(), dumped periodically with --metrics-json). Set
+# COLLECTOR to None to switch recording off.
+
+# Upper bounds of the latency buckets in seconds; one more bucket catches
+# everything slower
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+           0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0)
+# Label of lines whose command the level doesn't know, so typos don't add
+# a series each
+UNRECOGNIZED = "(unrecognized)"
+# Level label of registries that aren't a level's
+NO_LEVEL = "(none)"
+
+
+class Shard:
+    # What one thread recorded
+    __slots__ = ("latency", "unrecognized")
+
+    def __init__(self):
+        # (level, command) -> [count per bucket..., sum of seconds]
+        self.latency = {}
+        # level -> unrecognized commands
+        self.unrecognized = {}
+
+
+class Metrics:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self.shards = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = Shard()
+            self.local.latency = shard.latency
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def observe(self, level, command, seconds):
+        # One dispatched line: level and command are its labels
+        try:
+            latency = self.local.latency
+        except AttributeError:
+            latency = self.shard().latency
+        histogram = latency.get((level, command))
+        if histogram is None:
+            histogram = latency[level, command] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def missed(self, level):
+        unrecognized = self.shard().unrecognized
+        unrecognized[level] = unrecognized.get(level, 0) + 1
+
+    def totals(self):
+        # (latency, unrecognized) over every shard; latency maps (level,
+        # command) to (counts per bucket, sum of seconds)
+        with self.lock:
+            shards = list(self.shards)
+        latency, unrecognized = {}, {}
+        for shard in shards:
+            for key, histogram in list(shard.latency.items()):
+                total = latency.setdefault(key, [0] * (len(histogram) - 1) + [0.0])
+                for slot, value in enumerate(histogram):
+                    total[slot] += value
+            for key, count in list(shard.unrecognized.items()):
+                unrecognized[key] = unrecognized.get(key, 0) + count
+        latency = {key: (histogram[:-1], histogram[-1]) for key, histogram in latency.items()}
+        return latency, unrecognized
+
+    def snapshot(self):
+        # Plain dict of everything recorded, with per-level totals
+        latency, unrecognized = self.totals()
+        elapsed = max(time.time() - self.started, 1e-9)
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        levels = {}
+        for (level, command), (counts, total) in sorted(latency.items()):
+            entry = levels.setdefault(level, {"lines": 0, "seconds": 0.0, "commands": {}})
+            entry["lines"] += sum(counts)
+            entry["seconds"] += total
+            entry["commands"][command] = {
+                "lines": sum(counts),
+                "seconds": total,
+                "buckets": dict(zip(bounds, counts)),
+            }
+        for level in unrecognized:
+            levels.setdefault(level, {"lines": 0, "seconds": 0.0, "commands": {}})
+        for level, entry in levels.items():
+            entry["unrecognized"] = unrecognized.get(level, 0)
+            entry["lines_per_second"] = entry["lines"] / elapsed
+        return {"started": self.started, "uptime": elapsed, "levels": levels}
+
+    def prometheus(self):
+        # Prometheus text exposition format
+        latency, unrecognized = self.totals()
+        latency = sorted((key, counts, total) for key, (counts, total) in latency.items())
+        unrecognized = sorted(unrecognized.items())
+        lines = [
+            "# HELP terminalwarrior_unrecognized_commands_total Commands the level doesn't know.",
+            "# TYPE terminalwarrior_unrecognized_commands_total counter",
+        ]
+        for level, missed in unrecognized:
+            lines.append(f"terminalwarrior_unrecognized_commands_total{_labels(level=level)} {missed}")
+        lines += [
+            "# HELP terminalwarrior_level_lines_total Lines dispatched per level.",
+            "# TYPE terminalwarrior_level_lines_total counter",
+        ]
+        per_level = {}
+        for (level, _), counts, _ in latency:
+            per_level[level] = per_level.get(level, 0) + sum(counts)
+        for level, count in sorted(per_level.items()):
+            lines.append(f"terminalwarrior_level_lines_total{_labels(level=level)} {count}")
+        lines += [
+            "# HELP terminalwarrior_dispatch_seconds Time to dispatch a line, by its first command.",
+            "# TYPE terminalwarrior_dispatch_seconds histogram",
+        ]
+        for (level, command), counts, total in latency:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _labels(level=level, command=command, le=le)
+                lines.append(f"terminalwarrior_dispatch_seconds_bucket{labels} {cumulative}")
+            labels = _labels(level=level, command=command)
+            lines.append(f"terminalwarrior_dispatch_seconds_sum{labels} {total!r}")
+            lines.append(f"terminalwarrior_dispatch_seconds_count{labels} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # snapshot() as JSON, replacing path in one step
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as out:
+            json.dump(self.snapshot(), out, indent=1)
+        os.replace(temporary, path)
+
+
+def _labels(**labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+COLLECTOR = Metrics()
+
+
+def missed(level):
+    if COLLECTOR is not None:
+        COLLECTOR.missed(level)
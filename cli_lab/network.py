@@ -0,0 +1,451 @@
+import bisect
+import heapq
+import ipaddress
+
+# Simulated networks for ping, traceroute, netstat and port scans. A Network
+# is a graph of routers joined by links, subnets hanging off a router (their
+# gateway) and hosts with an address in a subnet, the ports they listen on
+# and their open connections. Latencies are round-trip milliseconds: a link
+# adds its latency between two routers, a subnet between a host and its
+# gateway.
+#
+# Routes are only computed between routers; a host reaches any other
+# through its subnet's gateway, so thousands of hosts don't grow the
+# routing tables. A router's table (the latency to and the previous hop
+# towards every router it reaches, Dijkstra over the links) is computed the
+# first time a route from it is asked for, or for every router at once by
+# precompute(), and kept across topology changes it isn't affected by: a
+# new link only drops the tables it gives a shorter route, a removed link
+# only the ones whose routes used it. Hosts, subnets and services never
+# touch them. A route is then a walk of previous hops.
+#
+# Listening services are bitsets: for every port an int with bit i set when
+# host i listens on it, so scanning a range of hosts by a range of ports is
+# one AND per port something listens on, whatever the number of hosts.
+#
+# A level builds the part of its network every session shares once, and
+# each session adds its own hosts to a fork() of it. A fork copies the
+# network's tables but shares the Host and Subnet objects, and copies a
+# host only when it changes it, like VirtualFS.fork(). Router links and
+# subnet members are kept in those tables rather than in the shared objects,
+# so linking a router or adding a host to a subnet never changes the base.
+
+# TTL a reply starts with; routers decrement it
+DEFAULT_TTL = 64
+# Round-trip latency between a host and its gateway
+LAN_LATENCY = 0.3
+
+
+class NetworkError(ValueError):
+    pass
+
+
+def parse_address(text):
+    # The address as an int, or None when text isn't an IPv4 address
+    try:
+        return int(ipaddress.IPv4Address(text))
+    except ValueError:
+        return None
+
+
+def format_address(address):
+    return str(ipaddress.IPv4Address(address))
+
+
+def parse_targets(text):
+    # (first, last) addresses of "10.0.0.5", "10.0.0.0/24" or "10.0.0.1-50"
+    # (the last octet ranging), or None
+    if "/" in text:
+        try:
+            network = ipaddress.IPv4Network(text, strict=False)
+        except ValueError:
+            return None
+        return int(network.network_address), int(network.broadcast_address)
+    head, dash, end = text.rpartition("-")
+    if dash and end.isdigit():
+        first = parse_address(head)
+        if first is None or int(end) > 255 or int(end) < first & 0xFF:
+            return None
+        return first, first & ~0xFF | int(end)
+    address = parse_address(text)
+    return None if address is None else (address, address)
+
+
+def bits(mask):
+    # Indexes of the set bits, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Host:
+    __slots__ = ("index", "name", "address", "subnet", "router", "ttl", "services",
+                 "connections", "layer")
+
+    def __init__(self, index, name, address, router=False, ttl=DEFAULT_TTL):
+        self.index = index
+        self.name = name
+        self.address = address
+        self.subnet = None
+        self.router = router
+        self.ttl = ttl
+        # port -> service name
+        self.services = {}
+        # (local port, remote address, remote port, state); a tuple, as most
+        # hosts have none
+        self.connections = ()
+        # The network allowed to change this host in place
+        self.layer = None
+
+    def copy(self):
+        clone = Host.__new__(Host)
+        for slot in Host.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.services = dict(self.services)
+        return clone
+
+    @property
+    def ip(self):
+        return format_address(self.address)
+
+    def label(self):
+        # "name (ip)", or the ip when the host has no name of its own
+        return f"{self.name} ({self.ip})" if self.name != self.ip else self.ip
+
+
+class Subnet:
+    __slots__ = ("first", "prefix", "gateway", "latency")
+
+    def __init__(self, network, gateway, latency):
+        self.first = int(network.network_address)
+        self.prefix = network.prefixlen
+        self.gateway = gateway
+        self.latency = latency
+
+    @property
+    def key(self):
+        return self.first, self.prefix
+
+    @property
+    def last(self):
+        return self.first | (1 << 32 - self.prefix) - 1
+
+
+class Route:
+    __slots__ = ("hops", "reached")
+
+    def __init__(self, hops, reached):
+        # [(Host, round-trip ms)] from the first hop to the last
+        self.hops = hops
+        # False when the last hop is the gateway of an address nobody has
+        self.reached = reached
+
+    @property
+    def latency(self):
+        return self.hops[-1][1]
+
+    @property
+    def routers(self):
+        # Routers crossed on the way, which the reply's TTL loses
+        return len(self.hops) - 1
+
+
+class Network:
+    def __init__(self):
+        # Index -> Host, None for removed ones
+        self.hosts = []
+        self.by_address = {}
+        self.by_name = {}
+        self.addresses = []
+        # (first address, prefix) -> Subnet, and the prefixes in use
+        self.subnets = {}
+        self.prefixes = []
+        # (first address, prefix) -> bitset of the hosts in the subnet
+        self.members = {}
+        # Router index -> {neighbouring router index: latency}
+        self.links = {}
+        # port -> bitset of the hosts listening on it, and those ports sorted
+        self.listening = {}
+        self.ports = []
+        # Router index -> (latency, previous) dicts over the routers it reaches
+        self.tables = {}
+        self.local = None
+
+    def fork(self):
+        # A network that starts out as this one; this one must not change
+        # after it is forked
+        fork = Network.__new__(Network)
+        for name, value in vars(self).items():
+            setattr(fork, name, value.copy() if isinstance(value, (list, dict)) else value)
+        return fork
+
+    def _own(self, host):
+        # host, or the copy of it this network may change
+        if host.layer is self:
+            return host
+        shared, host = host, host.copy()
+        host.layer = self
+        self.hosts[host.index] = host
+        self.by_address[host.address] = host
+        if self.by_name.get(host.name.lower()) is shared:
+            self.by_name[host.name.lower()] = host
+        if self.local is shared:
+            self.local = host
+        return host
+
+    # Topology
+
+    def add_subnet(self, cidr, gateway, latency=LAN_LATENCY):
+        network = ipaddress.IPv4Network(cidr, strict=False)
+        key = int(network.network_address), network.prefixlen
+        if key in self.subnets:
+            raise NetworkError(f"subnet {network} already exists")
+        router = self.named(gateway)
+        if router is None or not router.router:
+            raise NetworkError(f"no router {gateway} for subnet {network}")
+        subnet = self.subnets[key] = Subnet(network, router, latency)
+        if network.prefixlen not in self.prefixes:
+            bisect.insort(self.prefixes, network.prefixlen)
+        # Hosts added before it move in when it is more specific
+        for address in self.addresses[bisect.bisect_left(self.addresses, subnet.first):
+                                      bisect.bisect_right(self.addresses, subnet.last)]:
+            self._place(self.by_address[address])
+        return subnet
+
+    def subnet_of(self, address):
+        # Longest prefix match
+        for prefix in reversed(self.prefixes):
+            first = address & ~((1 << 32 - prefix) - 1) & 0xFFFFFFFF
+            subnet = self.subnets.get((first, prefix))
+            if subnet is not None:
+                return subnet
+        return None
+
+    def _place(self, host):
+        subnet = self.subnet_of(host.address)
+        if subnet is host.subnet:
+            return
+        host = self._own(host)
+        if host.subnet is not None:
+            self.members[host.subnet.key] &= ~(1 << host.index)
+        host.subnet = subnet
+        if subnet is not None:
+            self.members[subnet.key] = self.members.get(subnet.key, 0) | 1 << host.index
+
+    def add_host(self, name, address, services=(), router=False, ttl=DEFAULT_TTL):
+        if isinstance(address, str):
+            address = parse_address(address)
+            if address is None:
+                raise NetworkError(f"bad address for {name}")
+        if address in self.by_address:
+            raise NetworkError(f"address {format_address(address)} already in use")
+        host = Host(len(self.hosts), name or format_address(address), address, router, ttl)
+        host.layer = self
+        self.hosts.append(host)
+        self.by_address[address] = host
+        # Hosts without a name are only found by address
+        if name:
+            self.by_name[name.lower()] = host
+        bisect.insort(self.addresses, address)
+        self._place(host)
+        for port, service in dict(services).items():
+            self.listen(host, int(port), service)
+        return host
+
+    def add_router(self, name, address, ttl=DEFAULT_TTL):
+        return self.add_host(name, address, router=True, ttl=ttl)
+
+    def remove_host(self, host):
+        host = self._own(host)
+        for port in list(host.services):
+            self.close(host, port)
+        for neighbour in list(self.links.get(host.index, ())):
+            self.unlink(host, self.hosts[neighbour])
+        if host.subnet is not None:
+            self.members[host.subnet.key] &= ~(1 << host.index)
+        self.hosts[host.index] = None
+        del self.by_address[host.address]
+        if self.by_name.get(host.name.lower()) is host:
+            del self.by_name[host.name.lower()]
+        del self.addresses[bisect.bisect_left(self.addresses, host.address)]
+        self.tables.pop(host.index, None)
+
+    def link(self, first, second, latency):
+        # Joins two routers; drops the tables this gives a shorter route
+        first, second = self._router(first), self._router(second)
+        self._relink(first, second, latency)
+        self._relink(second, first, latency)
+        inf = float("inf")
+        for start, (reach, _) in list(self.tables.items()):
+            one, other = reach.get(first.index, inf), reach.get(second.index, inf)
+            if one + latency < other or other + latency < one:
+                del self.tables[start]
+
+    def unlink(self, first, second):
+        # Drops the tables whose routes went over the link
+        first, second = self._router(first), self._router(second)
+        self._relink(first, second, None)
+        self._relink(second, first, None)
+        for start, (_, previous) in list(self.tables.items()):
+            if previous.get(second.index) == first.index or previous.get(first.index) == second.index:
+                del self.tables[start]
+
+    def _relink(self, router, neighbour, latency):
+        # A router's links are replaced rather than changed, as a fork
+        # shares them with its base; latency None unlinks
+        links = dict(self.links.get(router.index, ()))
+        if latency is None:
+            links.pop(neighbour.index, None)
+        else:
+            links[neighbour.index] = latency
+        self.links[router.index] = links
+
+    def _router(self, router):
+        host = self.named(router) if isinstance(router, str) else router
+        if host is None or not host.router:
+            raise NetworkError(f"no router {router}")
+        return host
+
+    # Services
+
+    def listen(self, host, port, service=""):
+        host = self._own(host)
+        host.services[port] = service
+        if port not in self.listening:
+            self.listening[port] = 0
+            bisect.insort(self.ports, port)
+        self.listening[port] |= 1 << host.index
+
+    def close(self, host, port):
+        host = self._own(host)
+        host.services.pop(port, None)
+        self.listening[port] &= ~(1 << host.index)
+        if not self.listening[port]:
+            del self.listening[port]
+            del self.ports[bisect.bisect_left(self.ports, port)]
+
+    def connect(self, host, port, remote, remote_port, state="ESTABLISHED"):
+        if isinstance(remote, str):
+            address = parse_address(remote)
+            if address is None:
+                raise NetworkError(f"bad remote address {remote}")
+            remote = address
+        host = self._own(host)
+        host.connections += ((port, remote, remote_port, state),)
+
+    # Lookups
+
+    def named(self, name):
+        return self.by_name.get(name.lower())
+
+    def resolve(self, text):
+        # Host by address or name; an address nobody has resolves to itself
+        # as an int, an unknown name to None
+        address = parse_address(text)
+        if address is None:
+            return self.named(text)
+        return self.by_address.get(address, address)
+
+    def table(self, router):
+        table = self.tables.get(router.index)
+        if table is None:
+            table = self.tables[router.index] = self._dijkstra(router)
+        return table
+
+    def _dijkstra(self, router):
+        reach = {router.index: 0.0}
+        previous = {}
+        queue = [(0.0, router.index)]
+        while queue:
+            latency, index = heapq.heappop(queue)
+            if latency > reach[index]:
+                continue
+            for neighbour, cost in self.links.get(index, {}).items():
+                total = latency + cost
+                if total < reach.get(neighbour, float("inf")):
+                    reach[neighbour] = total
+                    previous[neighbour] = index
+                    heapq.heappush(queue, (total, neighbour))
+        return reach, previous
+
+    def precompute(self):
+        # Every router's table, ahead of the first route asked for
+        for host in self.hosts:
+            if host is not None and host.router:
+                self.table(host)
+
+    def gateway(self, host):
+        if host.router:
+            return host
+        # By index, which finds a fork's copy of the router
+        return self.hosts[host.subnet.gateway.index] if host.subnet is not None else None
+
+    def route(self, source, target):
+        # Route from the source host to a Host or a bare address, or None
+        # when there is none
+        address = target if isinstance(target, int) else target.address
+        host = self.by_address.get(address)
+        start = self.gateway(source)
+        if start is None:
+            return None
+        if host is not None and host.router:
+            # Routers are in the tables themselves, subnet or not
+            subnet, end = None, host
+        else:
+            subnet = self.subnet_of(address)
+            if subnet is None:
+                return None
+            if host is not None and not source.router and source.subnet is subnet:
+                return Route([(host, subnet.latency)], True)
+            end = subnet.gateway
+        base = 0.0 if source.router else source.subnet.latency
+        reach, previous = self.table(start)
+        if end.index not in reach:
+            return None
+        path = []
+        index = end.index
+        while index != start.index:
+            path.append(index)
+            index = previous[index]
+        hops = [] if source.router else [(start, base)]
+        hops += [(self.hosts[index], base + reach[index]) for index in reversed(path)]
+        if host is None:
+            return Route(hops or [(start, base)], False)
+        if host is not end:
+            hops.append((host, base + reach[end.index] + subnet.latency))
+        return Route(hops or [(start, base)], True)
+
+    def reachable(self, source):
+        # Bitset of the hosts source has a route to
+        start = self.gateway(source)
+        if start is None:
+            return 0
+        reach = self.table(start)[0]
+        mask = 0
+        for subnet in self.subnets.values():
+            if subnet.gateway.index in reach:
+                mask |= self.members.get(subnet.key, 0)
+        for index in reach:
+            mask |= 1 << index
+        return mask
+
+    def between(self, first, last):
+        # Bitset of the hosts with an address in [first, last]
+        mask = 0
+        for address in self.addresses[bisect.bisect_left(self.addresses, first):
+                                      bisect.bisect_right(self.addresses, last)]:
+            mask |= 1 << self.by_address[address].index
+        return mask
+
+    def scan(self, source, first, last, ranges=((1, 65535),)):
+        # [(Host, [open ports])] of every host in [first, last] that source
+        # reaches, by address; ranges are (low, high) port ranges
+        targets = self.between(first, last) & self.reachable(source)
+        found = {}
+        for low, high in ranges:
+            for port in self.ports[bisect.bisect_left(self.ports, low):bisect.bisect_right(self.ports, high)]:
+                for index in bits(self.listening[port] & targets):
+                    found.setdefault(index, set()).add(port)
+        up = sorted((self.hosts[index] for index in bits(targets)), key=lambda host: host.address)
+        return [(host, sorted(found.get(host.index, ()))) for host in up]
@@ -0,0 +1,314 @@
+import contextlib
+import contextvars
+import marshal
+import os
+import time
+
+from cli_lab import session, variants
+
+# Save slots, so a player who drops can pick up where they left off. A slot
+# is a directory per player holding, for each level they are playing:
+#
+#   <level>.snapshot  the session state after the last checkpoint: a short
+#                     header and a marshal'd tuple of plain values, written
+#                     to a temporary file and renamed over the old one
+#   <level>.journal   every line the player typed, appended as it is read;
+#                     fsync'd in batches rather than per line
+#
+# A snapshot is (seed, journal offset, fields): the level instance is
+# rebuilt from its seed, the state's restore() puts the fields back (its
+# working directory, flags, progress and the files it changed) and the
+# journal lines past the offset are fed to the level again with their
+# output hidden. Levels checkpoint after every command, so that is at most
+# the half-typed command the player dropped in.
+#
+# Snapshots depend on the marshal format of the running Python; one written
+# by another version is ignored and the level starts over.
+
+MAGIC = b"TWS" + bytes([marshal.version])
+# Journal lines written before fsync, and the longest a line may wait
+SYNC_LINES = 32
+SYNC_SECONDS = 1.0
+# A journal is emptied at a checkpoint once it is larger than this
+JOURNAL_LIMIT = 64 * 1024
+
+_slot = contextvars.ContextVar("save_slot", default=None)
+
+
+class Journal:
+    # Append-only log of lines. Every append reaches the OS right away; it
+    # is only fsync'd every SYNC_LINES lines or SYNC_SECONDS seconds.
+
+    def __init__(self, path, sync_lines=SYNC_LINES, sync_seconds=SYNC_SECONDS):
+        self.path = path
+        self.file = open(path, "ab")
+        self.sync_lines = sync_lines
+        self.sync_seconds = sync_seconds
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    @property
+    def size(self):
+        return self.file.tell()
+
+    def append(self, line):
+        self.file.write(line.encode("utf-8") + b"\n")
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= self.sync_lines or time.monotonic() - self.synced >= self.sync_seconds:
+            self.sync()
+
+    def sync(self):
+        if self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.synced = time.monotonic()
+
+    def truncate(self, size=0):
+        self.file.truncate(size)
+        self.file.seek(size)
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+def read_lines(path, offset):
+    # Journal lines from byte offset on; a torn last line is dropped
+    try:
+        with open(path, "rb") as journal:
+            journal.seek(offset)
+            data = journal.read()
+    except OSError:
+        return []
+    lines = data.split(b"\n")
+    return [line.decode("utf-8", "replace") for line in lines[:-1]]
+
+
+def encode(seed, offset, fields):
+    return MAGIC + marshal.dumps((seed, offset, fields))
+
+
+def decode(data):
+    # (seed, offset, fields), or None for a snapshot this can't read
+    if data[:len(MAGIC)] != MAGIC:
+        return None
+    try:
+        return marshal.loads(data[len(MAGIC):])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+class LevelSave:
+    # One level's snapshot and journal in a slot
+
+    def __init__(self, slot, key):
+        stem = os.path.join(slot.directory, key.replace("/", "-"))
+        self.snapshot_path = stem + ".snapshot"
+        self.journal_path = stem + ".journal"
+        self.every = slot.checkpoint_every
+        self.journal = None
+        self.seed = None
+        # Journal offset up to which the state has seen the lines
+        self.position = 0
+        self.commands = 0
+
+    def load(self):
+        # (seed, offset, fields, journal lines to replay) of the saved
+        # session, or None
+        try:
+            with open(self.snapshot_path, "rb") as snapshot:
+                saved = decode(snapshot.read())
+        except OSError:
+            return None
+        if saved is None:
+            return None
+        seed, offset, fields = saved
+        return seed, offset, fields, read_lines(self.journal_path, offset)
+
+    def start(self, seed, state, offset=None, replay=()):
+        # Begin saving a session of the instance of seed: a fresh one, or
+        # one restored from the snapshot at offset that replays lines
+        self.seed = seed
+        self.journal = Journal(self.journal_path)
+        if offset is None:
+            self.journal.truncate()
+            self.checkpoint(state, force=True)
+        else:
+            # Also cuts off a torn last line
+            self.journal.truncate(offset + sum(len(line.encode("utf-8")) + 1 for line in replay))
+            self.position = offset
+
+    def record(self, line):
+        self.journal.append(line)
+        self.position = self.journal.size
+
+    def replayed(self, line):
+        self.position += len(line.encode("utf-8")) + 1
+
+    def checkpoint(self, state, force=False):
+        self.commands += 1
+        if not force and self.commands % self.every:
+            return
+        self._write(state.save())
+        if self.journal.size > JOURNAL_LIMIT and self.position == self.journal.size:
+            # The snapshot covers the whole journal. Should the process die
+            # right after this, the saved offset is past the end and
+            # nothing is replayed, which is still correct.
+            self.journal.truncate()
+            self.position = 0
+            self._write(state.save())
+
+    def _write(self, fields):
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(encode(self.seed, self.position, fields))
+        os.replace(temporary, self.snapshot_path)
+
+    def finish(self):
+        # The level was completed: nothing left to resume
+        self.close()
+        for path in (self.snapshot_path, self.journal_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+class SaveSlot:
+    # The saves of one player. checkpoint_every: commands between snapshots;
+    # the journal covers the ones in between.
+
+    def __init__(self, directory, checkpoint_every=1):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(directory, exist_ok=True)
+
+    def level(self, key):
+        return LevelSave(self, key)
+
+    @property
+    def completed_path(self):
+        return os.path.join(self.directory, "completed")
+
+    def completed(self):
+        # Names of the levels recorded with complete()
+        try:
+            with open(self.completed_path, encoding="utf-8") as completed:
+                return {line.strip() for line in completed if line.strip()}
+        except OSError:
+            return set()
+
+    def complete(self, name):
+        with open(self.completed_path, "a", encoding="utf-8") as completed:
+            completed.write(name + "\n")
+
+    def clear_completed(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.completed_path)
+
+
+@contextlib.contextmanager
+def saving(slot):
+    # Levels started inside this block save to slot and resume from it
+    token = _slot.set(slot)
+    try:
+        yield slot
+    finally:
+        _slot.reset(token)
+
+
+def current():
+    return _slot.get()
+
+
+def level_key(module_file):
+    # Save name of a level module, e.g. "windows/level3_searching"
+    directory, filename = os.path.split(os.path.splitext(module_file)[0])
+    return f"{os.path.basename(directory)}/{filename}"
+
+
+class RecordingIO:
+    # Wraps the player's session for a saved level: every line read is
+    # journaled, and the lines of a resumed journal are served first with
+    # their output hidden.
+
+    def __init__(self, outer, save, replay=()):
+        self.outer = outer
+        self.save = save
+        self.replay = list(reversed(replay))
+        self.interactive = outer.interactive
+        self.clock = outer.clock
+        # From the first replayed line until the player is asked again
+        self.hiding = False
+
+    def read_line(self, prompt=""):
+        if self.replay:
+            self.hiding = True
+            line = self.replay.pop()
+            self.save.replayed(line)
+        else:
+            self.hiding = False
+            line = self.outer.read_line(prompt)
+            self.save.record(line)
+        return line
+
+    def write(self, text):
+        if not self.hiding:
+            self.outer.write(text)
+
+    def write_screen(self, screen):
+        if not self.hiding:
+            self.outer.write_screen(screen)
+
+    def clear(self):
+        if not self.hiding:
+            self.outer.clear()
+
+    def flush(self):
+        self.outer.flush()
+
+    def pause(self, seconds):
+        if not self.hiding:
+            self.outer.pause(seconds)
+
+    def event(self, name, fields):
+        self.outer.event(name, fields)
+
+    def close(self):
+        self.outer.close()
+
+
+@contextlib.contextmanager
+def resumable(module_file, pool):
+    # A session of the level in module_file, resumed from the current save
+    # slot when it has one. pool: the level's variants.VariantPool; its
+    # instances need save() and restore(fields). Yields (seed, state, save,
+    # resumed), where save is None without a slot; call
+    # save.checkpoint(state) after every command and save.finish() once the
+    # level is won.
+    slot = current()
+    if slot is None:
+        seed, state = pool.take(variants.requested())
+        yield seed, state, None, False
+        return
+    save = slot.level(level_key(module_file))
+    saved = save.load()
+    replay = ()
+    if saved is not None:
+        seed, offset, fields, replay = saved
+        seed, state = pool.take(seed)
+        state.restore(fields)
+        save.start(seed, state, offset, replay)
+    else:
+        seed, state = pool.take(variants.requested())
+        save.start(seed, state)
+    try:
+        with session.use(RecordingIO(session.current(), save, replay)):
+            yield seed, state, save, saved is not None
+    finally:
+        save.close()
@@ -0,0 +1,183 @@
+import contextvars
+
+from cli_lab import access, shell
+from cli_lab.content import text_of
+from cli_lab.session import print
+from cli_lab.vfs import READ, WRITE
+
+# Streaming execution of parsed pipelines. A streaming command is a generator
+# handler(state, args, stdin) that yields output lines (without newlines)
+# and reads its input lazily from stdin, an iterator of lines or None when
+# nothing is piped in. Whatever it returns becomes the command's result,
+# like the return value of a plain handler. Stages come from
+# CommandRegistry.stage() and are chained as generators, so a 'head' that
+# stops pulling also stops every stage before it.
+#
+# Errors are printed straight to the session, which keeps them out of pipes
+# and redirected files like stderr would.
+#
+# What the player actually saw is what reached the terminal, not what a
+# command produced: its output may have gone into a file or been filtered
+# out by a later stage. Levels that reward reading something register a
+# when_shown() callback, and a level may watch every line on the screen
+# with an on_shown(line) method on its state.
+
+# What a handler returns when its command failed; '&&' and '||' go by it
+FAILED = object()
+
+# [callback, shown] entries of the command whose output is being shown
+_pending = contextvars.ContextVar("pending", default=None)
+
+
+def lines_of(content):
+    # Lazily splits file content into lines without copying it up front
+    if content is not None and not isinstance(content, str):
+        yield from content.lines()
+        return
+    start = 0
+    content = content or ""
+    while start < len(content):
+        end = content.find("\n", start)
+        if end < 0:
+            yield content[start:]
+            return
+        yield content[start:end]
+        start = end + 1
+
+
+def drain(stream, sink):
+    # Feeds every line to sink and returns the generator's return value
+    while True:
+        try:
+            line = next(stream)
+        except StopIteration as stop:
+            return stop.value
+        sink(line)
+
+
+def _collect(stream, results):
+    results.append((yield from stream))
+
+
+def execute(registry, state, pipeline):
+    # Runs the pipeline and returns the last command's result, or True when
+    # an earlier stage finished the level (e.g. a findstr piped into more)
+    stream = None
+    results = []
+    for command in pipeline.commands:
+        stdin = stream if stream is None else _collect(stream, results)
+        for redirect in command.redirects:
+            if redirect.op == "<":
+                stdin = read_input(state, redirect.target, registry.dialect)
+                if stdin is None:
+                    return FAILED
+        stream = registry.stage(state, command.name, command.args, stdin)
+
+    # Only the last command's stdout can be redirected anywhere but the pipe;
+    # stderr is already kept apart, so 2> and 2>&1 have nothing to do.
+    target = None
+    for redirect in pipeline.commands[-1].redirects:
+        if redirect.fd == 1 and redirect.op in (">", ">>"):
+            target = redirect
+
+    if target is None:
+        result = to_terminal(state, stream)
+    else:
+        lines = []
+        token = _pending.set(None)
+        try:
+            result = drain(stream, lines.append)
+        finally:
+            _pending.reset(token)
+        if write_output(state, target.target, lines, target.op == ">>", registry.dialect) is None:
+            result = FAILED
+    return True if True in results else result
+
+
+def when_shown(callback, shown=False):
+    # Runs callback() once the command being run is done, if any of its
+    # output reached the terminal after this call, or with shown (output
+    # with no lines, e.g. an empty file) if the command wrote to the
+    # terminal at all. Its result is the command's when it is True (a win).
+    pending = _pending.get()
+    if pending is not None:
+        pending.append([callback, shown])
+
+
+def to_terminal(state, stream):
+    # Prints every line of stream and returns its result, see when_shown()
+    hook = getattr(state, "on_shown", None)
+    pending = []
+
+    def sink(line):
+        print(line)
+        if hook is not None:
+            hook(line)
+        for entry in pending:
+            entry[1] = True
+
+    token = _pending.set(pending)
+    try:
+        result = drain(stream, sink)
+    finally:
+        _pending.reset(token)
+    for callback, shown in pending:
+        if shown and callback() is True:
+            result = True
+    return result
+
+
+def _error(dialect, path, posix, windows):
+    print(windows if dialect == shell.CMD else f"bash: {path}: {posix}")
+
+
+def read_input(state, path, dialect=shell.POSIX):
+    inode = state.fs.lookup(path, state.cwd)
+    if inode is None:
+        _error(dialect, path, "No such file or directory", "The system cannot find the file specified.")
+    elif inode.is_dir:
+        _error(dialect, path, "Is a directory", "Access is denied.")
+    elif not access.permits(state.principal, inode, READ):
+        _error(dialect, path, "Permission denied", "Access is denied.")
+    else:
+        return lines_of(inode.content)
+    return None
+
+
+def write_output(state, path, lines, append=False, dialect=shell.POSIX):
+    # Writes lines into the session's filesystem like '>' or '>>'; returns
+    # the file's inode, or None after printing why it could not be written.
+    fs = state.fs
+    principal = state.principal
+    text = "\n".join(lines)
+
+    inode = fs.lookup(path, state.cwd)
+    if inode is not None:
+        if inode.is_dir:
+            _error(dialect, path, "Is a directory", "Access is denied.")
+            return None
+        if not access.permits(principal, inode, WRITE):
+            _error(dialect, path, "Permission denied", "Access is denied.")
+            return None
+        inode = fs.writable(path, state.cwd)
+        if append and inode.content:
+            existing = text_of(inode.content)
+            text = f"{existing}\n{text}" if text else existing
+        inode.write(text)
+        return inode
+
+    parent, slash, _ = path.replace("\\", "/").rpartition("/")
+    directory = fs.lookup((parent or "/") if slash else ".", state.cwd)
+    if directory is None or not directory.is_dir:
+        _error(dialect, path, "No such file or directory", "The system cannot find the path specified.")
+        return None
+    if not access.may_create(principal, directory):
+        _error(dialect, path, "Permission denied", "Access is denied.")
+        return None
+
+    inode = fs.add_file(path, text, owner=principal.name, group=access.new_group(principal, directory),
+                        cwd=state.cwd)
+    hook = getattr(state, "on_create", {}).get(fs.path_of(inode))
+    if hook is not None:
+        hook(state, inode)
+    return inode
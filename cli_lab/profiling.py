@@ -0,0 +1,304 @@
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+# On-demand profiling of level execution, without redeploying. A Profiler
+# is switched on for the whole process (main --profile, or SIGUSR1 on the
+# server) and every level started while it is on runs under it:
+#
+#   cpu     cProfile per level; <level>.pstats, plus cpu.collapsed with the
+#           call graph unfolded into stacks weighted by microseconds
+#   sample  a thread that samples the stacks of every thread playing a level
+#           every few milliseconds, also sees levels already running when
+#           profiling started; sample.collapsed, weighted by sample count
+#   alloc   tracemalloc; alloc.txt with the top allocation sites of each
+#           level and of the whole profiling run
+#
+# Collapsed stacks are one "level;frame;frame... weight" line per stack, the
+# input of flamegraph.pl and speedscope. The profilers are only imported
+# when a mode needs them.
+
+MODES = ("cpu", "sample", "alloc")
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+# Allocation sites listed per level
+ALLOC_TOP = 15
+# Deepest stack unfolded from the cProfile call graph, and the smallest
+# weight (microseconds) still written
+CPU_DEPTH = 64
+CPU_MIN_US = 1
+
+# thread id -> (name of the level it is playing, the frame that started
+# it), kept whether or not a profiler is on so the sampler can see levels
+# already running
+playing = {}
+_active = None
+
+
+def frame_label(filename, name):
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{name}"
+
+
+def unfold(stats, prefix):
+    # Collapsed stacks from a pstats.Stats call graph. The time of a
+    # function is split over its callees by how much of it each call edge
+    # accounts for, which is exact for trees and an estimate elsewhere.
+    callees = collections.defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller][function] = edge[3]
+    roots = [function for function, (_, _, _, _, callers) in stats.stats.items()
+             if not any(caller in stats.stats for caller in callers)]
+    weights = collections.Counter()
+
+    def visit(function, path, seconds, depth):
+        _, _, own, total, _ = stats.stats[function]
+        label = f"{path};{frame_label(function[0], function[2])}"
+        if total:
+            weights[label] += seconds * own / total
+        if depth >= CPU_DEPTH or not total:
+            return
+        for callee, edge in callees.get(function, {}).items():
+            share = seconds * edge / total
+            if share * 1e6 >= CPU_MIN_US and callee in stats.stats and callee != function:
+                visit(callee, label, share, depth + 1)
+
+    for root in roots:
+        visit(root, prefix, stats.stats[root][3], 0)
+    return {stack: round(seconds * 1e6) for stack, seconds in weights.items() if seconds * 1e6 >= CPU_MIN_US}
+
+
+def snapshot():
+    # tracemalloc snapshot without the profilers' own allocations, or None
+    # when tracemalloc isn't running
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return None
+    import cProfile
+    import pstats
+
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, path) for path in (__file__, tracemalloc.__file__, cProfile.__file__, pstats.__file__)
+    ])
+
+
+class Sampler:
+    # Samples the stacks of the threads in playing
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, (level, top) in list(playing.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                # From the leaf up to the frame that started the level
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code.co_filename, frame.f_code.co_name))
+                    if frame is top:
+                        break
+                    frame = frame.f_back
+                stack.append(level)
+                self.counts[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+class Profiler:
+    def __init__(self, directory, modes=("cpu",), interval=SAMPLE_INTERVAL):
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"unknown profile mode '{', '.join(sorted(unknown))}', "
+                             f"expected some of: {', '.join(MODES)}")
+        self.directory = directory
+        self.modes = set(modes)
+        self.lock = threading.Lock()
+        # level -> merged pstats.Stats
+        self.cpu = {}
+        # level -> [tracemalloc.StatisticDiff] of every run of it
+        self.allocations = collections.defaultdict(list)
+        self.sampler = Sampler(interval) if "sample" in self.modes else None
+        self.baseline = None
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        if "alloc" in self.modes:
+            import tracemalloc
+
+            tracemalloc.start()
+            self.baseline = snapshot()
+        if self.sampler is not None:
+            self.sampler.start()
+
+    @contextlib.contextmanager
+    def level(self, name):
+        profile = before = None
+        if "alloc" in self.modes:
+            before = snapshot()
+        if "cpu" in self.modes:
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile at a time; this run of
+                # the level goes unprofiled while another session's is
+                profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._add_cpu(name, profile)
+            if before is not None:
+                after = snapshot()
+                if after is not None:
+                    grown = [stat for stat in after.compare_to(before, "lineno") if stat.size_diff > 0]
+                    with self.lock:
+                        self.allocations[name].extend(grown[:ALLOC_TOP])
+
+    def _add_cpu(self, name, profile):
+        import pstats
+
+        with self.lock:
+            if name in self.cpu:
+                self.cpu[name].add(profile)
+            else:
+                self.cpu[name] = pstats.Stats(profile)
+
+    def stop(self):
+        # Stops profiling and writes the results; returns the paths written
+        elapsed = time.perf_counter() - self.started
+        if self.sampler is not None:
+            self.sampler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        written = []
+        if "cpu" in self.modes:
+            written += self._write_cpu()
+        if self.sampler is not None:
+            written.append(self._write_collapsed("sample.collapsed", self.sampler.counts))
+        if "alloc" in self.modes:
+            written.append(self._write_allocations())
+        summary = os.path.join(self.directory, "summary.txt")
+        with open(summary, "w", encoding="utf-8") as out:
+            out.write(f"profiled {elapsed:.2f}s, modes: {', '.join(sorted(self.modes))}\n")
+            if self.sampler is not None:
+                out.write(f"{self.sampler.samples} stack samples every {self.sampler.interval * 1000:g} ms\n")
+            for name, stats in sorted(self.cpu.items()):
+                out.write(f"\n=== {name} ===\n")
+                stats.stream = out
+                stats.sort_stats("cumulative").print_stats(25)
+        written.append(summary)
+        return written
+
+    def _write_cpu(self):
+        written = []
+        stacks = {}
+        for name, stats in sorted(self.cpu.items()):
+            path = os.path.join(self.directory, name.replace("/", "-") + ".pstats")
+            stats.dump_stats(path)
+            written.append(path)
+            stacks.update(unfold(stats, name))
+        written.append(self._write_collapsed("cpu.collapsed", stacks))
+        return written
+
+    def _write_collapsed(self, filename, weights):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w", encoding="utf-8") as out:
+            for stack, weight in sorted(weights.items()):
+                out.write(f"{stack} {weight}\n")
+        return path
+
+    def _write_allocations(self):
+        import tracemalloc
+
+        path = os.path.join(self.directory, "alloc.txt")
+        with open(path, "w", encoding="utf-8") as out:
+            for name, diffs in sorted(self.allocations.items()):
+                out.write(f"=== {name}: top allocation sites, still live when the level ended ===\n")
+                merged = collections.defaultdict(lambda: [0, 0])
+                for diff in diffs:
+                    site = merged[str(diff.traceback[0])]
+                    site[0] += diff.size_diff
+                    site[1] += diff.count_diff
+                for site, (size, count) in sorted(merged.items(), key=lambda item: -item[1][0])[:ALLOC_TOP]:
+                    out.write(f"{size / 1024:+10.1f} KiB {count:+8} blocks  {site}\n")
+                out.write("\n")
+            if tracemalloc.is_tracing():
+                out.write("=== whole run: allocated and still live ===\n")
+                diff = snapshot().compare_to(self.baseline, "lineno")
+                for stat in [stat for stat in diff if stat.size_diff > 0][:ALLOC_TOP]:
+                    out.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8} blocks  "
+                              f"{stat.traceback[0]}\n")
+                tracemalloc.stop()
+        return path
+
+
+@contextlib.contextmanager
+def level(name):
+    # Wraps one run of a level: marks the thread as playing it and profiles
+    # it when a profiler is on
+    thread_id = threading.get_ident()
+    outer = playing.get(thread_id)
+    # The caller of the with statement, past contextlib's __enter__
+    playing[thread_id] = (name, sys._getframe(2))
+    try:
+        profiler = _active
+        if profiler is None:
+            yield
+        else:
+            with profiler.level(name):
+                yield
+    finally:
+        if outer is None:
+            del playing[thread_id]
+        else:
+            playing[thread_id] = outer
+
+
+def start(profiler):
+    global _active
+    profiler.start()
+    _active = profiler
+
+
+def stop():
+    # Written paths of the running profiler, or None when none is on
+    global _active
+    profiler, _active = _active, None
+    return profiler.stop() if profiler is not None else None
+
+
+def active():
+    return _active
+
+
+def toggle(directory, modes=("sample",)):
+    # For long-lived processes: starts a profiler, or stops the running one
+    # and returns the paths it wrote
+    if _active is None:
+        start(Profiler(directory, modes))
+        return None
+    return stop()
@@ -0,0 +1,78 @@
+import functools
+
+# Output rendering helpers. Sessions collect everything a command prints in
+# an OutputBuffer and hand it to the terminal/socket in one write when the
+# next prompt is shown. Screens that never change (banners, help, headers)
+# are built once as Screen objects that cache their encoded form.
+
+
+class Screen:
+    __slots__ = ("text", "_encoded")
+
+    def __init__(self, text):
+        self.text = text
+        self._encoded = {}
+
+    def encode(self, newline="\n", encoding=None):
+        key = (newline, encoding)
+        data = self._encoded.get(key)
+        if data is None:
+            data = self.text.replace("\n", newline) if newline != "\n" else self.text
+            if encoding is not None:
+                data = data.encode(encoding)
+            self._encoded[key] = data
+        return data
+
+
+def screen(*lines):
+    # Same text as print()-ing each line in turn.
+    return Screen("".join(f"{line}\n" for line in lines))
+
+
+class OutputBuffer:
+    def __init__(self, sink, newline="\n", encoding=None):
+        self.sink = sink
+        self.newline = newline
+        self.encoding = encoding
+        self.pending = []
+
+    def write(self, text):
+        if self.newline != "\n":
+            text = text.replace("\n", self.newline)
+        if self.encoding is not None:
+            text = text.encode(self.encoding)
+        self.pending.append(text)
+
+    def write_screen(self, screen):
+        self.pending.append(screen.encode(self.newline, self.encoding))
+
+    def flush(self, tail=""):
+        if tail:
+            self.write(tail)
+        if self.pending:
+            data = (b"" if self.encoding is not None else "").join(self.pending)
+            self.pending.clear()
+            self.sink(data)
+
+
+class Checklist:
+    # Challenge checklist with both renderings of every line prepared up
+    # front. Progress is a bitset (bit n-1 set once challenge n is done), so
+    # a full checklist is rendered once per distinct progress value.
+
+    def __init__(self, items):
+        self.items = [
+            (f"◻️ {number}) {text}", f"✅ {number}) {text}")
+            for number, text in enumerate(items, 1)
+        ]
+        self.render = functools.lru_cache(maxsize=None)(self._build)
+
+    def lines(self, progress):
+        lines = [""]
+        for bit, (todo, done) in enumerate(self.items):
+            lines.append(done if progress >> bit & 1 else todo)
+            lines.append("")
+        return lines
+
+    def _build(self, progress):
+        return screen(*self.lines(progress))
@@ -0,0 +1,294 @@
+import collections
+import functools
+import re
+import threading
+
+# Line search behind grep and findstr. Patterns are compiled once into a
+# Matcher (memoized, like shell.parse) and file bodies are scanned a window
+# at a time: the matcher jumps straight to the next hit with str.find or a
+# compiled regex, and only the lines around hits are ever sliced out, so a
+# search over a 100MB log never splits it into lines.
+#
+# Bodies may be str or content.Blob; a Blob is decoded one window at a time.
+#
+# Bodies of at least INDEX_MIN characters that are searched more than once
+# get a TrigramIndex, kept by the body's content id (Inode.content_id()) and
+# so shared by every session holding the same body. It records which
+# trigrams occur inside the words of each block, so later searches for a
+# literal only scan the blocks that can contain it.
+
+# Characters scanned per window of a file body; windows end on a newline
+WINDOW = 1 << 20
+# Characters per trigram index block
+BLOCK = 1 << 18
+INDEX_MIN = 1 << 23
+# Trigram indexes kept
+INDEXES = 8
+REGEX_CHARS = frozenset(".^$*+?()[]{}|\\")
+
+# Bytes that can be part of a word for the index, lowercased; everything
+# else separates words. Digits and non-ASCII bytes are left out: numbers
+# make up most distinct words in a log and would only bloat the index.
+WORD_BYTES = bytes(
+    byte if chr(byte).isalpha() or byte == ord("_") else ord(" ") for byte in range(128)
+).lower() + b" " * 128
+
+
+class PatternError(ValueError):
+    pass
+
+
+def basic_to_python(pattern):
+    # grep's basic regular expressions: \( \) \| \+ \? \{ \} are operators
+    # and the bare characters are literal, the other way round from Python
+    out = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == "\\":
+            escaped = next(chars, "\\")
+            out.append(escaped if escaped in "()|+?{}" else "\\" + escaped)
+        elif char in "()|+?{}":
+            out.append("\\" + char)
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+class Matcher:
+    # Finds lines containing any of the patterns. literals holds them
+    # (lowercased with ignore_case) when none is a regular expression.
+    __slots__ = ("literals", "regex", "ignore_case", "fast")
+
+    def __init__(self, patterns, ignore_case=False, regex=True, basic=True):
+        if not regex or not any(REGEX_CHARS.intersection(pattern) for pattern in patterns):
+            self.literals = tuple(pattern.lower() if ignore_case else pattern for pattern in patterns)
+            expression = "|".join(map(re.escape, self.literals))
+        else:
+            self.literals = None
+            expression = "|".join(f"(?:{basic_to_python(pattern) if basic else pattern})"
+                                  for pattern in patterns)
+        try:
+            self.regex = re.compile(expression, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        except re.error as error:
+            raise PatternError(str(error)) from None
+        self.ignore_case = ignore_case
+        # One literal: plain substring search, on a lowercased copy with -i
+        self.fast = self.literals is not None and len(self.literals) == 1 and (
+            not ignore_case or self.literals[0].isascii())
+
+    def line_matches(self, line):
+        if self.fast:
+            return self.literals[0] in (line.lower() if self.ignore_case else line)
+        return self.regex.search(line) is not None
+
+    def finder(self, content, start, end):
+        # find(pos) -> position of the next hit in content[pos:end], or -1
+        if self.fast:
+            literal = self.literals[0]
+            if not self.ignore_case:
+                return lambda pos: content.find(literal, pos, end)
+            window = content[start:end]
+            if window.isascii():
+                lowered = window.lower()
+
+                def find(pos):
+                    hit = lowered.find(literal, pos - start)
+                    return hit + start if hit >= 0 else -1
+                return find
+
+        search = self.regex.search
+
+        def find(pos):
+            match = search(content, pos, end)
+            return match.start() if match else -1
+        return find
+
+
+@functools.lru_cache(maxsize=256)
+def compile_pattern(patterns, ignore_case=False, regex=True, basic=True):
+    # patterns: tuple of strings, a line matches if it contains any of them;
+    # raises PatternError
+    return Matcher(patterns, ignore_case, regex, basic)
+
+
+def windows(content, size=WINDOW):
+    # (start, end) ranges of about size characters ending after a newline
+    if not isinstance(content, str):
+        yield from content.windows(size)
+        return
+    start = 0
+    length = len(content)
+    while start < length:
+        cut = start + size
+        if cut >= length:
+            end = length
+        else:
+            end = content.find("\n", cut)
+            end = length if end < 0 else end + 1
+        yield start, end
+        start = end
+
+
+def _window_text(content, start, end):
+    # (text, start, end) to scan for one window: a str body is scanned in
+    # place, a Blob window is decoded first
+    if isinstance(content, str):
+        return content, start, end
+    text = content.text(start, end)
+    return text, 0, len(text)
+
+
+def _scan_window(content, start, end, number, matcher):
+    # Yields matching (number, line) and returns the line number after the
+    # window
+    find = matcher.finder(content, start, end)
+    pos = start
+    while pos < end:
+        hit = find(pos)
+        if hit < 0:
+            break
+        line_start = content.rfind("\n", pos, hit) + 1 or pos
+        line_end = content.find("\n", hit, end)
+        if line_end < 0:
+            line_end = end
+        number += content.count("\n", pos, line_start)
+        line = content[line_start:line_end]
+        # A regex hit may run past the end of its line; check the line alone
+        if matcher.fast or matcher.line_matches(line):
+            yield number, line
+        number += 1
+        pos = line_end + 1
+    return number + content.count("\n", pos, end)
+
+
+def _invert_window(content, start, end, number, matcher):
+    # Most lines are usually output with -v, so split the window in one go
+    lines = content[start:end].split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    matches = matcher.line_matches
+    yield from [(number + offset, line) for offset, line in enumerate(lines) if not matches(line)]
+    return number + len(lines)
+
+
+def scan(content, matcher, invert=False, content_id=None):
+    # (line number, line) for every line of content that matches (or, with
+    # invert, doesn't), lazily and in order. Only a body with a content id
+    # is indexed.
+    content = content or ""
+    if invert:
+        number = 1
+        for start, end in windows(content):
+            number = yield from _invert_window(*_window_text(content, start, end), number, matcher)
+        return
+    blocks = None
+    if content_id is not None and matcher.literals is not None and len(content) >= INDEX_MIN:
+        blocks = _indexed_blocks(content, content_id, matcher.literals)
+    if blocks is not None:
+        for start, end, number in blocks:
+            yield from _scan_window(*_window_text(content, start, end), number, matcher)
+        return
+    number = 1
+    for start, end in windows(content):
+        number = yield from _scan_window(*_window_text(content, start, end), number, matcher)
+
+
+def filter_lines(lines, matcher, invert=False):
+    # scan() for piped input: (line number, line) from an iterator of lines
+    for number, line in enumerate(lines, 1):
+        if matcher.line_matches(line) != invert:
+            yield number, line
+
+
+def words(text):
+    # Lowercase runs of ASCII letters (and _) in text as bytes, for the index
+    return text.encode("utf-8", "surrogatepass").translate(WORD_BYTES).split()
+
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class TrigramIndex:
+    # For each block of a body (aligned to lines): its offset, its first line
+    # number, and per trigram of its words the sorted list of blocks that
+    # have it. A literal occurs in a block only if every trigram of every
+    # word inside the literal does.
+    __slots__ = ("starts", "ends", "numbers", "postings")
+
+    def __init__(self, content):
+        self.starts = []
+        self.ends = []
+        self.numbers = []
+        self.postings = {}
+        grams_of = {}
+        number = 1
+        for block, (start, end) in enumerate(windows(content, BLOCK)):
+            self.starts.append(start)
+            self.ends.append(end)
+            self.numbers.append(number)
+            text, text_start, text_end = _window_text(content, start, end)
+            number += text.count("\n", text_start, text_end)
+            grams = set()
+            for word in set(words(text[text_start:text_end])):
+                known = grams_of.get(word)
+                if known is None:
+                    known = grams_of[word] = trigrams(word)
+                grams |= known
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(block)
+
+    def blocks(self, literal):
+        # Sorted numbers of the blocks that may contain literal, or None
+        # when it has no word of three letters or more to narrow it down
+        grams = set()
+        for word in words(literal):
+            grams |= trigrams(word)
+        if not grams:
+            return None
+        lists = sorted((self.postings.get(gram, []) for gram in grams), key=len)
+        found = set(lists[0])
+        for numbers in lists[1:]:
+            found.intersection_update(numbers)
+            if not found:
+                break
+        return sorted(found)
+
+
+_scanned = {}
+_indexes = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def trigram_index(content, content_id):
+    # Keyed by content_id alone, so an index never keeps its body alive
+    with _lock:
+        index = _indexes.get(content_id)
+        if index is not None:
+            _indexes.move_to_end(content_id)
+            return index
+    index = TrigramIndex(content)
+    with _lock:
+        _indexes[content_id] = index
+        if len(_indexes) > INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _indexed_blocks(content, content_id, literals):
+    # (start, end, first line number) of the blocks worth scanning, or None
+    # to scan everything. The index is only built once a body is searched
+    # for the second time.
+    if content_id not in _scanned:
+        if len(_scanned) >= 64:
+            _scanned.clear()
+        _scanned[content_id] = True
+        return None
+    index = trigram_index(content, content_id)
+    found = set()
+    for literal in literals:
+        blocks = index.blocks(literal)
+        if blocks is None:
+            return None
+        found.update(blocks)
+    return [(index.starts[block], index.ends[block], index.numbers[block]) for block in sorted(found)]
@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import os
+import re
+import signal
+import threading
+
+from cli_lab import main as menu
+from cli_lab import clock, leaderboard, metrics, persist, profiling, session, term, world
+from cli_lab.render import OutputBuffer
+
+# Telnet-style multi-session server. The levels are plain blocking loops, so
+# every connection runs its level code on a worker thread while the event
+# loop owns the socket; the NetworkIO object bridges the two.
+
+IAC = 255
+TELNET_COMMANDS = range(251, 255)  # WILL, WONT, DO, DONT carry an option byte
+
+
+def strip_telnet(data):
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        byte = data[i]
+        if byte == IAC and i + 1 < len(data):
+            i += 3 if data[i + 1] in TELNET_COMMANDS else 2
+            continue
+        out.append(byte)
+        i += 1
+    return bytes(out)
+
+
+class NetworkIO:
+    interactive = True
+
+    def __init__(self, loop, reader, writer, idle_timeout=None):
+        self.loop = loop
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+        self.closed = False
+        self.output = OutputBuffer(self._send, newline="\r\n", encoding="utf-8")
+        self.clock = clock.Clock()
+        # Simulated delays hold the output back on the event loop instead
+        # of sleeping on the worker thread
+        self.pacer = clock.Pacer(loop)
+
+    def _send(self, data):
+        if self.closed:
+            raise EOFError
+        self.pacer.call(self.writer.write, data)
+
+    def read_line(self, prompt=""):
+        self.output.flush(prompt)
+        reading = asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        try:
+            data = asyncio.run_coroutine_threadsafe(reading, self.loop).result()
+        except (asyncio.TimeoutError, ConnectionError):
+            raise EOFError
+        if not data:
+            raise EOFError
+        return strip_telnet(data).decode("utf-8", "replace").rstrip("\r\n")
+
+    def write(self, text):
+        self.output.write(text)
+
+    def write_screen(self, screen):
+        self.output.write_screen(screen)
+
+    def clear(self):
+        self.output.write(term.CLEAR_SCREEN)
+
+    def flush(self):
+        self.output.flush()
+
+    def pause(self, seconds):
+        self.output.flush()
+        self.clock.advance(seconds)
+        self.pacer.delay(seconds)
+
+    def event(self, name, fields):
+        pass
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.output.flush()
+            finally:
+                self.closed = True
+                self.pacer.call(self.writer.close)
+
+
+PLAYER_NAME = re.compile(r"[A-Za-z0-9_-]{1,32}")
+
+
+class Players:
+    # Named players: save slots under one directory, one per player name,
+    # the leaderboard their results go to and the shared world they log in
+    # to as that name (any may be None). A name can only be playing on one
+    # connection at a time.
+
+    def __init__(self, directory=None, board=None, shared=None):
+        self.directory = directory
+        self.board = board
+        self.shared = shared
+        self.playing = set()
+        self.lock = threading.Lock()
+
+    def login(self):
+        # The name the player picks, or None when they give up
+        for _ in range(3):
+            name = session.input("Player name: ").strip()
+            if not PLAYER_NAME.fullmatch(name):
+                session.print("Use 1-32 letters, digits, '-' or '_'.")
+                continue
+            with self.lock:
+                if name not in self.playing:
+                    self.playing.add(name)
+                    return name
+            session.print(f"{name} is already playing.")
+        return None
+
+    def logout(self, name):
+        with self.lock:
+            self.playing.discard(name)
+
+    def slot(self, name):
+        if self.directory is None:
+            return None
+        return persist.SaveSlot(os.path.join(self.directory, name))
+
+
+def play(entry, players):
+    if players is None:
+        entry()
+        return
+    name = players.login()
+    if name is None:
+        return
+    try:
+        with contextlib.ExitStack() as stack:
+            slot = players.slot(name)
+            if slot is not None:
+                stack.enter_context(persist.saving(slot))
+            if players.board is not None:
+                stack.enter_context(leaderboard.scoring(players.board, name))
+            if players.shared is not None:
+                stack.enter_context(world.joining(players.shared, name))
+            entry()
+    finally:
+        players.logout(name)
+
+
+def run_session(io, entry, players=None):
+    with session.use(io):
+        try:
+            play(entry, players)
+        except (EOFError, KeyboardInterrupt, ConnectionError):
+            pass
+        finally:
+            io.close()
+
+
+class SessionServer:
+    def __init__(self, host="0.0.0.0", port=2323, max_sessions=500,
+                 idle_timeout=None, entry=menu.main, saves=None, board=None,
+                 metrics_port=None, metrics_json=None, metrics_every=10.0,
+                 profile_dir=None, profile_modes=("sample",), shared=None):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.entry = entry
+        # With a saves directory, a leaderboard or a shared world
+        # (cli_lab.world) players log in by name
+        self.board = board
+        self.shared = shared
+        named = saves is not None or board is not None or shared is not None
+        self.players = Players(saves, board, shared) if named else None
+        self.active = 0
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_sessions, thread_name_prefix="session"
+        )
+        self.server = None
+        # Prometheus text on GET /metrics of this port, and/or the JSON
+        # snapshot written to metrics_json every metrics_every seconds
+        self.metrics_port = metrics_port
+        self.metrics_json = metrics_json
+        self.metrics_every = metrics_every
+        self.metrics_server = None
+        self.dumper = None
+        # With a profile directory SIGUSR1 toggles profiling (cli_lab.profiling)
+        self.profile_dir = profile_dir
+        self.profile_modes = profile_modes
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.metrics_port is not None:
+            self.metrics_server = await asyncio.start_server(self.handle_metrics, self.host, self.metrics_port)
+            self.metrics_port = self.metrics_server.sockets[0].getsockname()[1]
+        if self.metrics_json is not None:
+            self.dumper = asyncio.create_task(self.dump_metrics())
+        if self.profile_dir is not None and hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.toggle_profiling)
+        return self.server
+
+    def toggle_profiling(self):
+        # The first SIGUSR1 starts profiling the levels being played, the
+        # next one stops it and writes the results
+        loop = asyncio.get_running_loop()
+        if profiling.active() is None:
+            profiling.start(profiling.Profiler(self.profile_dir, self.profile_modes))
+            print(f"Profiling ({', '.join(self.profile_modes)}); send SIGUSR1 again to stop.")
+        else:
+            future = loop.run_in_executor(None, profiling.stop)
+            future.add_done_callback(lambda done: print(f"Profile written to {', '.join(done.result())}"))
+
+    async def handle_metrics(self, reader, writer):
+        # Just enough HTTP/1.0 for a Prometheus scrape
+        try:
+            request = await asyncio.wait_for(reader.readline(), 10)
+            while (await asyncio.wait_for(reader.readline(), 10)).strip():
+                pass
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+        parts = request.split()
+        collector = metrics.COLLECTOR
+        path = parts[1].split(b"?")[0] if len(parts) >= 2 and parts[0] == b"GET" else None
+        if path == b"/metrics" and collector is not None:
+            status, body = "200 OK", collector.prometheus().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        headers = (f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                   f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(headers.encode("ascii") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def dump_metrics(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.metrics_every)
+            if metrics.COLLECTOR is not None:
+                await loop.run_in_executor(None, metrics.COLLECTOR.dump, self.metrics_json)
+
+    async def handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        if self.active >= self.max_sessions:
+            writer.write(b"Server full, try again later.\r\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        self.active += 1
+        io = NetworkIO(loop, reader, writer, self.idle_timeout)
+        try:
+            await loop.run_in_executor(self.executor, run_session, io, self.entry, self.players)
+        finally:
+            self.active -= 1
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        if self.dumper is not None:
+            self.dumper.cancel()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            await self.metrics_server.wait_closed()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve TerminalWarrior to many players at once.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=2323)
+    parser.add_argument("--max-sessions", type=int, default=500)
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="disconnect players idle for this many seconds")
+    parser.add_argument("--saves", metavar="DIR", default=None,
+                        help="ask players for a name and save their progress under this directory")
+    parser.add_argument("--leaderboard", action="store_true",
+                        help="ask players for a name and rank their completions on a live leaderboard")
+    parser.add_argument("--shared-world", action="store_true",
+                        help="ask players for a name and put everyone playing a level on one shared machine")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on GET /metrics of this port")
+    parser.add_argument("--metrics-json", metavar="FILE", default=None,
+                        help="write the metrics to this file as JSON every --metrics-every seconds")
+    parser.add_argument("--metrics-every", type=float, default=10.0)
+    parser.add_argument("--profile-dir", metavar="DIR", default=None,
+                        help="let SIGUSR1 toggle profiling of the running levels, writing results here")
+    parser.add_argument("--profile", metavar="MODES", default="sample",
+                        help="profilers SIGUSR1 turns on: comma-separated cpu, sample, alloc (default sample)")
+    args = parser.parse_args(argv)
+    modes = args.profile.split(",")
+    if not set(modes) <= set(profiling.MODES):
+        parser.error(f"--profile expects some of: {', '.join(profiling.MODES)}")
+
+    board = leaderboard.Leaderboard() if args.leaderboard else None
+    server = SessionServer(args.host, args.port, args.max_sessions, args.idle_timeout,
+                           saves=args.saves, board=board, metrics_port=args.metrics_port,
+                           metrics_json=args.metrics_json, metrics_every=args.metrics_every,
+                           profile_dir=args.profile_dir, profile_modes=modes,
+                           shared=world.World() if args.shared_world else None)
+    print(f"TerminalWarrior server listening on {args.host}:{args.port}")
+    if args.metrics_port is not None:
+        print(f"Metrics on http://{args.host}:{args.metrics_port}/metrics")
+    if args.profile_dir is not None:
+        print(f"kill -USR1 {os.getpid()} toggles profiling into {args.profile_dir}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("Server stopped.")
+        if board is not None:
+            print(board.render())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import atexit
+import builtins
+import contextlib
+import contextvars
+import sys
+import time
+
+from cli_lab import term
+from cli_lab.clock import Clock
+from cli_lab.render import OutputBuffer
+
+# Every level talks to the player through the session that is active in the
+# current context instead of calling the builtin input()/print() directly.
+# The local console is the default, the server swaps in a network session.
+# Each session has a cli_lab.clock.Clock that pause() advances.
+
+
+class ConsoleIO:
+    interactive = True
+
+    def __init__(self):
+        self.output = OutputBuffer(self._emit)
+        self.terminal = None
+        self.clock = Clock()
+
+    def _emit(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def read_line(self, prompt=""):
+        self.output.flush(prompt)
+        return builtins.input()
+
+    def write(self, text):
+        self.output.write(text)
+
+    def write_screen(self, screen):
+        self.output.write_screen(screen)
+
+    def clear(self):
+        if self.terminal is None:
+            self.terminal = term.detect(sys.stdout)
+        self.output.write(self.terminal.clear())
+
+    def flush(self):
+        self.output.flush()
+
+    def pause(self, seconds):
+        self.output.flush()
+        self.clock.advance(seconds)
+        time.sleep(seconds)
+
+    def event(self, name, fields):
+        pass
+
+    def close(self):
+        self.output.flush()
+
+
+class ScriptIO:
+    # Feeds a transcript to a level without a TTY: delays and "press enter"
+    # prompts are skipped and running out of lines behaves like Ctrl-D.
+    interactive = False
+
+    def __init__(self, lines, output=None, echo=True):
+        self.lines = iter(lines)
+        self.output = output
+        self.echo = echo
+        self.commands = 0
+        self.events = []
+        self.clock = Clock()
+
+    def read_line(self, prompt=""):
+        try:
+            line = next(self.lines).rstrip("\r\n")
+        except StopIteration:
+            raise EOFError
+        self.commands += 1
+        if self.echo:
+            self.write(f"{prompt}{line}\n")
+        return line
+
+    def write(self, text):
+        if self.output is not None:
+            self.output.write(text)
+
+    def write_screen(self, screen):
+        self.write(screen.text)
+
+    def clear(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def pause(self, seconds):
+        # Fast-forward: only the virtual clock moves
+        self.clock.advance(seconds)
+
+    def event(self, name, fields):
+        self.events.append((self.commands, name, fields))
+
+    def close(self):
+        pass
+
+
+class CaptureIO:
+    # Collects what a command writes instead of showing it, so the output of
+    # a plain print()-ing command can feed a pipe or a redirection. Input,
+    # pauses and events still go to the session underneath.
+
+    def __init__(self, outer):
+        self.outer = outer
+        self.interactive = outer.interactive
+        self.clock = outer.clock
+        self.chunks = []
+
+    def read_line(self, prompt=""):
+        return self.outer.read_line(prompt)
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def write_screen(self, screen):
+        self.chunks.append(screen.text)
+
+    def clear(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def pause(self, seconds):
+        self.outer.pause(seconds)
+
+    def event(self, name, fields):
+        self.outer.event(name, fields)
+
+    def close(self):
+        pass
+
+    def lines(self):
+        return "".join(self.chunks).splitlines()
+
+
+_console = ConsoleIO()
+atexit.register(_console.close)
+_current = contextvars.ContextVar("session_io", default=_console)
+
+
+def current():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def use(io):
+    token = _current.set(io)
+    try:
+        yield io
+    finally:
+        _current.reset(token)
+
+
+def capture():
+    return use(CaptureIO(_current.get()))
+
+
+def input(prompt=""):
+    return _current.get().read_line(prompt)
+
+
+def print(*values, sep=" ", end="\n"):
+    _current.get().write(sep.join(str(value) for value in values) + end)
+
+
+def show(screen):
+    _current.get().write_screen(screen)
+
+
+def clear():
+    _current.get().clear()
+
+
+def flush():
+    _current.get().flush()
+
+
+def pause(seconds):
+    # A simulated delay of seconds on the session's clock
+    _current.get().pause(seconds)
+
+
+def clock():
+    return _current.get().clock
+
+
+def event(name, **fields):
+    # Progress notifications (challenge completions and the like) for
+    # whoever is driving the session: graders, leaderboards, ...
+    _current.get().event(name, fields)
+
+
+def wait_for_enter(prompt):
+    io = _current.get()
+    if io.interactive:
+        io.read_line(prompt)
@@ -0,0 +1,59 @@
+import os
+import sys
+
+# In-process terminal control. Clearing the screen or moving the cursor is
+# just an escape sequence written into the session's output, so it costs no
+# process spawn and works the same for remote players as for local ones.
+
+CSI = "\x1b["
+CLEAR_SCREEN = CSI + "H" + CSI + "2J" + CSI + "3J"
+CLEAR_LINE = CSI + "2K\r"
+HIDE_CURSOR = CSI + "?25l"
+SHOW_CURSOR = CSI + "?25h"
+
+DUMB_TERMINALS = ("", "dumb", "unknown")
+
+
+class Terminal:
+    def __init__(self, ansi):
+        self.ansi = ansi
+
+    def clear(self):
+        return CLEAR_SCREEN if self.ansi else ""
+
+    def clear_line(self):
+        return CLEAR_LINE if self.ansi else "\n"
+
+    def move(self, row, column):
+        return f"{CSI}{row};{column}H" if self.ansi else ""
+
+
+ANSI = Terminal(True)
+PLAIN = Terminal(False)
+
+
+def enable_windows_ansi():
+    # Windows 10+ consoles understand ANSI once virtual terminal processing
+    # is switched on for the output handle.
+    try:
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))
+    except (AttributeError, ImportError, OSError):
+        return False
+
+
+def detect(stream=None, environ=None):
+    stream = stream or sys.stdout
+    environ = os.environ if environ is None else environ
+    isatty = getattr(stream, "isatty", None)
+    if isatty is None or not isatty():
+        return PLAIN
+    if os.name == "nt":
+        return ANSI if enable_windows_ansi() else PLAIN
+    return PLAIN if environ.get("TERM", "") in DUMB_TERMINALS else ANSI
@@ -0,0 +1,137 @@
+import base64
+import contextlib
+import contextvars
+import ipaddress
+import queue
+import random
+import string
+import threading
+
+# Per-session level variants. Everything a level randomizes (credentials,
+# IPs, flags, file names, log contents) is derived from one integer seed, so
+# every player gets their own instance and any instance can be regenerated
+# exactly from its seed when a transcript is graded. The seed is announced
+# with a "variant" session event.
+#
+# Declarative levels describe their random vars in the spec's "variants"
+# object, one generator per var, evaluated in order (later vars may use
+# earlier ones as {name}):
+#   {"choice": [...]}              one of the values
+#   {"range": [low, high]}         an integer, both ends included
+#   {"ip": "172.16.0.0/16"}        a host address in the network
+#   {"token": 8}                   that many uppercase letters and digits
+#   {"format": "KEY_{token}"}      the text with the vars filled in
+#   {"base64": "{flag}"}           the same, base64-encoded
+#   {"log": [templates], "lines": 12, "insert": "ALERT {key}"}
+#       "HH:MM:SS message" lines from the templates in rising time order,
+#       with the insert line at a random position; templates may also use
+#       {octet} for a random 1-254
+#
+# Generating an instance (compiling a variant, forking its filesystem) is
+# done ahead of time by a VariantPool, so starting a session only takes a
+# ready one off a queue.
+
+TOKEN_CHARS = string.ascii_uppercase + string.digits
+
+_requested = contextvars.ContextVar("variant_seed", default=None)
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(32)
+
+
+def rng(name, seed):
+    # The random source of one level instance. The level name is mixed in
+    # so one seed gives unrelated instances of different levels.
+    return random.Random(f"{name}:{seed}")
+
+
+@contextlib.contextmanager
+def seeded(seed):
+    # Levels started inside this block play the instance of seed (None for
+    # a fresh one), e.g. to replay a transcript against the right variant
+    token = _requested.set(seed)
+    try:
+        yield
+    finally:
+        _requested.reset(token)
+
+
+def requested():
+    return _requested.get()
+
+
+def _log(rng, spec, fields):
+    messages = [rng.choice(spec["log"]).format(octet=rng.randint(1, 254), **fields)
+                for _ in range(spec.get("lines", 10))]
+    if "insert" in spec:
+        messages.insert(rng.randint(0, len(messages)), spec["insert"].format(**fields))
+    seconds = rng.randrange(0, 20 * 3600)
+    lines = []
+    for message in messages:
+        seconds += rng.randint(1, 9)
+        lines.append(f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d} {message}")
+    return "\n".join(lines) + "\n"
+
+
+def generate(generators, name, seed):
+    # {var: str} for the spec's "variants" generators; raises ValueError for
+    # an unknown generator
+    source = rng(name, seed)
+    fields = {}
+    for var, spec in generators.items():
+        if "choice" in spec:
+            value = source.choice(spec["choice"])
+        elif "range" in spec:
+            value = source.randint(*spec["range"])
+        elif "ip" in spec:
+            network = ipaddress.ip_network(spec["ip"])
+            value = network[source.randint(1, network.num_addresses - 2)]
+        elif "token" in spec:
+            value = "".join(source.choice(TOKEN_CHARS) for _ in range(spec["token"]))
+        elif "format" in spec:
+            value = spec["format"].format(**fields)
+        elif "base64" in spec:
+            value = base64.b64encode(spec["base64"].format(**fields).encode()).decode()
+        elif "log" in spec:
+            value = _log(source, spec, fields)
+        else:
+            raise ValueError(f"unknown variant generator for {var}: {', '.join(spec)}")
+        fields[var] = str(value)
+    return fields
+
+
+class VariantPool:
+    # Instances of one level built ahead of time. make(seed) builds one; a
+    # background thread keeps up to size of them ready, starting with the
+    # first take(). take(seed) rebuilds that exact instance instead.
+
+    def __init__(self, make, size=4):
+        self.make = make
+        self.ready = queue.Queue(size)
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _fill(self):
+        while True:
+            seed = new_seed()
+            self.ready.put((seed, self.make(seed)))
+
+    def _start(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._fill, name="variants", daemon=True)
+                self._worker.start()
+
+    def take(self, seed=None):
+        # (seed, instance)
+        if seed is not None:
+            return seed, self.make(seed)
+        if self._worker is None:
+            self._start()
+        try:
+            return self.ready.get_nowait()
+        except queue.Empty:
+            # Drained faster than it refills: build this one in place
+            seed = new_seed()
+            return seed, self.make(seed)
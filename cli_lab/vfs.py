@@ -0,0 +1,483 @@
+import bisect
+import datetime
+import functools
+import stat
+
+from cli_lab.content import Blob
+
+# In-memory virtual filesystem the levels are built on. Directories keep their
+# children in a dict, so resolving a path costs one lookup per component and
+# listing a directory never scans the rest of the tree.
+#
+# A level builds its tree once as a template and every session works on a
+# fork() of it. Forks share all inodes with the template and copy an inode
+# (plus the directories above it) only when the session changes it. A
+# copied directory keeps sharing its children, whose parent is still the
+# template's directory, so a fork asks parent_of() for the one it has.
+#
+# find is served from a FileIndex built once per template and shared by its
+# forks. Instead of keeping a copy of the index up to date, each filesystem
+# remembers the paths it changed since then; those are searched as well and
+# every hit is checked against the live tree.
+#
+# A directory shared between sessions (cli_lab.world) is mount()ed into
+# each of their filesystems. It belongs to the SHARED layer, so it is never
+# copied on write: files are added to and removed from it in place, and its
+# children are a mapping the other sessions see change.
+#
+# Values computed from a file body (digests, search indexes) are cached by
+# the body's content_id() rather than by the body, so a cache never keeps a
+# large body alive: a Blob is its own id, a str body gets a token that every
+# fork sharing the inode shares and that write() replaces.
+
+DEFAULT_MTIME = datetime.datetime(2025, 10, 4, 15, 0)
+
+READ = 4
+WRITE = 2
+EXECUTE = 1
+
+# Layer of the inodes no one filesystem owns
+SHARED = object()
+
+
+class Inode:
+    __slots__ = ("name", "parent", "mode", "owner", "group", "mtime",
+                 "content", "size", "children", "target", "layer", "acl", "granted", "version")
+
+    def __init__(self, name, mode, owner="root", group="root", mtime=DEFAULT_MTIME,
+                 content=None, size=None, target=None, layer=None, acl=None):
+        self.name = name
+        self.parent = None
+        self.mode = mode
+        self.owner = owner
+        self.group = group
+        self.mtime = mtime
+        self.content = content
+        self.size = size
+        self.children = {} if stat.S_ISDIR(mode) else None
+        self.target = target
+        # The filesystem allowed to change this inode in place
+        self.layer = layer
+        # Windows ACL entries, (trustee, allow, rights); None when the mode
+        # bits decide (see cli_lab.access)
+        self.acl = acl
+        # principal -> rights, filled in by access.effective()
+        self.granted = None
+        # Token for a str body, made by content_id()
+        self.version = None
+
+    def copy(self):
+        clone = Inode.__new__(Inode)
+        for slot in Inode.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        if clone.children is not None:
+            clone.children = dict(clone.children)
+        clone.granted = None
+        return clone
+
+    # What access rights depend on only changes through these, which drop
+    # the rights cached for this inode
+
+    def chmod(self, mode):
+        self.mode = stat.S_IFMT(self.mode) | mode
+        self.granted = None
+
+    def chown(self, owner=None, group=None):
+        self.owner = owner or self.owner
+        self.group = group or self.group
+        self.granted = None
+
+    def set_acl(self, acl):
+        self.acl = None if acl is None else tuple(acl)
+        self.granted = None
+
+    def write(self, content, size=None):
+        # The body only changes through this, which gives it a new content id
+        self.content = content
+        self.size = size
+        self.version = None
+
+    def content_id(self):
+        # What values computed from the body are cached by
+        if isinstance(self.content, Blob):
+            return self.content
+        if self.version is None:
+            self.version = object()
+        return self.version
+
+    @property
+    def is_dir(self):
+        return self.children is not None
+
+    @property
+    def is_link(self):
+        return self.target is not None
+
+    @property
+    def hidden(self):
+        return self.name.startswith(".")
+
+    def file_size(self):
+        if self.size is not None:
+            return self.size
+        if self.is_dir:
+            return 4096
+        if self.is_link:
+            return len(self.target)
+        return len(self.content or "")
+
+
+@functools.lru_cache(maxsize=8192)
+def normalize(path, cwd="/", home="/"):
+    # Lexical resolution of '~', '.', '..' and relative paths into a tuple
+    # of components; pure, so results are cached across every session.
+    if path == "~" or path.startswith("~/"):
+        path = home + path[1:]
+    if not path.startswith("/"):
+        path = cwd.rstrip("/") + "/" + path
+
+    parts = []
+    for part in path.split("/"):
+        if part in ("", "."):
+            continue
+        if part == "..":
+            if parts:
+                parts.pop()
+            continue
+        parts.append(part)
+    return tuple(parts)
+
+
+def join(parts):
+    return "/" + "/".join(parts)
+
+
+def extension(name):
+    # Lowercase text after the last dot, or None without one
+    _, dot, suffix = name.rpartition(".")
+    return suffix.lower() if dot else None
+
+
+def span(numbers, start, end):
+    # The part of a sorted list of entry numbers within [start, end)
+    return numbers[bisect.bisect_left(numbers, start):bisect.bisect_left(numbers, end)]
+
+
+class FileIndex:
+    # Secondary indexes over one tree, for find. Entries are numbered in walk
+    # (preorder) order, so the subtree of entry n is the range [n, end[n]),
+    # and every index is a sorted list of entry numbers: by permission bit
+    # (0o4000, 0o2000, ... 0o001), by owner and by lowercase extension.
+    # Symlinks are indexed but not followed.
+    __slots__ = ("paths", "numbers", "end", "by_bit", "by_owner", "by_extension")
+
+    def __init__(self, root):
+        self.paths = []
+        self.numbers = {}
+        self.end = []
+        self.by_bit = {}
+        self.by_owner = {}
+        self.by_extension = {}
+
+        stack = [(root, "/")]
+        while stack:
+            node, path = stack.pop()
+            if node is None:
+                # Every entry below number 'path' has been visited
+                self.end[path] = len(self.paths)
+                continue
+            number = len(self.paths)
+            self.paths.append(path)
+            self.numbers[path] = number
+            self.end.append(number + 1)
+
+            bits = node.mode & 0o7777
+            while bits:
+                bit = bits & -bits
+                self.by_bit.setdefault(bit, []).append(number)
+                bits ^= bit
+            self.by_owner.setdefault(node.owner, []).append(number)
+            suffix = extension(node.name)
+            if suffix is not None:
+                self.by_extension.setdefault(suffix, []).append(number)
+
+            if node.children:
+                stack.append((None, number))
+                prefix = path if path == "/" else path + "/"
+                for child in reversed(list(node.children.values())):
+                    stack.append((child, prefix + child.name))
+
+    def __len__(self):
+        return len(self.paths)
+
+
+class VirtualFS:
+    # Paths changed since the index was built; forks start tracking right
+    # away since they search their origin's index
+    changed = None
+    _index = None
+    # path -> shared directory mounted there
+    mounts = {}
+
+    def __init__(self, home="/", drive=None, ignore_case=False, root=None, origin=None):
+        self.home = home
+        self.drive = drive
+        self.ignore_case = ignore_case
+        self.layer = object()
+        self.root = root or Inode("", stat.S_IFDIR | 0o755, layer=self.layer)
+        self.origin = origin
+
+    def fork(self):
+        return VirtualFS(self.home, self.drive, self.ignore_case, self.root, origin=self)
+
+    @property
+    def _tracking(self):
+        return self.origin is not None or self._index is not None
+
+    def _touched(self, path):
+        if self.changed is None:
+            self.changed = set()
+        self.changed.add(path)
+
+    def index(self):
+        # (FileIndex, paths changed since it was built) for find
+        if self.origin is not None:
+            index, changed = self.origin.index()
+            if self.changed:
+                changed = changed | self.changed if changed else self.changed
+            if self.mounts:
+                # Other sessions change shared directories behind our back
+                changed = changed | {self.path_of(node) for inode in self.mounts.values()
+                                     for node in self.walk(inode)}
+            return index, changed
+        if self._index is None:
+            self._index = FileIndex(self.root)
+            self.changed = None
+        return self._index, self.changed or frozenset()
+
+    def child(self, directory, name):
+        return directory.children.get(self._key(name))
+
+    def _key(self, name):
+        return name.lower() if self.ignore_case else name
+
+    def _parts(self, path, cwd):
+        if self.drive is not None:
+            path = path.replace("\\", "/")
+            if path[:2].lower() == self.drive.lower():
+                path = path[2:] or "/"
+        return normalize(path, cwd, self.home)
+
+    def _own(self, node, parent):
+        # Copy-on-write: swap a shared inode for a private copy in its
+        # (already private) parent directory.
+        if node.layer is self.layer or node.layer is SHARED:
+            return node
+        clone = node.copy()
+        clone.layer = self.layer
+        if parent is None:
+            self.root = clone
+        else:
+            clone.parent = parent
+            parent.children[self._key(node.name)] = clone
+        return clone
+
+    def _new(self, name, parent, mode, owner="root", group="root", mtime=DEFAULT_MTIME, **fields):
+        inode = Inode(name, mode, owner, group, mtime, layer=self.layer, **fields)
+        inode.parent = parent
+        parent.children[self._key(name)] = inode
+        if self._tracking:
+            self._touched(self.path_of(inode))
+        return inode
+
+    def writable(self, path, cwd="/", follow=True):
+        # Like lookup(), but returns an inode this filesystem may modify.
+        return self._writable(self._parts(path, cwd), follow)
+
+    def _writable(self, parts, follow=True):
+        node = self._own(self.root, None)
+        last = len(parts) - 1
+        for i, part in enumerate(parts):
+            if node.children is None:
+                return None
+            child = node.children.get(self._key(part))
+            if child is None:
+                return None
+            if child.target is not None and (follow or i < last):
+                return self._writable(self._parts(child.target, "/") + parts[i + 1:], follow)
+            node = self._own(child, node)
+        if self._tracking:
+            # The caller is about to change it
+            self._touched(self.path_of(node))
+        return node
+
+    def mount(self, path, directory):
+        # Puts a directory of the SHARED layer at path, in place of what
+        # this filesystem had there
+        parts = self._parts(path, "/")
+        parent = self._writable(parts[:-1])
+        parent.children[self._key(parts[-1])] = directory
+        self.mounts = {**self.mounts, join(parts): directory}
+
+    def lookup(self, path, cwd="/", follow=True):
+        node = self.root
+        parts = self._parts(path, cwd)
+        last = len(parts) - 1
+        for i, part in enumerate(parts):
+            if node.children is None:
+                return None
+            node = node.children.get(self._key(part))
+            if node is None:
+                return None
+            if node.target is not None and (follow or i < last):
+                node = self.lookup(node.target)
+                if node is None:
+                    return None
+        return node
+
+    def path_of(self, inode):
+        parts = []
+        while inode.parent is not None:
+            parts.append(inode.name)
+            inode = inode.parent
+        return join(reversed(parts))
+
+    def parent_of(self, inode):
+        # The directory holding inode in this filesystem (the root's is
+        # itself)
+        if inode.parent is None:
+            return inode
+        return self.lookup(self.path_of(inode.parent), follow=False)
+
+    def display(self, path, tilde=False):
+        if self.drive is not None:
+            return self.drive + path.replace("/", "\\")
+        if tilde and (path == self.home or path.startswith(self.home + "/")):
+            return "~" + path[len(self.home):]
+        return path
+
+    def _attach(self, path, mode, owner, group, mtime, cwd="/", **fields):
+        parts = self._parts(path, cwd)
+        parent = self.mkdir(join(parts[:-1]))
+        return self._new(parts[-1], parent, mode, owner, group, mtime, **fields)
+
+    def mkdir(self, path, mode=0o755, owner="root", group="root", mtime=DEFAULT_MTIME):
+        # Missing parents are created root-owned, like a setup script would.
+        node = self._own(self.root, None)
+        parts = self._parts(path, "/")
+        for i, part in enumerate(parts):
+            child = node.children.get(self._key(part))
+            if child is None:
+                if i == len(parts) - 1:
+                    child = self._new(part, node, stat.S_IFDIR | mode, owner, group, mtime)
+                else:
+                    child = self._new(part, node, stat.S_IFDIR | 0o755)
+            elif child.target is not None:
+                rest = self._parts(child.target, "/") + parts[i + 1:]
+                return self.mkdir(join(rest), mode, owner, group, mtime)
+            else:
+                child = self._own(child, node)
+            node = child
+        return node
+
+    def add_file(self, path, content="", mode=0o644, owner="root", group="root",
+                 mtime=DEFAULT_MTIME, size=None, cwd="/", acl=None):
+        return self._attach(path, stat.S_IFREG | mode, owner, group, mtime, cwd,
+                            content=content, size=size, acl=acl)
+
+    def symlink(self, path, target, owner="root", group="root", mtime=DEFAULT_MTIME):
+        return self._attach(path, stat.S_IFLNK | 0o777, owner, group, mtime, target=target)
+
+    def remove(self, path, cwd="/"):
+        parts = self._parts(path, cwd)
+        if not parts:
+            return None
+        parent = self._writable(parts[:-1])
+        if parent is None or parent.children is None:
+            return None
+        removed = parent.children.pop(self._key(parts[-1]), None)
+        if removed is not None and self._tracking:
+            self._touched(self.path_of(parent).rstrip("/") + "/" + removed.name)
+        return removed
+
+    def changes(self):
+        # What this fork changed since it was forked, as plain tuples for a
+        # save file: (path, mode, owner, group, mtime, content, size, target,
+        # acl) per changed path, or (path,) once it is gone. Parents come
+        # first.
+        records = []
+        for path in sorted(self.changed or ()):
+            node = self.lookup(path, follow=False)
+            if node is None:
+                records.append((path,))
+                continue
+            content = node.content
+            if isinstance(content, Blob):
+                content = (content.path, content.offset, content.length)
+            records.append((path, node.mode, node.owner, node.group, node.mtime.isoformat(),
+                            content, node.size, node.target, node.acl))
+        return tuple(records)
+
+    def apply(self, records):
+        # Replays changes() of a fork of the same template onto this one
+        for record in records:
+            path = record[0]
+            if len(record) == 1:
+                self.remove(path)
+                continue
+            # Saves from before ACLs have no acl field
+            _, mode, owner, group, mtime, content, size, target, *acl = record
+            acl = acl[0] if acl else None
+            if isinstance(content, tuple):
+                content = Blob(*content)
+            mtime = datetime.datetime.fromisoformat(mtime)
+            node = self._writable(self._parts(path, "/"), follow=False)
+            if node is not None and stat.S_IFMT(node.mode) != stat.S_IFMT(mode):
+                self.remove(path)
+                node = None
+            if node is None:
+                self._attach(path, mode, owner, group, mtime, content=content, size=size,
+                             target=target, acl=acl)
+            else:
+                node.chmod(stat.S_IMODE(mode))
+                node.chown(owner, group)
+                node.set_acl(acl)
+                node.mtime = mtime
+                node.write(content, size)
+                node.target = target
+
+    def listdir(self, inode, show_hidden=False):
+        return [child for child in inode.children.values()
+                if show_hidden or not child.hidden]
+
+    def walk(self, inode=None):
+        stack = [inode or self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.children:
+                stack.extend(reversed(list(node.children.values())))
+
+
+def link_count(inode):
+    if not inode.is_dir:
+        return 1
+    return 2 + sum(1 for child in inode.children.values() if child.is_dir)
+
+
+def long_listing(entries):
+    # 'ls -l' style rows; entries are (name, inode) pairs.
+    rows = []
+    for name, inode in entries:
+        if inode.is_link:
+            name = f"{name} -> {inode.target}"
+        rows.append((stat.filemode(inode.mode), str(link_count(inode)), inode.owner,
+                     inode.group, str(inode.file_size()),
+                     f"{inode.mtime:%b} {inode.mtime.day:>2} {inode.mtime:%H:%M}", name))
+
+    widths = [max((len(row[i]) for row in rows), default=0) for i in range(5)]
+    return [
+        f"{mode} {links:>{widths[1]}} {owner:<{widths[2]}} {group:<{widths[3]}} "
+        f"{size:>{widths[4]}} {mtime} {name}"
+        for mode, links, owner, group, size, mtime, name in rows
+    ]
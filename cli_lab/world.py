@@ -0,0 +1,250 @@
+import contextlib
+import contextvars
+import itertools
+import threading
+
+from cli_lab import access, session
+from cli_lab.vfs import SHARED
+
+# Shared-world mode: the sessions of a level live on one simulated machine,
+# each logged in as a user of its own. They see each other's logins (who),
+# login shells (ps) and files in the machine's shared directories, such as
+# a sticky /var/shared.
+#
+# The state every session reads is kept in VersionedMaps. A reader takes
+# the map's current version, a dict nobody changes once it is published,
+# without a lock, so it never waits for a writer and always sees a
+# consistent directory or process table. A writer copies the version under
+# the lock of that one map, changes the copy and publishes it with a single
+# assignment. Writers to different directories or tables don't wait for
+# each other. A file in a shared directory is changed one attribute at a
+# time, and each attribute is replaced whole.
+
+_joined = contextvars.ContextVar("world", default=None)
+
+# Processes every machine boots with: (user, command)
+SYSTEM_PROCESSES = (
+    ("root", "/sbin/init"),
+    ("root", "/usr/sbin/cron -f"),
+    ("root", "sshd: /usr/sbin/sshd -D [listener] 0 of 10-100 startups"),
+    ("service", "/usr/bin/audit-service --config /etc/service/config.json"),
+)
+
+
+class VersionedMap:
+    # A dict for many readers and a few writers (see above). It is what a
+    # shared directory keeps its children in, so it answers the dict
+    # methods the filesystem uses.
+    __slots__ = ("current", "version", "lock")
+
+    def __init__(self, items=()):
+        self.current = dict(items)
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        # The current version; a dict never changed afterwards
+        return self.current
+
+    def get(self, key, default=None):
+        return self.current.get(key, default)
+
+    def __getitem__(self, key):
+        return self.current[key]
+
+    def __contains__(self, key):
+        return key in self.current
+
+    def __len__(self):
+        return len(self.current)
+
+    def __iter__(self):
+        return iter(self.current)
+
+    def keys(self):
+        return self.current.keys()
+
+    def values(self):
+        return self.current.values()
+
+    def items(self):
+        return self.current.items()
+
+    def _publish(self, current):
+        self.current = current
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            current = dict(self.current)
+            current[key] = value
+            self._publish(current)
+
+    def pop(self, key, *default):
+        with self.lock:
+            if key not in self.current:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            current = dict(self.current)
+            value = current.pop(key)
+            self._publish(current)
+            return value
+
+
+class Login:
+    __slots__ = ("account", "tty", "since", "address", "pid")
+
+    def __init__(self, account, tty, since, address, pid):
+        self.account = account
+        self.tty = tty
+        self.since = since
+        self.address = address
+        # Its login shell
+        self.pid = pid
+
+
+class Process:
+    __slots__ = ("pid", "user", "tty", "started", "command")
+
+    def __init__(self, pid, user, tty, started, command):
+        self.pid = pid
+        self.user = user
+        self.tty = tty
+        self.started = started
+        self.command = command
+
+
+class Machine:
+    # One simulated machine. shares: path -> its shared directory, made
+    # from the directory of the first filesystem that mounts it.
+    # Machines of solo sessions are private but work the same.
+    mapping = VersionedMap
+
+    def __init__(self):
+        self.shares = self.mapping()
+        # tty number -> Login, pid -> Process
+        self.logins = self.mapping()
+        self.processes = self.mapping()
+        self.pids = itertools.count(1)
+        self.lock = threading.Lock()
+        for user, command in SYSTEM_PROCESSES:
+            self._spawn(user, None, None, command)
+
+    def _spawn(self, user, tty, started, command):
+        process = Process(next(self.pids), user, tty, started, command)
+        self.processes[process.pid] = process
+        return process
+
+    def share(self, path, fs):
+        # The shared directory at path, mounted into fs
+        directory = self.shares.get(path)
+        if directory is None:
+            with self.lock:
+                directory = self.shares.get(path)
+                if directory is None:
+                    directory = self.shares[path] = shared_directory(fs.lookup(path), self.mapping)
+        fs.mount(path, directory)
+        return directory
+
+    def login(self, account, fs, shares=()):
+        for path in shares:
+            self.share(path, fs)
+        since = session.clock().now()
+        with self.lock:
+            # The lowest free terminal
+            number = next(number for number in itertools.count() if number not in self.logins)
+            shell = self._spawn(account, f"pts/{number}", since, "-bash")
+            login = Login(account, f"pts/{number}", since, f"10.0.{number // 250}.{number % 250 + 2}",
+                          shell.pid)
+            self.logins[number] = login
+        return Member(self, number, login)
+
+
+def shared_directory(template, mapping=VersionedMap):
+    # A SHARED copy of a directory and everything in it
+    directory = template.copy()
+    directory.layer = SHARED
+    directory.children = mapping((key, _shared(child, directory, mapping))
+                                 for key, child in template.children.items())
+    return directory
+
+
+def _shared(inode, parent, mapping):
+    if inode.is_dir:
+        inode = shared_directory(inode, mapping)
+    else:
+        inode = inode.copy()
+    inode.parent = parent
+    return inode
+
+
+class Member:
+    # A session logged in to a machine
+    __slots__ = ("machine", "number", "login")
+
+    def __init__(self, machine, number, login):
+        self.machine = machine
+        self.number = number
+        self.login = login
+
+    @property
+    def account(self):
+        return self.login.account
+
+    def logout(self):
+        self.machine.processes.pop(self.login.pid, None)
+        self.machine.logins.pop(self.number, None)
+
+    def others(self):
+        return sum(1 for login in self.machine.logins.values() if login is not self.login)
+
+
+class World:
+    # The machines of a server in shared-world mode, one per level
+    def __init__(self):
+        self.machines = {}
+        self.lock = threading.Lock()
+
+    def machine(self, level):
+        machine = self.machines.get(level)
+        if machine is None:
+            with self.lock:
+                machine = self.machines.setdefault(level, Machine())
+        return machine
+
+
+def account(player):
+    # The Linux account of a player; system accounts' names are taken
+    return player + "_" if player in access.USERS else player
+
+
+@contextlib.contextmanager
+def joining(world, player):
+    # Levels played inside this block log in to world's machines as player
+    token = _joined.set((world, player))
+    try:
+        yield world
+    finally:
+        _joined.reset(token)
+
+
+@contextlib.contextmanager
+def login(level, fs, shares=(), user="user"):
+    # A Member logged in to level's machine, with the shared directories
+    # mounted into fs. Outside shared-world mode it is the only user of a
+    # private machine, which mounts nothing.
+    joined = _joined.get()
+    if joined is None:
+        member = Machine().login(user, fs)
+    else:
+        world, player = joined
+        member = world.machine(level).login(account(player), fs, shares)
+    try:
+        yield member
+    finally:
+        member.logout()
+
+
+def current():
+    return _joined.get()